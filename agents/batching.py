@@ -0,0 +1,144 @@
+"""Agent Batching - Opt-in single-flight and capped concurrency for the advisor agents"""
+import os
+import threading
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable, Iterable, List, Tuple
+
+from response_cache import STATE_FIELDS, make_key
+
+AGENT_BATCHING = os.getenv("AGENT_BATCHING", "false").lower() == "true"
+BATCH_WINDOW = float(os.getenv("AGENT_BATCH_WINDOW", "0"))  # seconds to hold distinct requests; 0 sends at once
+BATCH_MAX_SIZE = int(os.getenv("AGENT_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("AGENT_BATCH_MAX_CONCURRENCY", "4"))
+
+AgentFunc = Callable[[str, Optional[Dict[str, Any]]], Dict[str, Any]]
+
+
+class MicroBatcher:
+    """Coalesces identical requests and caps how many distinct ones run at once.
+
+    Requests with the same key share one upstream call while it is queued or
+    running (single-flight). Distinct requests go onto a pool of
+    ``max_concurrency`` workers, which caps how hard a burst can hit the
+    upstream rate limit. Chat completions take one prompt per call, so
+    distinct requests are never merged: a ``window`` above 0 only holds them
+    (up to ``max_batch_size`` at a time) to release a burst together, which
+    adds latency and saves no calls.
+    """
+
+    def __init__(
+        self,
+        func: AgentFunc,
+        window: float = BATCH_WINDOW,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+    ):
+        self.func = func
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="agent-batch")
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._batch: List[Tuple[str, str, Optional[Dict[str, Any]], Future]] = []
+        self._timer: Optional[threading.Timer] = None
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    def submit(self, key: str, question: str, state: Optional[Dict[str, Any]] = None) -> Future:
+        batch = None
+        with self._lock:
+            self.requests += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            future = Future()
+            self._inflight[key] = future
+            self._batch.append((key, question, state, future))
+            if self.window <= 0 or len(self._batch) >= self.max_batch_size:
+                batch = self._take_batch()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if batch:
+            self._dispatch(batch)
+        return future
+
+    def call(self, key: str, question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        result = self.submit(key, question, state).result()
+        return {**result, "meta": dict(result.get("meta") or {})}
+
+    def _take_batch(self):
+        batch, self._batch = self._batch, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.batches += 1
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take_batch() if self._batch else None
+        if batch:
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        for key, question, state, future in batch:
+            self._executor.submit(self._run, key, question, state, future)
+
+    def _run(self, key: str, question: str, state: Optional[Dict[str, Any]], future: Future):
+        try:
+            result, error = self.func(question, state), None
+        except Exception as e:
+            result, error = None, e
+        # Release the key before resolving, so no later request joins a finished call
+        with self._lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+                "inflight": len(self._inflight),
+                "queued": len(self._batch),
+            }
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+
+
+def batcher_stats() -> Dict[str, Dict[str, Any]]:
+    return {agent: batcher.stats() for agent, batcher in _batchers.items()}
+
+
+def batched(agent: str, state_fields: Iterable[str] = STATE_FIELDS):
+    """Decorator routing ``run_*(question, state)`` through a per-agent MicroBatcher.
+
+    A no-op unless ``AGENT_BATCHING=true``.
+    """
+    state_fields = tuple(state_fields)
+
+    def decorator(func: AgentFunc) -> AgentFunc:
+        if not AGENT_BATCHING:
+            return func
+        batcher = _batchers[agent] = MicroBatcher(func)
+
+        @functools.wraps(func)
+        def wrapper(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+            key = make_key(agent, None, question, state, state_fields)
+            return batcher.call(key, question, state)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,157 @@
+"""Agent Orchestrator - Parallel "Consult All Agents" fan-out"""
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, Callable, Iterator, AsyncIterator, Iterable, List
+
+from agents.registry import AGENTS
+from response_cache import is_cacheable
+
+AGENT_RUNNERS: Dict[str, Callable[[str, Optional[Dict[str, Any]]], Dict[str, Any]]] = {
+    name: agent.run for name, agent in AGENTS.items()
+}
+
+AGENT_STREAMERS: Dict[str, Callable[[str, Optional[Dict[str, Any]]], Iterator[str]]] = {
+    name: agent.stream for name, agent in AGENTS.items()
+}
+
+DEFAULT_TIMEOUT = float(os.getenv("CONSULT_ALL_TIMEOUT", "45"))
+
+
+def _agent_names(agents: Optional[Iterable[str]]) -> List[str]:
+    names = list(agents) if agents is not None else list(AGENTS)
+    unknown = [name for name in names if name not in AGENTS]
+    if unknown:
+        raise ValueError(f"Unknown agents: {', '.join(unknown)}")
+    return names
+
+
+def _ok_result(name: str, result: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    meta = dict(result.get("meta") or {})
+    meta.setdefault("agent", name)
+    # Agents report failures as answers ("Error: ...", 0 tokens) rather than raising
+    meta["status"] = "ok" if is_cacheable(result) else "error"
+    meta["latency"] = elapsed
+    return {"answer": result.get("answer", ""), "meta": meta}
+
+
+def _error_result(name: str, error: Exception, elapsed: float) -> Dict[str, Any]:
+    return {"answer": f"Error: {str(error)}", "meta": {"agent": name, "tokens": 0, "status": "error", "latency": elapsed}}
+
+
+def _timeout_result(agent: str, elapsed: float) -> Dict[str, Any]:
+    return {
+        "answer": f"Timed out after {elapsed:.1f}s",
+        "meta": {"agent": agent, "tokens": 0, "status": "timeout", "latency": elapsed},
+    }
+
+
+def iter_consult_all(
+    question: str,
+    state: Optional[Dict[str, Any]] = None,
+    agents: Optional[Iterable[str]] = None,
+    timeout: Optional[float] = None,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Run the advisors concurrently and yield each result as soon as it is ready.
+
+    ``timeout`` applies to every agent unless overridden in ``timeouts``. An
+    agent that misses its deadline yields a ``timeout`` result; its worker is
+    left to finish in the background so it never delays the remaining agents.
+    """
+    names = _agent_names(agents)
+
+    default_timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    timeouts = timeouts or {}
+    executor = ThreadPoolExecutor(max_workers=max(len(names), 1), thread_name_prefix="consult")
+    started = time.monotonic()
+    pending = {}
+    deadlines = {}
+    try:
+        for name in names:
+            future = executor.submit(AGENT_RUNNERS[name], question, state)
+            pending[future] = name
+            deadlines[future] = started + timeouts.get(name, default_timeout)
+
+        while pending:
+            remaining = min(deadlines[f] for f in pending) - time.monotonic()
+            done, _ = wait(list(pending), timeout=max(remaining, 0), return_when=FIRST_COMPLETED)
+            elapsed = time.monotonic() - started
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    yield _ok_result(name, future.result(), elapsed)
+                except Exception as e:
+                    yield _error_result(name, e, elapsed)
+
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines[f] <= now]:
+                name = pending.pop(future)
+                future.cancel()
+                yield _timeout_result(name, now - started)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def consult_all(
+    question: str,
+    state: Optional[Dict[str, Any]] = None,
+    agents: Optional[Iterable[str]] = None,
+    timeout: Optional[float] = None,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Run the advisors concurrently and return all results keyed by agent."""
+    return {
+        result["meta"]["agent"]: result
+        for result in iter_consult_all(question, state, agents, timeout, timeouts)
+    }
+
+
+async def aiter_consult_all(
+    question: str,
+    state: Optional[Dict[str, Any]] = None,
+    agents: Optional[Iterable[str]] = None,
+    timeout: Optional[float] = None,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async ``iter_consult_all``: every advisor runs as a task on the current event loop.
+
+    An agent that misses its deadline is cancelled and yields a ``timeout`` result.
+    """
+    names = _agent_names(agents)
+    default_timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    timeouts = timeouts or {}
+    started = time.monotonic()
+
+    async def consult(name: str) -> Dict[str, Any]:
+        try:
+            result = await asyncio.wait_for(AGENTS[name].arun(question, state), timeouts.get(name, default_timeout))
+        except asyncio.TimeoutError:
+            return _timeout_result(name, time.monotonic() - started)
+        except Exception as e:
+            return _error_result(name, e, time.monotonic() - started)
+        return _ok_result(name, result, time.monotonic() - started)
+
+    tasks = [asyncio.ensure_future(consult(name)) for name in names]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def aconsult_all(
+    question: str,
+    state: Optional[Dict[str, Any]] = None,
+    agents: Optional[Iterable[str]] = None,
+    timeout: Optional[float] = None,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Async ``consult_all``."""
+    return {
+        result["meta"]["agent"]: result
+        async for result in aiter_consult_all(question, state, agents, timeout, timeouts)
+    }
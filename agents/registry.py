@@ -0,0 +1,237 @@
+"""Agent Registry - One definition per advisor (prompt, model, temperature), run sync or async"""
+import os
+import json
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterator, AsyncIterator, List, Tuple
+
+from openai_client import get_openai_client, stream_chat, astream_chat
+from response_cache import cached_response
+from evidence_log import get_evidence_writer
+from agents.batching import batched
+from knowledge.retrieval import knowledge_context
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+def _api_key_configured() -> bool:
+    return bool(os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEYS"))
+
+
+class Agent:
+    """An advisor defined by its system prompt template, model and temperature.
+
+    ``prompt`` is formatted with the ``defaults`` fields, taken from the
+    governance state when present. ``run`` and ``arun`` return
+    ``{"answer", "meta"}`` and share one response cache; ``arun`` awaits the
+    OpenAI call, so many agents can run on one event loop without a thread
+    each. ``run`` also goes through the opt-in micro-batcher. Every call is
+    grounded with the agent's retrieved knowledge (see knowledge.retrieval).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        prompt: str,
+        model: str = DEFAULT_MODEL,
+        temperature: float = 0.3,
+        defaults: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.prompt = prompt
+        self.model = model
+        self.temperature = temperature
+        self.defaults = defaults or {}
+        self.state_fields = tuple(self.defaults)
+        cache = cached_response(name, self.state_fields, variant=self.cache_variant, on_hit=self._on_cached)
+        self.run = cache(batched(name, self.state_fields)(self._run))
+        self.arun = cache(self._arun)
+
+    # --- Per-agent hooks ---
+    def config(self) -> Tuple[str, float]:
+        """(model, temperature) for the next call"""
+        return self.model, self.temperature
+
+    def system_prompt(self, state: Dict[str, Any]) -> str:
+        return self.prompt.format(**{field: state.get(field, default) for field, default in self.defaults.items()})
+
+    def context(self, question: str) -> str:
+        """Knowledge passages for ``question``, packed under the token budget ("" for none)"""
+        return knowledge_context(self.name, question)
+
+    def on_answer(self, question: str, answer: str, tokens: Optional[int], cached: bool = False):
+        """Called with every successful answer, including ones served from the response cache"""
+
+    def cache_variant(self, question: str, state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """What else a cached answer depends on: the model, temperature, rendered prompt and knowledge context"""
+        model, temperature = self.config()
+        variant = {"model": model, "temperature": temperature, "prompt": self.system_prompt(state or {})}
+        # The retriever caches the context, so the call that follows a miss reuses it
+        context = self.context(question)
+        if context:
+            variant["knowledge"] = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        return variant
+
+    def _on_cached(self, question: str, result: Dict[str, Any]):
+        self.on_answer(question, result.get("answer", ""), 0, cached=True)
+
+    # --- Calls ---
+    def messages(self, question: str, state: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+        messages = [{"role": "system", "content": self.system_prompt(state or {})}]
+        context = self.context(question)
+        if context:
+            messages.append({"role": "system", "content": context})
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def _request(self, question: str, state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        model, temperature = self.config()
+        return {"model": model, "temperature": temperature, "messages": self.messages(question, state)}
+
+    def _result(self, question: str, response) -> Dict[str, Any]:
+        answer = response.choices[0].message.content
+        tokens = response.usage.total_tokens
+        self.on_answer(question, answer, tokens)
+        return {"answer": answer, "meta": {"agent": self.name, "tokens": tokens}}
+
+    def _error(self, message: str) -> Dict[str, Any]:
+        return {"answer": message, "meta": {"agent": self.name, "tokens": 0, "status": "error"}}
+
+    def _run(self, question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if not _api_key_configured():
+            return self._error("OPENAI_API_KEY not configured")
+        try:
+            response = get_openai_client().create(**self._request(question, state))
+            return self._result(question, response)
+        except Exception as e:
+            return self._error(f"Error: {str(e)}")
+
+    async def _arun(self, question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if not _api_key_configured():
+            return self._error("OPENAI_API_KEY not configured")
+        try:
+            # Retrieval embeds the question with a blocking call: keep it off the event loop
+            request = await asyncio.to_thread(self._request, question, state)
+            response = await get_openai_client().acreate(**request)
+            return self._result(question, response)
+        except Exception as e:
+            return self._error(f"Error: {str(e)}")
+
+    def stream(self, question: str, state: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Answer streamed token by token; failures raise, so callers can tell them from answers"""
+        if not _api_key_configured():
+            raise RuntimeError("OPENAI_API_KEY not configured")
+        parts = []
+        for token in stream_chat(get_openai_client(), **self._request(question, state)):
+            parts.append(token)
+            yield token
+        self.on_answer(question, "".join(parts), None)
+
+    async def astream(self, question: str, state: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        if not _api_key_configured():
+            raise RuntimeError("OPENAI_API_KEY not configured")
+        parts = []
+        request = await asyncio.to_thread(self._request, question, state)
+        async for token in astream_chat(get_openai_client(), **request):
+            parts.append(token)
+            yield token
+        self.on_answer(question, "".join(parts), None)
+
+
+class GhcDtAgent(Agent):
+    """CEO Digital Twin: model, temperature and prompt come from GHC_DT_* env vars; answers are logged as evidence"""
+
+    def config(self) -> Tuple[str, float]:
+        return os.getenv("GHC_DT_MODEL", self.model), float(os.getenv("GHC_DT_TEMPERATURE", str(self.temperature)))
+
+    def system_prompt(self, state: Dict[str, Any]) -> str:
+        context = json.dumps({field: state.get(field, default) for field, default in self.defaults.items()})
+        return os.getenv("GHC_DT_SYSTEM_PROMPT", self.prompt).format(context=context)
+
+    def on_answer(self, question: str, answer: str, tokens: Optional[int], cached: bool = False):
+        evidence_log = os.getenv("GHC_DT_EVIDENCE_LOG")
+        if evidence_log:
+            entry = {
+                "timestamp": datetime.utcnow().isoformat(),
+                "agent": self.name,
+                "question": question,
+                "answer": answer,
+                "tokens": tokens
+            }
+            if cached:
+                entry["cached"] = True
+            get_evidence_writer(evidence_log).write(entry)
+
+
+AGENTS: Dict[str, Agent] = {}
+
+
+def register(agent: Agent) -> Agent:
+    AGENTS[agent.name] = agent
+    return agent
+
+
+def get_agent(name: str) -> Agent:
+    agent = AGENTS.get(name)
+    if agent is None:
+        raise ValueError(f"Unknown agent: {name}")
+    return agent
+
+
+register(GhcDtAgent(
+    "ghc_dt",
+    """You are GHC-DT, the CEO Digital Twin of Green Hill Canarias.
+You orchestrate between agents and provide executive-level insights.
+Your style is operational, rational, and focused on execution.
+Current context: {context}""",
+    temperature=0.2,
+    defaults={"phase": "Phase 1", "zec_rate": 4, "cash_buffer_to": "2026-06-30"},
+))
+register(Agent(
+    "strategy",
+    """You are the Strategy Agent for Green Hill Canarias.
+Current phase: {phase}
+Provide strategic insights and planning guidance.""",
+    temperature=0.3,
+    defaults={"phase": "Phase 1"},
+))
+register(Agent(
+    "finance",
+    """You are the Finance FP&A Agent for Green Hill Canarias.
+ZEC tax rate: {zec_rate}%
+Cash buffer target: {cash_buffer_to}
+Provide financial analysis and planning insights.""",
+    temperature=0.2,
+    defaults={"zec_rate": 4, "cash_buffer_to": "2026-06-30"},
+))
+register(Agent(
+    "operations",
+    "You are the Operations Agent for Green Hill Canarias. Focus on operational efficiency and execution.",
+    temperature=0.3,
+))
+register(Agent(
+    "market",
+    "You are the Market Intelligence Agent for Green Hill Canarias. Analyze markets, competitors, and opportunities.",
+    temperature=0.3,
+))
+register(Agent(
+    "risk",
+    "You are the Risk Management Agent for Green Hill Canarias. Identify, assess, and mitigate risks.",
+    temperature=0.2,
+))
+register(Agent(
+    "compliance",
+    "You are the Compliance & QA Agent for Green Hill Canarias. Ensure regulatory compliance and quality.",
+    temperature=0.1,
+))
+register(Agent(
+    "innovation",
+    "You are the Innovation Agent for Green Hill Canarias. Drive innovation and explore new opportunities.",
+    temperature=0.7,
+))
+register(Agent(
+    "code",
+    "You are the Code Engineering Agent for Green Hill Canarias. Provide technical guidance and code solutions.",
+    temperature=0.3,
+))
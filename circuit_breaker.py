@@ -0,0 +1,175 @@
+"""Circuit breakers for upstream endpoints (LangGraph deployment, OpenAI API)"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Deque, Tuple
+
+CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER", "true").lower() == "true"
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_WINDOW = float(os.getenv("CIRCUIT_WINDOW", "30"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_CALLS", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open"""
+
+    def __init__(self, name: str, retry_in: float, last_error: Optional[str] = None):
+        message = f"Circuit open for {name}; retrying in {retry_in:.0f}s"
+        if last_error:
+            message += f" (last error: {last_error})"
+        super().__init__(message)
+        self.name = name
+        self.retry_in = retry_in
+        self.last_error = last_error
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over a sliding window of outcomes.
+
+    The circuit opens once at least ``min_calls`` calls in the last ``window``
+    seconds failed at a rate of ``failure_rate`` or more. While open, calls are
+    refused without touching the network. After ``open_seconds`` up to
+    ``half_open_calls`` probes are let through: a success closes the circuit,
+    a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        window: float = CIRCUIT_WINDOW,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        half_open_calls: int = CIRCUIT_HALF_OPEN_CALLS,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_started = 0.0
+        self.last_error: Optional[str] = None
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._state
+
+    def before_call(self):
+        """Reserve a call or raise ``CircuitOpenError``"""
+        if not CIRCUIT_BREAKER_ENABLED:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and (
+                self._probes < self.half_open_calls
+                # a probe that never reported back (e.g. cancelled) frees its slot
+                or now - self._probe_started >= self.open_seconds
+            ):
+                if self._probes >= self.half_open_calls:
+                    self._probes = 0
+                self._probes += 1
+                self._probe_started = now
+                return
+            self.rejected += 1
+            retry_in = max(self._opened_at + self.open_seconds - now, 0)
+            raise CircuitOpenError(self.name, retry_in, self.last_error)
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._close()
+            self._record(time.monotonic(), True)
+
+    def record_failure(self, error: Any = None):
+        now = time.monotonic()
+        with self._lock:
+            if error is not None:
+                self.last_error = str(error)
+            if self._state == HALF_OPEN:
+                self._open(now)
+                return
+            self._record(now, False)
+            calls = len(self._outcomes)
+            if self._state == CLOSED and calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+                self._open(now)
+
+    def reset(self):
+        with self._lock:
+            self._close()
+
+    # --- State transitions (caller holds self._lock) ---
+    def _advance(self, now: float):
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+
+    def _record(self, now: float, ok: bool):
+        self._outcomes.append((now, ok))
+        if not ok:
+            self._failures += 1
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            if not self._outcomes.popleft()[1]:
+                self._failures -= 1
+
+    def _open(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._probes = 0
+        self.opened += 1
+
+    def _close(self):
+        self._state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+        self._probes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._advance(time.monotonic())
+            return {
+                "state": self._state,
+                "calls": len(self._outcomes),
+                "failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Process-wide breaker for an endpoint (e.g. ``https://api.openai.com``)"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
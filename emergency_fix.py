@@ -121,10 +121,16 @@ class EmergencyResponses:
 
 import os
 import json
+import atexit
+import hashlib
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 from .emergency_mode import EmergencyResponses
 
+CACHE_TTL = timedelta(hours=float(os.getenv("EMERGENCY_CACHE_TTL_HOURS", "24")))
+CACHE_COMMIT_BATCH = int(os.getenv("EMERGENCY_CACHE_COMMIT_BATCH", "20"))
+CACHE_PURGE_EVERY = int(os.getenv("EMERGENCY_CACHE_PURGE_EVERY", "500"))
+
 class EmergencyAPIWrapper:
     '''Emergency wrapper for all API calls'''
     
@@ -133,23 +139,41 @@ class EmergencyAPIWrapper:
         self.setup_local_cache()
         
     def setup_local_cache(self):
-        '''Setup local SQLite cache for emergency mode'''
+        '''Setup local SQLite cache for emergency mode (WAL, indexed, hashed keys)'''
+        self.pending_writes = 0
+        self.writes_since_purge = 0
         try:
-            self.conn = sqlite3.connect('emergency_cache.db')
+            self.conn = sqlite3.connect('emergency_cache.db', check_same_thread=False)
+            self.conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            self.conn.execute('PRAGMA journal_mode = WAL')
+            self.conn.execute('PRAGMA synchronous = NORMAL')
             self.conn.execute('''
                 CREATE TABLE IF NOT EXISTS api_cache (
                     id INTEGER PRIMARY KEY,
                     endpoint TEXT,
-                    query TEXT,
+                    request_hash TEXT,
                     response TEXT,
                     timestamp TEXT
                 )
             ''')
+            columns = [row[1] for row in self.conn.execute('PRAGMA table_info(api_cache)')]
+            if 'request_hash' not in columns:
+                self.conn.execute('ALTER TABLE api_cache ADD COLUMN request_hash TEXT')
+            self.conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_api_cache_lookup ON api_cache (endpoint, request_hash)'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_api_cache_timestamp ON api_cache (timestamp)')
             self.conn.commit()
+            atexit.register(self.flush_cache)
         except Exception as e:
             print(f"⚠️ Cache setup failed: {e}")
             self.conn = None
             
+    @staticmethod
+    def request_hash(query):
+        '''Stable hash of the query so lookups never compare raw text'''
+        return hashlib.sha256(json.dumps(query, sort_keys=True, default=str).encode()).hexdigest()
+            
     def call_langsmith(self, query, **kwargs):
         '''Emergency LangSmith call with fallback'''
         try:
@@ -184,24 +208,32 @@ class EmergencyAPIWrapper:
                 return EmergencyResponses.get_operations_status()
                 
     def cache_response(self, endpoint, query, response):
-        '''Cache response locally'''
+        '''Cache response locally (committed in batches)'''
         if self.conn:
             try:
+                key = self.request_hash(query)
+                self.conn.execute('DELETE FROM api_cache WHERE endpoint = ? AND request_hash = ?', (endpoint, key))
                 self.conn.execute(
-                    'INSERT INTO api_cache (endpoint, query, response, timestamp) VALUES (?, ?, ?, ?)',
-                    (endpoint, query, json.dumps(response), datetime.now().isoformat())
+                    'INSERT INTO api_cache (endpoint, request_hash, response, timestamp) VALUES (?, ?, ?, ?)',
+                    (endpoint, key, json.dumps(response), datetime.now().isoformat())
                 )
-                self.conn.commit()
+                self.pending_writes += 1
+                self.writes_since_purge += 1
+                if self.pending_writes >= CACHE_COMMIT_BATCH:
+                    self.flush_cache()
+                if self.writes_since_purge >= CACHE_PURGE_EVERY:
+                    self.purge_expired()
             except Exception as e:
                 print(f"⚠️ Cache write failed: {e}")
                 
     def get_cached_response(self, endpoint, query):
-        '''Get cached response'''
+        '''Get cached response (indexed lookup on endpoint + request hash)'''
         if self.conn:
             try:
                 cursor = self.conn.execute(
-                    'SELECT response FROM api_cache WHERE endpoint = ? AND query = ? ORDER BY timestamp DESC LIMIT 1',
-                    (endpoint, query)
+                    'SELECT response FROM api_cache WHERE endpoint = ? AND request_hash = ? AND timestamp >= ? '
+                    'ORDER BY id DESC LIMIT 1',
+                    (endpoint, self.request_hash(query), (datetime.now() - CACHE_TTL).isoformat())
                 )
                 row = cursor.fetchone()
                 if row:
@@ -209,6 +241,30 @@ class EmergencyAPIWrapper:
             except Exception as e:
                 print(f"⚠️ Cache read failed: {e}")
         return None
+        
+    def flush_cache(self):
+        '''Commit buffered cache writes'''
+        if self.conn and self.pending_writes:
+            try:
+                self.conn.commit()
+                self.pending_writes = 0
+            except Exception as e:
+                print(f"⚠️ Cache commit failed: {e}")
+                
+    def purge_expired(self):
+        '''Delete expired rows and let SQLite reclaim the space'''
+        self.writes_since_purge = 0
+        if self.conn:
+            try:
+                self.conn.execute(
+                    'DELETE FROM api_cache WHERE timestamp < ?',
+                    ((datetime.now() - CACHE_TTL).isoformat(),)
+                )
+                self.conn.commit()
+                self.pending_writes = 0
+                self.conn.execute('PRAGMA incremental_vacuum')
+            except Exception as e:
+                print(f"⚠️ Cache purge failed: {e}")
 
 # Global emergency API instance
 emergency_api = EmergencyAPIWrapper()
@@ -0,0 +1,313 @@
+"""Evidence query engine: filter by agent, command and time, full-text search over Q&A
+
+The evidence log stays the source of truth. This module mirrors it into a
+SQLite database (``<log>.db``) with B-tree indexes on agent, command and
+timestamp and an FTS5 inverted index on question and answer, catching up
+incrementally from the last indexed record number before every query.
+
+Usage: python evidence_index.py [text] [--agent A] [--command C] [--since T] [--until T] [--limit N] [--before CURSOR] [--json]
+"""
+import os
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple
+
+from evidence_log import EvidenceLog, get_evidence_log, flush_evidence, parse_timestamp
+
+EVIDENCE_INDEX_DB = os.getenv("EVIDENCE_INDEX_DB")
+EVIDENCE_INDEX_BATCH = int(os.getenv("EVIDENCE_INDEX_BATCH", "2000"))
+
+DEFAULT_AGENT = "ghc_dt"  # the graph nodes log without an agent field
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS evidence (
+    id INTEGER PRIMARY KEY,
+    ts REAL,
+    agent TEXT,
+    command TEXT,
+    question TEXT NOT NULL DEFAULT '',
+    answer TEXT NOT NULL DEFAULT '',
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_evidence_ts ON evidence (ts);
+CREATE INDEX IF NOT EXISTS idx_evidence_agent ON evidence (agent, id);
+CREATE INDEX IF NOT EXISTS idx_evidence_command ON evidence (command, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS evidence_fts USING fts5 (
+    question, answer,
+    content = 'evidence', content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS index_state (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def fts_query(text: str) -> Optional[str]:
+    """User search text to an FTS5 query: every word must match, ``word*`` is a prefix"""
+    terms = [
+        f'"{word}"*' if star else f'"{word}"'
+        for word, star in re.findall(r"(\w+)(\*?)", text or "")
+    ]
+    return " ".join(terms) or None
+
+
+def index_row(number: int, record: Dict[str, Any]) -> Tuple:
+    """Columns for one evidence record; older writers used ``question`` instead of ``query``"""
+    meta = record.get("meta") if isinstance(record.get("meta"), dict) else {}
+    question = record.get("query") or record.get("question") or ""
+    answer = record.get("answer") or ""
+    return (
+        number,
+        parse_timestamp(record.get("timestamp")),
+        record.get("agent") or meta.get("agent") or DEFAULT_AGENT,
+        record.get("command"),
+        question if isinstance(question, str) else json.dumps(question),
+        answer if isinstance(answer, str) else json.dumps(answer),
+        json.dumps(record),
+    )
+
+
+class EvidenceIndex:
+    """Queryable SQLite mirror of an EvidenceLog"""
+
+    def __init__(self, log: EvidenceLog, path: Optional[str] = None):
+        self.log = log
+        self.path = path or EVIDENCE_INDEX_DB or log.path + ".db"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # --- Indexing ---
+    def sync(self) -> int:
+        """Index records appended since the last sync; returns how many were added.
+
+        The app, the API server and the CLI may sync the same database at
+        once, so every step re-reads the index state inside its write
+        transaction and each record is indexed exactly once.
+        """
+        flush_evidence(self.log.path)  # include records still queued in this process
+        with self._lock:
+            end, first = len(self.log), self.log.first
+            with self._write():
+                if self._state("indexed_upto") > end:
+                    # The log was replaced or reset: start over
+                    self._reset()
+                if self._state("first") < first:
+                    # Retention dropped old segments: drop their rows too
+                    self._conn.execute(
+                        "INSERT INTO evidence_fts (evidence_fts, rowid, question, answer) "
+                        "SELECT 'delete', id, question, answer FROM evidence WHERE id < ?",
+                        (first,),
+                    )
+                    self._conn.execute("DELETE FROM evidence WHERE id < ?", (first,))
+                    self._set_state("first", first)
+
+            added = 0
+            while True:
+                with self._write():
+                    number = max(self._state("indexed_upto"), first)
+                    if number >= end:
+                        return added
+                    stop = min(number + EVIDENCE_INDEX_BATCH, end)
+                    rows = [index_row(n, record) for n, record in enumerate(self.log.read_range(number, stop), number)]
+                    # A plain INSERT: indexing a record twice is a bug, not something to paper over
+                    self._conn.executemany(
+                        "INSERT INTO evidence (id, ts, agent, command, question, answer, record) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO evidence_fts (rowid, question, answer) VALUES (?, ?, ?)",
+                        [(row[0], row[4], row[5]) for row in rows],
+                    )
+                    self._set_state("indexed_upto", stop)
+                added += len(rows)
+
+    def rebuild(self) -> int:
+        with self._lock, self._write():
+            self._reset()
+        return self.sync()
+
+    @contextmanager
+    def _write(self):
+        """Transaction holding the database's write lock from its first statement"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def _reset(self):
+        self._conn.execute("DELETE FROM evidence")
+        self._conn.execute("INSERT INTO evidence_fts (evidence_fts) VALUES ('delete-all')")
+        self._conn.execute("DELETE FROM index_state")
+
+    def _state(self, key: str) -> int:
+        row = self._conn.execute("SELECT value FROM index_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_state(self, key: str, value: int):
+        self._conn.execute("INSERT OR REPLACE INTO index_state (key, value) VALUES (?, ?)", (key, value))
+
+    # --- Querying ---
+    def search(
+        self,
+        text: Optional[str] = None,
+        agent: Optional[str] = None,
+        command: Optional[str] = None,
+        since: Any = None,
+        until: Any = None,
+        limit: int = 20,
+        before: Optional[int] = None,
+        rehydrate: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Newest-first page of matching records and the cursor for the next page.
+
+        ``since`` is inclusive and ``until`` exclusive (ISO strings or epoch
+        seconds). Pass the returned cursor as ``before`` to page backwards;
+        it is None on the last page. Each record carries its number as ``_id``
+        and, with ``rehydrate``, its full ``state`` instead of ``state_ref``.
+        """
+        self.sync()
+        where, params = self._filters(text, agent, command, since, until)
+        # Order by the FTS rowid when matching text so FTS5 walks its doclists
+        # newest first and stops at the limit instead of sorting every match
+        order = "evidence_fts.rowid" if fts_query(text) else "e.id"
+        if before is not None:
+            where.append(f"{order} < ?")
+            params.append(before)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT e.id, e.record FROM {self._source(text)} "
+                f"WHERE {' AND '.join(where) or '1'} ORDER BY {order} DESC LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+        records = [json.loads(row["record"]) for row in rows[:limit]]
+        if rehydrate:
+            records = [self.log.rehydrate(record) for record in records]
+        records = [{**record, "_id": row["id"]} for record, row in zip(records, rows)]
+        return records, (rows[limit - 1]["id"] if len(rows) > limit else None)
+
+    def count(
+        self,
+        text: Optional[str] = None,
+        agent: Optional[str] = None,
+        command: Optional[str] = None,
+        since: Any = None,
+        until: Any = None,
+    ) -> int:
+        self.sync()
+        where, params = self._filters(text, agent, command, since, until)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM {self._source(text)} WHERE {' AND '.join(where) or '1'}",
+                params,
+            ).fetchone()[0]
+
+    def facets(self) -> Dict[str, List[str]]:
+        """Distinct agents and commands present in the index"""
+        self.sync()
+        with self._lock:
+            return {
+                column: [row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT {column} FROM evidence WHERE {column} IS NOT NULL ORDER BY {column}"
+                )]
+                for column in ("agent", "command")
+            }
+
+    @staticmethod
+    def _source(text: Optional[str]) -> str:
+        if fts_query(text):
+            return "evidence_fts JOIN evidence e ON e.id = evidence_fts.rowid"
+        return "evidence e"
+
+    @staticmethod
+    def _filters(text, agent, command, since, until) -> Tuple[List[str], List[Any]]:
+        where, params = [], []
+        match = fts_query(text)
+        if match:
+            where.append("evidence_fts MATCH ?")
+            params.append(match)
+        if agent:
+            where.append("e.agent = ?")
+            params.append(agent)
+        if command:
+            where.append("e.command = ?")
+            params.append(command)
+        for value, op in ((since, ">="), (until, "<")):
+            if value is not None:
+                ts = parse_timestamp(value)
+                if ts is None:
+                    raise ValueError(f"Invalid timestamp: {value!r}")
+                where.append(f"e.ts {op} ?")
+                params.append(ts)
+        return where, params
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_indexes: Dict[str, EvidenceIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_evidence_index(path: Optional[str] = None) -> EvidenceIndex:
+    """Shared EvidenceIndex for the evidence log at ``path``"""
+    log = get_evidence_log(path)
+    with _indexes_lock:
+        if log.path not in _indexes:
+            _indexes[log.path] = EvidenceIndex(log)
+        return _indexes[log.path]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the GHC-DT evidence log")
+    parser.add_argument("text", nargs="*", help="full-text search over question and answer")
+    parser.add_argument("--log", help="evidence log path (default: GHC_DT_EVIDENCE_LOG)")
+    parser.add_argument("--agent")
+    parser.add_argument("--command")
+    parser.add_argument("--since", help="ISO timestamp or epoch seconds (inclusive)")
+    parser.add_argument("--until", help="ISO timestamp or epoch seconds (exclusive)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--before", type=int, help="cursor printed by the previous page")
+    parser.add_argument("--json", action="store_true", help="print one JSON record per line")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from the log first")
+    args = parser.parse_args(argv)
+
+    index = get_evidence_index(args.log)
+    if args.rebuild:
+        index.rebuild()
+    records, cursor = index.search(
+        " ".join(args.text), args.agent, args.command, args.since, args.until, args.limit, args.before
+    )
+    for record in records:
+        if args.json:
+            print(json.dumps(record, ensure_ascii=False))
+            continue
+        question = record.get("query") or record.get("question") or ""
+        answer = " ".join(str(record.get("answer") or "").split())
+        print(f"[{record['_id']}] {record.get('timestamp')}  {record.get('agent') or DEFAULT_AGENT}"
+              f"{'/' + record['command'] if record.get('command') else ''}")
+        print(f"  Q: {question}")
+        print(f"  A: {answer[:200]}{'…' if len(answer) > 200 else ''}")
+    if cursor is not None:
+        print(f"-- more: --before {cursor}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
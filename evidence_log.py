@@ -0,0 +1,775 @@
+"""Append-only evidence log with a sidecar offset index for fast tail and seek"""
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import logging
+import struct
+import bisect
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EVIDENCE_LOG = os.getenv("GHC_DT_EVIDENCE_LOG", "evidence.jsonl")
+
+# Rotation: close the active segment once it reaches either limit (0 disables)
+EVIDENCE_LOG_MAX_BYTES = int(os.getenv("EVIDENCE_LOG_MAX_BYTES", str(16 * 1024 * 1024)))
+EVIDENCE_LOG_MAX_AGE = float(os.getenv("EVIDENCE_LOG_MAX_AGE", str(7 * 24 * 3600)))
+# Retention of closed segments (0 disables the limit)
+EVIDENCE_LOG_KEEP_SEGMENTS = int(os.getenv("EVIDENCE_LOG_KEEP_SEGMENTS", "52"))
+EVIDENCE_LOG_KEEP_BYTES = int(os.getenv("EVIDENCE_LOG_KEEP_BYTES", str(256 * 1024 * 1024)))
+# "zstd" or "gzip"; defaults to zstd when the zstandard package is installed
+EVIDENCE_LOG_COMPRESSION = os.getenv("EVIDENCE_LOG_COMPRESSION", "zstd" if zstandard is not None else "gzip")
+
+SEGMENT_SUFFIX = {"zstd": ".zst", "gzip": ".gz"}
+
+# Background writer: a full queue falls back to a synchronous append
+EVIDENCE_WRITER_QUEUE = int(os.getenv("EVIDENCE_WRITER_QUEUE", "10000"))
+EVIDENCE_WRITER_BATCH = int(os.getenv("EVIDENCE_WRITER_BATCH", "256"))
+# "always" (every batch), "interval" (at most every EVIDENCE_FSYNC_INTERVAL s) or "never"
+EVIDENCE_FSYNC = os.getenv("EVIDENCE_FSYNC", "interval")
+EVIDENCE_FSYNC_INTERVAL = float(os.getenv("EVIDENCE_FSYNC_INTERVAL", "1.0"))
+
+# Store each distinct ``state`` once in <log>.states.jsonl and reference it by hash
+EVIDENCE_DEDUPE_STATE = os.getenv("EVIDENCE_DEDUPE_STATE", "true").lower() == "true"
+
+# One index record per log line: byte offset, byte length, epoch timestamp
+INDEX_RECORD = struct.Struct("<QId")
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """ISO-8601 (naive values are UTC, as written by datetime.utcnow) to epoch seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _decode(line: bytes) -> Dict[str, Any]:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return {"timestamp": None, "raw": line.decode("utf-8", "replace").rstrip("\n")}
+
+
+def encode(entry: Dict[str, Any]) -> Tuple[bytes, Optional[float]]:
+    """JSONL line and epoch timestamp for an evidence record"""
+    return (json.dumps(entry) + "\n").encode("utf-8"), parse_timestamp(entry.get("timestamp"))
+
+
+class _FileLock:
+    """Advisory lock on a sidecar file so several processes can append safely"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+
+    def __enter__(self):
+        self._handle = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+        self._handle.close()
+        self._handle = None
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("EVIDENCE_LOG_COMPRESSION=zstd requires the zstandard package")
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Reading zstd evidence segments requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class StateSnapshots:
+    """Content-addressed store of distinct state dicts, one JSON line each.
+
+    A state is keyed by the hash of its canonical JSON, so identical states
+    share one line however many evidence records reference them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file_lock = _FileLock(path + ".lock")
+        self._spans: Dict[str, Tuple[int, int]] = {}
+        self._scanned = 0
+
+    @staticmethod
+    def canonical(state: Dict[str, Any]) -> str:
+        return json.dumps(state, sort_keys=True, separators=(",", ":"), default=str)
+
+    def put(self, state: Dict[str, Any]) -> str:
+        """Store ``state`` if it is new and return its reference"""
+        canonical = self.canonical(state)
+        ref = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+        with self._lock:
+            if ref in self._spans:
+                return ref
+            with self._file_lock:
+                self._scan()  # another process may have stored it already
+                if ref not in self._spans:
+                    line = f'{{"ref":"{ref}","state":{canonical}}}\n'.encode("utf-8")
+                    with open(self.path, "ab") as f:
+                        offset = f.seek(0, os.SEEK_END)
+                        f.write(line)
+                    self._spans[ref] = (offset, len(line))
+                    self._scanned = offset + len(line)
+        return ref
+
+    def get(self, ref: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if ref not in self._spans:
+                self._scan()
+            span = self._spans.get(ref)
+            if span is None:
+                return None
+            with open(self.path, "rb") as f:
+                f.seek(span[0])
+                return json.loads(f.read(span[1]))["state"]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._scan()
+            return len(self._spans)
+
+    def _scan(self):
+        """Pick up states appended since the last scan (caller holds self._lock)"""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) <= self._scanned:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._scanned)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    self._spans[json.loads(line)["ref"]] = (self._scanned, len(line))
+                except (ValueError, KeyError):
+                    pass
+                self._scanned += len(line)
+
+
+class EvidenceLog:
+    """JSONL evidence log plus a ``<path>.idx`` file of fixed-width records.
+
+    The index makes the last N records, backwards paging and timestamp seeks
+    cost O(N) or O(log n) reads instead of a scan of the whole log. Lines
+    appended by writers that bypass this class are indexed on the next read;
+    a truncated or replaced log triggers a rebuild.
+
+    ``path`` is the active segment. Once it exceeds ``max_bytes`` or its
+    first record is older than ``max_age`` seconds it is compressed into a
+    closed segment (``<path>.000001.zst``) and listed in
+    ``<path>.manifest.json`` with its time range and record count. Record
+    numbers run across segments; reads only open the segments they touch,
+    and the oldest segments are deleted beyond ``keep_segments`` or
+    ``keep_bytes``.
+
+    With ``dedupe_state`` an entry's ``state`` dict is written once to
+    ``<path>.states.jsonl`` and the record carries its ``state_ref``;
+    ``rehydrate`` restores the original record.
+    """
+
+    def __init__(
+        self,
+        path: str = EVIDENCE_LOG,
+        max_bytes: int = EVIDENCE_LOG_MAX_BYTES,
+        max_age: float = EVIDENCE_LOG_MAX_AGE,
+        keep_segments: int = EVIDENCE_LOG_KEEP_SEGMENTS,
+        keep_bytes: int = EVIDENCE_LOG_KEEP_BYTES,
+        compression: str = EVIDENCE_LOG_COMPRESSION,
+        dedupe_state: bool = EVIDENCE_DEDUPE_STATE,
+    ):
+        if compression not in SEGMENT_SUFFIX:
+            raise ValueError(f"Unknown evidence log compression: {compression!r}")
+        self.path = path
+        self.index_path = path + ".idx"
+        self.manifest_path = path + ".manifest.json"
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.keep_segments = keep_segments
+        self.keep_bytes = keep_bytes
+        self.compression = compression
+        self.dedupe_state = dedupe_state
+        self.states = StateSnapshots(path + ".states.jsonl")
+        self._lock = threading.Lock()
+        self._file_lock = _FileLock(path + ".lock")
+        self._manifest_cache: Tuple[Any, Dict[str, Any]] = (None, {})
+        self._segment_cache: Tuple[Optional[int], List[bytes]] = (None, [])
+        self._timestamps_cache: Tuple[Optional[int], List[float]] = (None, [])
+
+    # --- Writing ---
+    def append(self, entry: Dict[str, Any]) -> int:
+        """Append one record and return its record number"""
+        return self.append_many([entry])[0]
+
+    def append_many(self, entries: List[Dict[str, Any]], fsync: bool = False) -> List[int]:
+        """Append records in a single write and return their record numbers"""
+        return self.append_encoded([self.encode(entry) for entry in entries], fsync)
+
+    def encode(self, entry: Dict[str, Any]) -> Tuple[bytes, Optional[float]]:
+        """``encode()`` with the state snapshot swapped for its reference"""
+        if self.dedupe_state and isinstance(entry.get("state"), dict):
+            entry = {
+                ("state_ref" if key == "state" else key): (self.states.put(value) if key == "state" else value)
+                for key, value in entry.items()
+            }
+        return encode(entry)
+
+    def append_encoded(self, records: List[Tuple[bytes, Optional[float]]], fsync: bool = False) -> List[int]:
+        """Append ``encode()``d records in a single write; ``fsync`` makes it durable"""
+        with self._lock, self._file_lock:
+            self._finish_rotation()
+            count = self._sync_index(file_locked=True)
+            base = self._manifest()["next_record"]
+            with open(self.path, "ab") as log:
+                offset = log.seek(0, os.SEEK_END)
+                log.write(b"".join(line for line, _ in records))
+                if fsync:
+                    log.flush()
+                    os.fsync(log.fileno())
+            last_ts = self._last_timestamp(count)
+            index_records = []
+            for line, ts in records:
+                last_ts = ts or last_ts
+                index_records.append(INDEX_RECORD.pack(offset, len(line), last_ts))
+                offset += len(line)
+            with open(self.index_path, "ab") as index:
+                index.write(b"".join(index_records))
+            if self._rotation_due(offset, count + len(records)):
+                self._rotate()
+        return list(range(base + count, base + count + len(records)))
+
+    def fsync(self):
+        """Flush appended records to stable storage"""
+        with self._lock:
+            if os.path.exists(self.path):
+                with open(self.path, "ab") as log:
+                    os.fsync(log.fileno())
+
+    def rotate(self) -> Optional[Dict[str, Any]]:
+        """Close the active segment now; returns its manifest entry (None if empty)"""
+        with self._lock, self._file_lock:
+            self._finish_rotation()
+            return self._rotate()
+
+    # --- Reading ---
+    def rehydrate(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Record as originally written, with ``state_ref`` resolved to ``state``"""
+        ref = record.get("state_ref")
+        state = self.states.get(ref) if isinstance(ref, str) else None
+        if state is None:
+            return record
+        return {("state" if key == "state_ref" else key): (state if key == "state_ref" else value)
+                for key, value in record.items()}
+
+    def __len__(self) -> int:
+        """Number one past the newest record (older numbers may have been pruned)"""
+        with self._lock:
+            return self._manifest()["next_record"] + self._sync_index()
+
+    @property
+    def first(self) -> int:
+        """Number of the oldest record still on disk"""
+        with self._lock:
+            manifest = self._manifest()
+            segments = manifest["segments"]
+            return segments[0]["first"] if segments else manifest["next_record"]
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """Manifest entries of the closed segments, oldest first"""
+        with self._lock:
+            return [dict(segment) for segment in self._manifest()["segments"]]
+
+    def read(self, number: int) -> Dict[str, Any]:
+        return self.read_range(number, number + 1)[0]
+
+    def read_range(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        """Records ``start`` (inclusive) to ``stop`` (exclusive), oldest first"""
+        with self._lock:
+            manifest = self._manifest()
+            base = manifest["next_record"]
+            records = []
+            for segment in manifest["segments"]:
+                lo, hi = max(start, segment["first"]), min(stop, segment["first"] + segment["records"])
+                if lo < hi:
+                    lines = self._load_segment(segment)
+                    records.extend(_decode(line) for line in lines[lo - segment["first"]:hi - segment["first"]])
+            records.extend(self._read_active(max(start - base, 0), stop - base))
+        return records
+
+    def tail(self, n: int = 20) -> List[Dict[str, Any]]:
+        """The last ``n`` records, newest first"""
+        count = len(self)
+        return list(reversed(self.read_range(count - n, count)))
+
+    def page(self, before: Optional[int] = None, limit: int = 20) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Newest-first page of records numbered below ``before``.
+
+        Returns ``(records, cursor)``; pass ``cursor`` as ``before`` for the
+        next (older) page. ``cursor`` is None once the oldest record is reached.
+        """
+        end = len(self) if before is None else before
+        start = max(end - limit, self.first)
+        records = list(reversed(self.read_range(start, end)))
+        return records, (start if start > self.first else None)
+
+    def seek(self, timestamp: Any) -> int:
+        """Number of the first record at or after ``timestamp`` (ISO string or epoch)"""
+        target = parse_timestamp(timestamp)
+        if target is None:
+            raise ValueError(f"Invalid timestamp: {timestamp!r}")
+        with self._lock:
+            manifest = self._manifest()
+            for segment in manifest["segments"]:
+                if segment["end_ts"] >= target:
+                    return segment["first"] + bisect.bisect_left(self._segment_timestamps(segment), target)
+            count = self._sync_index()
+            with open(self.index_path, "rb") as index:
+                return manifest["next_record"] + bisect.bisect_left(_IndexTimestamps(index, count), target)
+
+    def since(self, start: Any, end: Any = None, batch: int = 500) -> Iterator[Dict[str, Any]]:
+        """Records from ``start`` up to (excluding) ``end``, oldest first"""
+        number = self.seek(start)
+        stop = self.seek(end) if end is not None else len(self)
+        while number < stop:
+            for record in self.read_range(number, min(number + batch, stop)):
+                yield record
+            number += batch
+
+    # --- Active segment (caller holds self._lock) ---
+    def _read_active(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        count = self._sync_index()
+        start, stop = max(start, 0), min(stop, count)
+        if start >= stop:
+            return []
+        with open(self.index_path, "rb") as index:
+            index.seek(start * INDEX_RECORD.size)
+            raw = index.read((stop - start) * INDEX_RECORD.size)
+        spans = [INDEX_RECORD.unpack_from(raw, i * INDEX_RECORD.size)[:2] for i in range(stop - start)]
+        first, last = spans[0][0], spans[-1][0] + spans[-1][1]
+        with open(self.path, "rb") as log:
+            log.seek(first)
+            block = log.read(last - first)
+        return [_decode(block[offset - first:offset - first + length]) for offset, length in spans]
+
+    def _first_timestamp(self) -> Optional[float]:
+        with open(self.index_path, "rb") as index:
+            raw = index.read(INDEX_RECORD.size)
+        return INDEX_RECORD.unpack(raw)[2] if len(raw) == INDEX_RECORD.size else None
+
+    # --- Segments (caller holds self._lock) ---
+    def _manifest(self) -> Dict[str, Any]:
+        """Current manifest, re-read only when another process has replaced it"""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return {"next_id": 1, "next_record": 0, "segments": []}
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if self._manifest_cache[0] != key:
+            with open(self.manifest_path) as f:
+                self._manifest_cache = (key, json.load(f))
+        return self._manifest_cache[1]
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.manifest_path)
+
+    def _segment_path(self, segment: Dict[str, Any]) -> str:
+        return os.path.join(os.path.dirname(self.path), segment["file"])
+
+    def _load_segment(self, segment: Dict[str, Any]) -> List[bytes]:
+        """Decompressed lines of a closed segment (the last one read is cached)"""
+        if self._segment_cache[0] != segment["id"]:
+            with open(self._segment_path(segment), "rb") as f:
+                data = _decompress(f.read(), segment["codec"])
+            self._segment_cache = (segment["id"], [line + b"\n" for line in data.split(b"\n")[:-1]])
+        return self._segment_cache[1]
+
+    def _segment_timestamps(self, segment: Dict[str, Any]) -> List[float]:
+        """Per-record timestamps of a closed segment, decoded only when seeking"""
+        if self._timestamps_cache[0] != segment["id"]:
+            timestamps, last_ts = [], segment["start_ts"]
+            for line in self._load_segment(segment):
+                last_ts = parse_timestamp(_decode(line).get("timestamp")) or last_ts
+                timestamps.append(last_ts)
+            self._timestamps_cache = (segment["id"], timestamps)
+        return self._timestamps_cache[1]
+
+    def _rotation_due(self, size: int, count: int) -> bool:
+        if count == 0:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        if self.max_age:
+            first_ts = self._first_timestamp()
+            return first_ts is not None and time.time() - first_ts >= self.max_age
+        return False
+
+    def _rotate(self) -> Optional[Dict[str, Any]]:
+        """Compress the active segment into a closed one (caller holds both locks)"""
+        count = self._sync_index(file_locked=True)
+        if count == 0:
+            return None
+        manifest = self._manifest()
+        with open(self.path, "rb") as log:
+            data = log.read()
+        with open(self.index_path, "rb") as index:
+            raw = index.read()
+        # Only whole, indexed lines are archived; a partial tail stays active
+        end = sum(INDEX_RECORD.unpack_from(raw, (count - 1) * INDEX_RECORD.size)[:2])
+        start_ts = INDEX_RECORD.unpack_from(raw, 0)[2]
+        end_ts = INDEX_RECORD.unpack_from(raw, (count - 1) * INDEX_RECORD.size)[2]
+
+        segment_id = manifest["next_id"]
+        segment = {
+            "id": segment_id,
+            "file": f"{os.path.basename(self.path)}.{segment_id:06d}{SEGMENT_SUFFIX[self.compression]}",
+            "codec": self.compression,
+            "first": manifest["next_record"],
+            "records": count,
+            "start_ts": start_ts,
+            "end_ts": end_ts,
+            "bytes": 0,
+            "raw_bytes": end,
+        }
+        compressed = _compress(data[:end], self.compression)
+        segment["bytes"] = len(compressed)
+        tmp = self._segment_path(segment) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._segment_path(segment))
+
+        segments = manifest["segments"] + [segment]
+        pruned = self._prune(segments)
+        # The manifest is the commit point; "rotated" lets a crash before the
+        # active segment is replaced be finished on the next append
+        self._write_manifest({
+            "next_id": segment_id + 1,
+            "next_record": manifest["next_record"] + count,
+            "segments": segments,
+            "rotated": {"inode": os.stat(self.path).st_ino, "end": end},
+        })
+        self._finish_rotation()
+        for old in pruned:
+            try:
+                os.remove(self._segment_path(old))
+            except FileNotFoundError:
+                pass
+        return segment
+
+    def _finish_rotation(self):
+        """Drop already-archived bytes from the active segment if still present"""
+        rotated = self._manifest().get("rotated")
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if not rotated or stat.st_ino != rotated["inode"] or stat.st_size < rotated["end"]:
+            return
+        with open(self.path, "rb") as log:
+            log.seek(rotated["end"])
+            rest = log.read()
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(rest)
+        os.replace(tmp, self.path)
+        segments = self._manifest()["segments"]
+        open(self.index_path, "wb").close()
+        self._index_from(0, segments[-1]["end_ts"] if segments else 0.0)
+
+    def _prune(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop the oldest segments beyond the retention limits; returns them"""
+        pruned = []
+        while len(segments) > 1 and (
+            (self.keep_segments and len(segments) > self.keep_segments)
+            or (self.keep_bytes and sum(s["bytes"] for s in segments) > self.keep_bytes)
+        ):
+            pruned.append(segments.pop(0))
+        return pruned
+
+    # --- Index maintenance (caller holds self._lock) ---
+    def _last_timestamp(self, count: int) -> float:
+        if count == 0:
+            return 0.0
+        with open(self.index_path, "rb") as index:
+            index.seek((count - 1) * INDEX_RECORD.size)
+            return INDEX_RECORD.unpack(index.read(INDEX_RECORD.size))[2]
+
+    def _sync_index(self, file_locked: bool = False) -> int:
+        """Bring the index in line with the log and return the record count"""
+        log_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        count = index_size // INDEX_RECORD.size
+
+        indexed_end = 0
+        if count and not index_size % INDEX_RECORD.size:
+            with open(self.index_path, "rb") as index:
+                index.seek((count - 1) * INDEX_RECORD.size)
+                offset, length, _ = INDEX_RECORD.unpack(index.read(INDEX_RECORD.size))
+            indexed_end = offset + length
+        if log_size == indexed_end and not index_size % INDEX_RECORD.size:
+            return count
+
+        # Repairs write to the index: serialise with appenders in other processes
+        if not file_locked:
+            with self._file_lock:
+                return self._sync_index(file_locked=True)
+        if index_size % INDEX_RECORD.size or log_size < indexed_end:
+            return self._rebuild_index()
+        return count + self._index_from(indexed_end, self._last_timestamp(count))
+
+    def _rebuild_index(self) -> int:
+        open(self.index_path, "wb").close()
+        return self._index_from(0, 0.0)
+
+    def _index_from(self, offset: int, last_ts: float) -> int:
+        """Index complete lines from ``offset`` onwards; returns how many were added"""
+        if not os.path.exists(self.path):
+            return 0
+        records = []
+        with open(self.path, "rb") as log:
+            log.seek(offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    break  # partially written line; index it once complete
+                last_ts = parse_timestamp(_decode(line).get("timestamp")) or last_ts
+                records.append(INDEX_RECORD.pack(offset, len(line), last_ts))
+                offset += len(line)
+        with open(self.index_path, "ab") as index:
+            index.write(b"".join(records))
+        return len(records)
+
+
+class _IndexTimestamps:
+    """Lazy sequence view of index timestamps for bisect"""
+
+    def __init__(self, index, count: int):
+        self.index = index
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> float:
+        self.index.seek(i * INDEX_RECORD.size)
+        return INDEX_RECORD.unpack(self.index.read(INDEX_RECORD.size))[2]
+
+
+_logs: Dict[str, EvidenceLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_evidence_log(path: Optional[str] = None) -> EvidenceLog:
+    """Shared EvidenceLog per path (defaults to GHC_DT_EVIDENCE_LOG)"""
+    path = os.path.abspath(path or os.getenv("GHC_DT_EVIDENCE_LOG", EVIDENCE_LOG))
+    with _logs_lock:
+        if path not in _logs:
+            _logs[path] = EvidenceLog(path)
+        return _logs[path]
+
+
+class EvidenceWriter:
+    """Moves evidence appends off the request path.
+
+    ``write`` serialises the record and queues it; a daemon thread appends
+    whatever has accumulated in one batch. When the queue is full the record
+    is appended synchronously instead of being dropped, and ``close`` (run at
+    interpreter exit) drains everything still queued.
+    """
+
+    def __init__(
+        self,
+        log: EvidenceLog,
+        max_queue: int = EVIDENCE_WRITER_QUEUE,
+        batch_size: int = EVIDENCE_WRITER_BATCH,
+        fsync: str = EVIDENCE_FSYNC,
+        fsync_interval: float = EVIDENCE_FSYNC_INTERVAL,
+    ):
+        if fsync not in ("always", "interval", "never"):
+            raise ValueError(f"Unknown evidence fsync policy: {fsync!r}")
+        self.log = log
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._queue: "queue.Queue[Optional[Tuple[bytes, Optional[float]]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        self.written = 0
+        self.batches = 0
+        self.overflows = 0
+        self.errors = 0
+
+    def write(self, entry: Dict[str, Any]):
+        record = self.log.encode(entry)  # serialise now: callers may keep mutating entry
+        if self._closed:
+            self.log.append_encoded([record], fsync=self.fsync != "never")
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.overflows += 1
+            self.log.append_encoded([record], fsync=self.fsync == "always")
+
+    def flush(self):
+        """Block until every record queued so far has been appended"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Drain the queue and stop the writer thread"""
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+        # Records that raced with the sentinel are appended here
+        leftover = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                leftover.append(record)
+        if leftover:
+            self.log.append_encoded(leftover)
+            self._dirty = True
+        if self._dirty:
+            self.log.fsync()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="evidence-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                first = self._queue.get(timeout=self.fsync_interval if self._dirty else None)
+            except queue.Empty:
+                self._sync()
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            records = [record for record in batch if record is not None]
+            if records:
+                self._append(records)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _append(self, records: List[Tuple[bytes, Optional[float]]]):
+        for attempt in range(3):
+            try:
+                self.log.append_encoded(records, fsync=self.fsync == "always")
+                break
+            except Exception:
+                logger.exception(f"Evidence write of {len(records)} records failed (attempt {attempt + 1})")
+                time.sleep(0.1 * (attempt + 1))
+        else:
+            self.errors += len(records)
+            return
+        self.written += len(records)
+        self.batches += 1
+        if self.fsync == "interval":
+            self._dirty = True
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _sync(self):
+        try:
+            self.log.fsync()
+        except OSError:
+            logger.exception("Evidence fsync failed")
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "overflows": self.overflows,
+            "errors": self.errors,
+            "fsync": self.fsync,
+        }
+
+
+_writers: Dict[str, EvidenceWriter] = {}
+
+
+def get_evidence_writer(path: Optional[str] = None) -> EvidenceWriter:
+    """Shared background EvidenceWriter for the evidence log at ``path``"""
+    log = get_evidence_log(path)
+    with _logs_lock:
+        if log.path not in _writers:
+            _writers[log.path] = EvidenceWriter(log)
+        return _writers[log.path]
+
+
+def flush_evidence(path: Optional[str] = None):
+    """Wait for queued records of ``path`` (no-op if nothing writes there in the background)"""
+    writer = _writers.get(get_evidence_log(path).path)
+    if writer is not None:
+        writer.flush()
+
+
+@atexit.register
+def _close_writers():
+    for writer in list(_writers.values()):
+        writer.close()
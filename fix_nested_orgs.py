@@ -327,6 +327,11 @@ class NestedOrgEmergencyFixer:
                 cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_cached_responses_lookup
+            ON cached_responses (api_endpoint, request_hash)
+        ''')
+        cursor.execute('PRAGMA journal_mode = WAL')
         
         conn.commit()
         conn.close()
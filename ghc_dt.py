@@ -1,16 +1,18 @@
 import os
 import json
 from datetime import datetime
-from typing import Optional, Dict, Any, TypedDict
+from typing import Optional, Dict, Any, TypedDict, Iterator
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from openai_client import get_chat_model
+from evidence_log import get_evidence_writer
 
-class GHCDTState(TypedDict):
+class GHCDTState(TypedDict, total=False):
     question: str
     answer: str
     agent_type: str
     meta: dict
+    state: dict  # governance state (phase, zec_rate, ...), optional
 
 def ghc_dt_node(state: GHCDTState) -> GHCDTState:
     """
@@ -24,15 +26,18 @@ def ghc_dt_node(state: GHCDTState) -> GHCDTState:
         "GHC_DT_SYSTEM_PROMPT",
         "You are GHC-DT, the CEO Digital Twin of Green Hill Canarias. Be concise, executive, and action-oriented. If information is unknown, say 'Unknown'. Structure answers as: Summary, Key Points, Next Actions. Avoid internal file names in public outputs. Log evidence if enabled."
     )
+    governance = state.get("state")
+    if governance:
+        context = json.dumps(governance)
+        if "{context}" in system_prompt:
+            system_prompt = system_prompt.replace("{context}", context)
+        else:
+            system_prompt += f"\nCurrent context: {context}"
     model = os.getenv("GHC_DT_MODEL", "gpt-4o-mini")
     temperature = float(os.getenv("GHC_DT_TEMPERATURE", "0.2"))
     
-    # Use LangChain ChatOpenAI instead of direct OpenAI client
-    llm = ChatOpenAI(
-        model=model,
-        temperature=temperature,
-        openai_api_key=os.getenv("OPENAI_API_KEY")
-    )
+    # Use LangChain ChatOpenAI instead of direct OpenAI client (memoized per config)
+    llm = get_chat_model(model, temperature, os.getenv("OPENAI_API_KEY"))
     
     messages = [
         SystemMessage(content=system_prompt),
@@ -56,12 +61,13 @@ def ghc_dt_node(state: GHCDTState) -> GHCDTState:
             "timestamp": datetime.utcnow().isoformat(),
             "question": question,
             "answer": answer,
-            "state": state,
+            # The question is logged above; the rest of the graph state
+            # repeats across calls and is stored once as a snapshot
+            "state": {k: v for k, v in state.items() if k != "question"},
             "meta": result["meta"]
         }
         try:
-            with open(evidence_log, "a") as f:
-                f.write(json.dumps(log_entry) + "\n")
+            get_evidence_writer(evidence_log).write(log_entry)
         except Exception:
             pass  # Do not fail on logging errors
     
@@ -88,7 +94,8 @@ def run_ghc_dt(question: str, state: Optional[dict] = None) -> dict:
         "question": question,
         "answer": "",
         "agent_type": "ghc_dt",
-        "meta": {}
+        "meta": {},
+        "state": state or {}
     }
     
     result = ghc_dt_graph.invoke(input_state)
@@ -96,4 +103,21 @@ def run_ghc_dt(question: str, state: Optional[dict] = None) -> dict:
     return {
         "answer": result["answer"],
         "meta": result["meta"]
-    }
\ No newline at end of file
+    }
+
+def stream_ghc_dt(question: str, state: Optional[dict] = None) -> Iterator[str]:
+    """
+    Stream the GHC-DT answer token by token.
+    Runs the same graph in LangGraph "messages" mode, so ghc_dt_node still logs evidence.
+    """
+    input_state = {
+        "question": question,
+        "answer": "",
+        "agent_type": "ghc_dt",
+        "meta": {},
+        "state": state or {}
+    }
+    
+    for chunk, metadata in ghc_dt_graph.stream(input_state, stream_mode="messages"):
+        if metadata.get("langgraph_node") == "ghc_dt" and chunk.content:
+            yield chunk.content
@@ -1,10 +1,10 @@
 import os
-import json
 from datetime import datetime
-from typing import Optional, Dict, Any, TypedDict
+from typing import Optional, Dict, Any, TypedDict, Iterator
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
+from openai_client import get_chat_model
+from evidence_log import get_evidence_writer
 
 
 class GHCDTState(TypedDict):
@@ -26,11 +26,7 @@ def ghc_dt_node(state: GHCDTState) -> GHCDTState:
     model = os.getenv("GHC_DT_MODEL", "gpt-4o-mini")
     temperature = float(os.getenv("GHC_DT_TEMPERATURE", "0.2"))
 
-    llm = ChatOpenAI(
-        model=model,
-        temperature=temperature,
-        openai_api_key=os.getenv("OPENAI_API_KEY"),
-    )
+    llm = get_chat_model(model, temperature, os.getenv("OPENAI_API_KEY"))
 
     messages = [
         SystemMessage(content=system_prompt),
@@ -53,12 +49,13 @@ def ghc_dt_node(state: GHCDTState) -> GHCDTState:
             "timestamp": datetime.utcnow().isoformat(),
             "question": question,
             "answer": answer,
-            "state": state,
+            # The question is logged above; the rest of the graph state
+            # repeats across calls and is stored once as a snapshot
+            "state": {k: v for k, v in state.items() if k != "question"},
             "meta": result["meta"],
         }
         try:
-            with open(evidence_log, "a") as f:
-                f.write(json.dumps(log_entry) + "\n")
+            get_evidence_writer(evidence_log).write(log_entry)
         except Exception:
             pass  # Do not fail on logging errors
 
@@ -95,3 +92,25 @@ def run_ghc_dt(question: str, state: Optional[dict] = None) -> dict:
         return {"answer": result["answer"], "meta": result["meta"]}
     except Exception:
         return {"answer": f"Echo: {question}", "meta": {}}
+
+
+def stream_ghc_dt(question: str, state: Optional[dict] = None) -> Iterator[str]:
+    """Stream the GHC-DT answer token by token.
+
+    Uses LangGraph's ``messages`` stream mode and falls back to the same echo
+    response as ``run_ghc_dt`` when ``OPENAI_API_KEY`` is not configured.
+    """
+    if not os.getenv("OPENAI_API_KEY"):
+        yield f"Echo: {question}"
+        return
+
+    input_state = {
+        "question": question,
+        "answer": "",
+        "agent_type": "ghc_dt",
+        "meta": {},
+    }
+
+    for chunk, metadata in ghc_dt_graph.stream(input_state, stream_mode="messages"):
+        if metadata.get("langgraph_node") == "ghc_dt" and chunk.content:
+            yield chunk.content
@@ -0,0 +1,108 @@
+"""Shared requests.Session for calls to the LangGraph deployment (pooling, keep-alive, retries, circuit breaking)"""
+import os
+import threading
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from circuit_breaker import CircuitOpenError, get_breaker
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+HTTP_RETRY_JITTER = float(os.getenv("HTTP_RETRY_JITTER", "0.5"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# POST /invoke and /threads/runs are not idempotent: a 500 or 504 can come after
+# the graph already called the LLM, so only resend when the request was not served
+UNSERVED_STATUSES = frozenset((429, 502, 503))
+# Responses that count against an endpoint's circuit (auth failures included:
+# a deployment rejecting our key will keep rejecting it)
+BREAKER_STATUSES = frozenset((401, 403, 429, 500, 502, 503, 504))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def timeout(read: Optional[float] = None) -> Tuple[float, float]:
+    """(connect, read) timeout tuple; a short connect timeout fails fast on a dead host"""
+    return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT if read is None else read)
+
+
+class EndpointOpenError(CircuitOpenError, requests.exceptions.ConnectionError):
+    """Circuit-open refusal that callers catching RequestException already handle"""
+
+
+class BreakerAdapter(HTTPAdapter):
+    """HTTPAdapter that consults a per-endpoint circuit breaker around each request"""
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        breaker = get_breaker(f"{parts.scheme}://{parts.netloc}")
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            raise EndpointOpenError(e.name, e.retry_in, e.last_error) from None
+        try:
+            response = super().send(request, **kwargs)
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        if response.status_code in BREAKER_STATUSES:
+            breaker.record_failure(f"{response.status_code} {response.reason}")
+        else:
+            breaker.record_success()
+        return response
+
+
+class IdempotencyAwareRetry(Retry):
+    """Retry every status in the forcelist for idempotent methods, only unserved ones for the rest"""
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if method.upper() not in Retry.DEFAULT_ALLOWED_METHODS and status_code not in UNSERVED_STATUSES:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def build_session(
+    retries: int = HTTP_RETRIES,
+    backoff: float = HTTP_RETRY_BACKOFF,
+    jitter: float = HTTP_RETRY_JITTER,
+    pool_maxsize: int = HTTP_POOL_MAXSIZE,
+) -> requests.Session:
+    """Session retrying connect errors and 429/5xx with jittered exponential backoff (honours Retry-After).
+
+    Non-idempotent requests (POST) are retried on connect errors and 429/502/503 only.
+    """
+    retry = IdempotencyAwareRetry(
+        total=retries,
+        connect=retries,
+        read=0,  # a read timeout may mean the run is still executing: don't resend it
+        status=retries,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,  # POST included, limited to UNSERVED_STATUSES by IdempotencyAwareRetry
+        backoff_factor=backoff,
+        backoff_jitter=jitter,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the last response back so raise_for_status reports it
+    )
+    adapter = BreakerAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Process-wide session, so repeated calls reuse pooled keep-alive connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
@@ -0,0 +1 @@
+"""Agent knowledge: ingestion, embeddings and the per-agent knowledge store"""
@@ -0,0 +1,262 @@
+"""Approximate nearest-neighbour search over a VectorStore (IVF-flat, NumPy only)
+
+The vectors are clustered around ``nlist`` k-means centroids and copied
+into one memory-mapped file grouped by cluster, so a query scores the
+centroids and then scans only the ``nprobe`` closest clusters, each one a
+contiguous slice. The VectorStore stays the source of truth:
+
+- inserts made after the last build are read back from it, assigned to
+  their nearest centroid in memory, and searched alongside the packed rows
+- deletes are its tombstones, filtered out at query time
+- once these inserts exceed ``KNOWLEDGE_ANN_REPACK_FRACTION`` of the index,
+  ``maybe_rebuild`` merges them into a new packed generation (retraining
+  the centroids when the collection has grown 4x since they were trained)
+
+Files, next to the VectorStore's: ``<path>.ivf.json`` names the current
+generation ``g``, whose data is in ``<path>.ivf<g>.{centroids,offsets}.npy``
+and ``<path>.ivf<g>.{f32,ids}``.
+"""
+import os
+import json
+import glob
+import time
+import threading
+from typing import Dict, Any, Optional, List, Tuple, Set
+
+import numpy as np
+
+from knowledge.vectors import VectorStore, SEARCH_BLOCK
+
+ANN_MIN_ROWS = int(os.getenv("KNOWLEDGE_ANN_MIN_ROWS", "20000"))  # below this, exact search is as fast
+ANN_NPROBE = int(os.getenv("KNOWLEDGE_ANN_NPROBE", "24"))
+ANN_REPACK_FRACTION = float(os.getenv("KNOWLEDGE_ANN_REPACK_FRACTION", "0.1"))
+ANN_TRAIN_PER_LIST = 64  # k-means sample size per centroid
+ANN_TRAIN_ITERATIONS = 12
+
+
+def default_nlist(rows: int) -> int:
+    """About 2 * sqrt(rows) clusters: ~1k rows per cluster at a million vectors"""
+    return int(min(max(2 * np.sqrt(rows), 16), 8192))
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest (highest dot product) centroid for each row, computed block by block"""
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SEARCH_BLOCK):
+        lists[start:start + SEARCH_BLOCK] = np.argmax(vectors[start:start + SEARCH_BLOCK] @ centroids.T, axis=1)
+    return lists
+
+
+def train_centroids(sample: np.ndarray, nlist: int, iterations: int = ANN_TRAIN_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids maximising dot product with their members"""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        lists = assign(sample, centroids)
+        order = np.argsort(lists, kind="stable")
+        counts = np.bincount(lists, minlength=nlist)
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[order], np.concatenate([[0], np.cumsum(counts)[:-1]])[~empty])
+        # Re-seed empty clusters from random samples so every list stays useful
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = (sums / np.where(norms == 0, 1, norms)).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index for one VectorStore; thread-safe, one writer process at a time.
+
+    A build holds its own lock, not the one searches take, so queries keep
+    using the previous generation until the new one is in place.
+    """
+
+    def __init__(self, vectors: VectorStore, nprobe: int = ANN_NPROBE, min_rows: int = ANN_MIN_ROWS):
+        self.vectors = vectors
+        self.path = vectors.path + ".ivf"
+        self.nprobe = nprobe
+        self.min_rows = min_rows
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._meta: Dict[str, Any] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._packed: Optional[np.ndarray] = None
+        self._packed_ids: Optional[np.ndarray] = None
+        # Rows added after the build: ids, mapped vectors and their cluster
+        self._delta_ids = np.zeros(0, dtype=np.int64)
+        self._delta_vectors: Optional[np.ndarray] = None
+        self._delta_lists = np.zeros(0, dtype=np.int32)
+
+    # --- Loading (caller holds self._lock) ---
+    def _load(self):
+        """Map the current generation if it changed on disk, then catch up on newer rows"""
+        try:
+            with open(self.path + ".json") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            meta = {}
+        if meta.get("generation") != self._meta.get("generation"):
+            self._meta = meta
+            self._delta_ids = np.zeros(0, dtype=np.int64)
+            self._delta_lists = np.zeros(0, dtype=np.int32)
+            self._delta_vectors = None
+            if meta:
+                prefix = f"{self.path}{meta['generation']}"
+                self._centroids = np.load(prefix + ".centroids.npy")
+                self._offsets = np.load(prefix + ".offsets.npy")
+                rows = int(self._offsets[-1])
+                self._packed = np.memmap(prefix + ".f32", np.float32, "r", shape=(rows, meta["dim"])) if rows else None
+                self._packed_ids = np.memmap(prefix + ".ids", np.int64, "r", shape=(rows,)) if rows else None
+        if not self._meta:
+            return
+        ids, vectors = self.vectors.rows_after(self._meta["built_upto"])
+        known = len(self._delta_ids)
+        if len(ids) == known and (not known or ids[-1] == self._delta_ids[-1]):
+            return
+        if known and len(ids) >= known and np.array_equal(ids[:known], self._delta_ids):
+            lists = np.concatenate([self._delta_lists, assign(vectors[known:], self._centroids)])
+        else:
+            # First catch-up, or the store was compacted: assign every pending row again
+            lists = assign(vectors, self._centroids)
+        self._delta_ids, self._delta_vectors, self._delta_lists = np.asarray(ids), vectors, lists
+
+    # --- Building ---
+    def build(self, nlist: Optional[int] = None, retrain: bool = True) -> Dict[str, Any]:
+        """Write a new packed generation from every live row; returns its metadata"""
+        with self._build_lock:
+            with self._lock:
+                self._load()
+                meta, centroids = dict(self._meta), self._centroids
+                offsets, packed, packed_ids = self._offsets, self._packed, self._packed_ids
+                delta = (self._delta_ids, self._delta_vectors, self._delta_lists)
+            started = time.monotonic()
+            deleted = self.vectors.deleted_ids()
+            ids, vectors = self.vectors.rows_after(0)
+            if not len(ids):
+                return {}
+            if retrain or centroids is None:
+                nlist = nlist or default_nlist(len(ids))
+                nlist = min(nlist, len(ids))
+                rng = np.random.default_rng(len(ids))
+                sample_size = min(len(ids), nlist * ANN_TRAIN_PER_LIST)
+                sample = np.asarray(vectors[np.sort(rng.choice(len(ids), sample_size, replace=False))])
+                centroids, trained_rows = train_centroids(sample, nlist), len(ids)
+            else:
+                trained_rows = meta["trained_rows"]
+
+            # Reuse the packed assignment and only assign rows added since the last build
+            if not retrain and packed is not None:
+                old_lists = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+                sources = [(packed_ids, packed, old_lists), delta]
+                # Rows added after the snapshot are left to the next generation's delta
+                built_upto = int(delta[0][-1]) if len(delta[0]) else meta["built_upto"]
+            else:
+                sources = [(ids, vectors, assign(vectors, centroids))]
+                built_upto = int(ids[-1])
+            generation = meta.get("generation", 0) + 1
+            new_meta = self._write_generation(generation, centroids, sources, deleted)
+            new_meta.update(
+                built_upto=built_upto, trained_rows=trained_rows, nlist=len(centroids),
+                build_seconds=round(time.monotonic() - started, 2),
+            )
+            tmp = self.path + ".json.tmp"
+            with open(tmp, "w") as f:
+                json.dump(new_meta, f)
+            with self._lock:
+                os.replace(tmp, self.path + ".json")
+                self._remove_generations(keep=generation)
+                self._load()
+            return new_meta
+
+    def _write_generation(self, generation: int, centroids: np.ndarray, sources, deleted: Set[int]) -> Dict[str, Any]:
+        prefix = f"{self.path}{generation}"
+        dim = centroids.shape[1]
+        order = []
+        for source_ids, _, lists in sources:
+            keep = ~np.isin(source_ids, np.fromiter(deleted, np.int64)) if deleted else np.ones(len(source_ids), bool)
+            order.append((np.argsort(lists, kind="stable"), keep, lists))
+        counts = sum(np.bincount(lists[keep], minlength=len(centroids)) for _, keep, lists in order)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        with open(prefix + ".f32", "wb") as vectors_file, open(prefix + ".ids", "wb") as ids_file:
+            # Cluster by cluster, each source's members in id order
+            bounds = [np.searchsorted(lists[sort], np.arange(len(centroids) + 1)) for sort, _, lists in order]
+            for cluster in range(len(centroids)):
+                for (source_ids, source_vectors, _), (sort, keep, _), bound in zip(sources, order, bounds):
+                    rows = sort[bound[cluster]:bound[cluster + 1]]
+                    rows = np.sort(rows[keep[rows]])
+                    if len(rows):
+                        vectors_file.write(np.ascontiguousarray(source_vectors[rows], dtype=np.float32).tobytes())
+                        ids_file.write(np.asarray(source_ids[rows], dtype=np.int64).tobytes())
+            for f in (vectors_file, ids_file):
+                f.flush()
+                os.fsync(f.fileno())
+        np.save(prefix + ".centroids.npy", centroids)
+        np.save(prefix + ".offsets.npy", offsets)
+        return {"generation": generation, "dim": dim, "rows": int(offsets[-1])}
+
+    def _remove_generations(self, keep: int):
+        for path in glob.glob(glob.escape(self.path) + "[0-9]*.*"):
+            generation = os.path.basename(path)[len(os.path.basename(self.path)):].split(".")[0]
+            if generation.isdigit() and int(generation) != keep:
+                os.remove(path)
+
+    def maybe_rebuild(self) -> Optional[Dict[str, Any]]:
+        """Build once the store is big enough, and fold in recent inserts once they pile up"""
+        with self._lock:
+            self._load()
+            rows, built = len(self.vectors), self._meta.get("rows", 0)
+            delta = len(self._delta_ids)
+        if not self._meta:
+            return self.build() if rows >= self.min_rows else None
+        if delta > max(ANN_REPACK_FRACTION * built, 1000):
+            return self.build(retrain=rows > 4 * self._meta["trained_rows"])
+        return None
+
+    # --- Searching ---
+    def search(self, query: np.ndarray, k: int = 5, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Top-``k`` ``(id, score)``; exact until the index has been built"""
+        with self._lock:
+            self._load()
+            if not self._meta:
+                built = False
+            else:
+                built = True
+                centroids, offsets, packed, packed_ids = self._centroids, self._offsets, self._packed, self._packed_ids
+                delta_ids, delta_vectors, delta_lists = self._delta_ids, self._delta_vectors, self._delta_lists
+        if not built:
+            return self.vectors.search(query, k)
+
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, len(centroids))
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        deleted = self.vectors.deleted_ids()
+        want = k + len(deleted)
+        candidate_ids, candidate_scores = [], []
+        for cluster in probe:
+            start, end = offsets[cluster], offsets[cluster + 1]
+            if end > start:
+                candidate_scores.append(packed[start:end] @ query)
+                candidate_ids.append(packed_ids[start:end])
+        if len(delta_ids):
+            rows = np.flatnonzero(np.isin(delta_lists, probe))
+            if len(rows):
+                candidate_scores.append(delta_vectors[rows] @ query)
+                candidate_ids.append(delta_ids[rows])
+        if not candidate_ids:
+            return []
+        scores, ids = np.concatenate(candidate_scores), np.concatenate(candidate_ids)
+        top = np.argpartition(-scores, min(want, len(scores)) - 1)[:want]
+        results = []
+        for i in top[np.argsort(-scores[top])]:
+            if int(ids[i]) not in deleted:
+                results.append((int(ids[i]), float(scores[i])))
+                if len(results) == k:
+                    break
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load()
+            return {**self._meta, "pending": len(self._delta_ids), "nprobe": self.nprobe}
@@ -0,0 +1,239 @@
+"""Embedding service for the knowledge store: batched, concurrent, cached on disk
+
+Texts are looked up by content hash in a SQLite cache first; only the
+misses go to the provider, packed into batches that respect its per-request
+limits (``KNOWLEDGE_EMBEDDING_BATCH`` inputs, ``KNOWLEDGE_EMBEDDING_BATCH_TOKENS``
+tokens) and sent ``KNOWLEDGE_EMBEDDING_CONCURRENCY`` at a time through the
+OpenAI key dispatcher. ``KNOWLEDGE_EMBEDDING_PROVIDER=local`` swaps the API
+for a deterministic feature-hashing embedder, for offline runs and tests.
+"""
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Sequence, Callable
+
+import numpy as np
+
+from openai_client import get_openai_client
+
+EMBEDDING_PROVIDER = os.getenv("KNOWLEDGE_EMBEDDING_PROVIDER", "openai")  # or "local"
+EMBEDDING_MODEL = os.getenv("KNOWLEDGE_EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH = int(os.getenv("KNOWLEDGE_EMBEDDING_BATCH", "128"))  # OpenAI accepts up to 2048 inputs
+EMBEDDING_BATCH_TOKENS = int(os.getenv("KNOWLEDGE_EMBEDDING_BATCH_TOKENS", "100000"))  # and 300k tokens
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+EMBEDDING_CONCURRENCY = int(os.getenv("KNOWLEDGE_EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_CACHE_DB = os.getenv("KNOWLEDGE_EMBEDDING_CACHE", "embedding_cache.db")  # empty disables
+LOCAL_EMBEDDING_DIM = int(os.getenv("KNOWLEDGE_LOCAL_EMBEDDING_DIM", "384"))
+
+_WORD = re.compile(r"\w+")
+
+Provider = Callable[[List[str]], np.ndarray]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so a dot product is the cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def text_hash(text: str) -> str:
+    """Cache key of a text: exact content, since any change can move its embedding"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token count (three characters per token) for sizing batches"""
+    return len(text) // 3 + 1
+
+
+# --- Providers: a list of texts in, one row per text out ---
+def openai_embed(texts: List[str], model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """One embeddings request through the shared key dispatcher"""
+    # Keep every input under the model's limit; chunks are far shorter than this
+    inputs = [text[:EMBEDDING_MAX_INPUT_TOKENS * 3] or " " for text in texts]
+    response = get_openai_client().embed(model=model, input=inputs)
+    rows = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    return np.asarray(rows, dtype=np.float32)
+
+
+def local_embed(texts: List[str], dim: int = LOCAL_EMBEDDING_DIM) -> np.ndarray:
+    """Deterministic bag-of-words embedding (signed feature hashing of words and word pairs).
+
+    Same text, same vector, in every process and on every machine; texts
+    sharing words score higher, which is enough to exercise retrieval
+    without network access. Not a substitute for a real model.
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _WORD.findall(text.casefold())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vectors[row, digest % dim] += 1.0 if digest >> 63 else -1.0
+    return vectors
+
+
+class EmbeddingCache:
+    """SQLite map of (model, text hash) -> float32 vector, shared by every process using the file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                part = hashes[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                found.update((row[0], np.frombuffer(row[1], dtype=np.float32)) for row in rows)
+        return found
+
+    def put_many(self, model: str, hashes: Sequence[str], vectors: np.ndarray):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector, created_at) VALUES (?, ?, ?, ?)",
+                [(model, h, np.asarray(v, dtype=np.float32).tobytes(), now) for h, v in zip(hashes, vectors)],
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingService:
+    """Embeds texts in provider-sized batches, concurrently, skipping cached and repeated texts.
+
+    Calling the service returns unit-length float32 rows, one per text, so
+    it can be passed wherever an ``embed(texts)`` callable is expected.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[Provider] = None,
+        model: Optional[str] = None,
+        cache: Optional[EmbeddingCache] = None,
+        batch_size: int = EMBEDDING_BATCH,
+        batch_tokens: int = EMBEDDING_BATCH_TOKENS,
+        concurrency: int = EMBEDDING_CONCURRENCY,
+    ):
+        if provider is None and EMBEDDING_PROVIDER == "local":
+            provider, model = local_embed, model or f"local-hash-{LOCAL_EMBEDDING_DIM}"
+        self.model = model or EMBEDDING_MODEL
+        self.provider = provider or (lambda texts: openai_embed(texts, self.model))
+        self.cache = cache
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.concurrency = max(concurrency, 1)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.embedded = 0
+        self.cache_hits = 0
+
+    def batches(self, texts: Sequence[str]) -> List[List[str]]:
+        """Consecutive groups within both the input-count and the token limit of one request"""
+        batches, batch, tokens = [], [], 0
+        for text in texts:
+            cost = min(estimate_tokens(text), EMBEDDING_MAX_INPUT_TOKENS)
+            if batch and (len(batch) >= self.batch_size or tokens + cost > self.batch_tokens):
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += cost
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _embed_batch(self, batch: List[str]) -> np.ndarray:
+        vectors = normalize(np.asarray(self.provider(batch), dtype=np.float32))
+        if self.cache is not None:
+            self.cache.put_many(self.model, [text_hash(text) for text in batch], vectors)
+        with self._lock:
+            self.requests += 1
+            self.embedded += len(batch)
+        return vectors
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Unit-length float32 embeddings, one row per text"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        hashes = [text_hash(text) for text in texts]
+        found = self.cache.get_many(self.model, list(dict.fromkeys(hashes))) if self.cache is not None else {}
+        # Each missing text is embedded once, however often it repeats
+        missing = list({h: text for h, text in zip(hashes, texts) if h not in found}.items())
+        with self._lock:
+            self.cache_hits += len(texts) - sum(1 for h in hashes if h not in found)
+        if missing:
+            batches = self.batches([text for _, text in missing])
+            if len(batches) == 1 or self.concurrency == 1:
+                results = [self._embed_batch(batch) for batch in batches]
+            else:
+                results = list(self._executor().map(self._embed_batch, batches))
+            found.update(zip((h for h, _ in missing), np.concatenate(results)))
+        return np.stack([found[h] for h in hashes]).astype(np.float32, copy=False)
+
+    __call__ = embed
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed")
+            return self._pool
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model,
+                "requests": self.requests,
+                "embedded": self.embedded,
+                "cache_hits": self.cache_hits,
+                "cached": len(self.cache) if self.cache is not None else 0,
+            }
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Process-wide embedding service backed by ``KNOWLEDGE_EMBEDDING_CACHE``"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                cache = EmbeddingCache(EMBEDDING_CACHE_DB) if EMBEDDING_CACHE_DB else None
+                _service = EmbeddingService(cache=cache)
+    return _service
+
+
+def embed_texts(texts: Sequence[str]) -> np.ndarray:
+    """Unit-length float32 embeddings, one row per text, via the shared service"""
+    return get_embedding_service().embed(texts)
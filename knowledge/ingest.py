@@ -0,0 +1,341 @@
+"""Knowledge ingestion: parse -> chunk -> deduplicate -> embed in batches -> store
+
+Every stage is a generator, so a document flows through in blocks of
+``KNOWLEDGE_READ_BLOCK`` bytes and at most ``KNOWLEDGE_INGEST_BATCH`` chunks
+are held at a time: large files never sit in memory whole. Embeddings go
+through the cached embedding service, so unchanged text is never sent to
+the API twice, even after its document was deleted or in another namespace.
+
+Usage: python -m knowledge.ingest PATH_OR_URL... [--agent NAME]
+"""
+import os
+import io
+import re
+import sys
+import json
+import time
+import codecs
+import hashlib
+import zipfile
+import argparse
+import tempfile
+from html.parser import HTMLParser
+from xml.etree import ElementTree
+from typing import Dict, Any, Optional, List, Iterable, Iterator, BinaryIO, Callable, Tuple
+
+import numpy as np
+
+from http_session import get_session, timeout
+from knowledge.embeddings import embed_texts
+from knowledge.store import GLOBAL, KnowledgeStore, get_knowledge_store
+
+try:
+    import pypdf
+except ImportError:  # PDF ingestion is optional
+    pypdf = None
+
+CHUNK_CHARS = int(os.getenv("KNOWLEDGE_CHUNK_CHARS", "1500"))
+CHUNK_OVERLAP = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP", "200"))
+READ_BLOCK = int(os.getenv("KNOWLEDGE_READ_BLOCK", "65536"))
+INGEST_BATCH = int(os.getenv("KNOWLEDGE_INGEST_BATCH", "512"))  # chunks per embed call: several concurrent API batches
+
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+_DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_SENTENCE_END = re.compile(r"[.!?。]\s")
+
+Embed = Callable[[List[str]], np.ndarray]
+
+
+def content_hash(text: str) -> str:
+    """Hash of a chunk ignoring case and whitespace, so trivially different copies dedupe"""
+    return hashlib.sha256(" ".join(text.split()).casefold().encode("utf-8")).hexdigest()[:32]
+
+
+# --- Parsing: each reader yields text pieces of about one block ---
+def iter_plain_text(stream: BinaryIO, encoding: str = "utf-8-sig") -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while True:
+        block = stream.read(READ_BLOCK)
+        if not block:
+            break
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+class _HTMLText(HTMLParser):
+    SKIP = {"script", "style", "noscript", "template", "svg", "head"}
+    BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre", "blockquote"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+        elif tag in self.BLOCKS:
+            self.pieces.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skipping = max(self._skipping - 1, 0)
+        elif tag in self.BLOCKS:
+            self.pieces.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.pieces.append(data)
+
+    def take(self) -> str:
+        text, self.pieces = "".join(self.pieces), []
+        return text
+
+
+def iter_html(pieces: Iterable[str]) -> Iterator[str]:
+    """Visible text of an HTML document fed in pieces"""
+    parser = _HTMLText()
+    for piece in pieces:
+        parser.feed(piece)
+        yield parser.take()
+    parser.close()
+    yield parser.take()
+
+
+def iter_docx(stream: BinaryIO) -> Iterator[str]:
+    """Paragraph text of a .docx, parsed incrementally from word/document.xml"""
+    with zipfile.ZipFile(stream) as archive, archive.open("word/document.xml") as xml:
+        runs: List[str] = []
+        for _, element in ElementTree.iterparse(xml, events=("end",)):
+            if element.tag == _DOCX_NS + "t":
+                runs.append(element.text or "")
+            elif element.tag == _DOCX_NS + "tab":
+                runs.append("\t")
+            elif element.tag == _DOCX_NS + "br":
+                runs.append("\n")
+            elif element.tag == _DOCX_NS + "p":
+                yield "".join(runs) + "\n\n"
+                runs = []
+                element.clear()
+
+
+def iter_pdf(stream: BinaryIO) -> Iterator[str]:
+    """Text of a PDF, one page at a time"""
+    if pypdf is None:
+        raise ValueError("PDF ingestion needs the pypdf package (pip install pypdf)")
+    for page in pypdf.PdfReader(stream).pages:
+        yield (page.extract_text() or "") + "\n\n"
+
+
+def iter_file(stream: BinaryIO, name: str, content_type: Optional[str] = None) -> Iterator[str]:
+    """Text pieces of an uploaded or local file, chosen by extension or content type"""
+    extension = os.path.splitext(name.lower())[1]
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if extension == ".pdf" or content_type == "application/pdf":
+        return iter_pdf(stream)
+    if extension == ".docx" or content_type.endswith("wordprocessingml.document"):
+        return iter_docx(stream)
+    if extension in (".html", ".htm") or content_type in HTML_TYPES:
+        return iter_html(iter_plain_text(stream))
+    return iter_plain_text(stream)
+
+
+def _charset(content_type: str) -> str:
+    """Encoding named by a Content-Type header, else UTF-8.
+
+    ``requests`` falls back to ISO-8859-1 for any ``text/*`` response
+    without a charset, which garbles the UTF-8 that nearly every page is
+    served in; detecting it instead would need the whole body up front.
+    """
+    match = re.search(r"charset=[\"']?([\w.:-]+)", content_type, re.I)
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return "utf-8"
+
+
+def _decoded(decoder: codecs.IncrementalDecoder, blocks: Iterable[bytes]) -> Iterator[str]:
+    for block in blocks:
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+def iter_url(url: str) -> Iterator[str]:
+    """Text pieces of a web page or document, streamed from ``url``"""
+    with get_session().get(url, stream=True, timeout=timeout()) as response:
+        response.raise_for_status()
+        content_type = response.headers.get("content-type", "")
+        name = url.split("?")[0]
+        if content_type.startswith("text/") or content_type.split(";")[0] in HTML_TYPES or "json" in content_type:
+            decoder = codecs.getincrementaldecoder(_charset(content_type))(errors="replace")
+            pieces = _decoded(decoder, response.iter_content(READ_BLOCK))
+            yield from iter_html(pieces) if "html" in content_type else pieces
+            return
+        # Binary formats need a seekable file: spool to disk rather than memory
+        with tempfile.TemporaryFile() as spool:
+            for block in response.iter_content(READ_BLOCK):
+                spool.write(block)
+            spool.seek(0)
+            yield from iter_file(spool, name, content_type)
+
+
+# --- Chunking ---
+class Chunker:
+    """Incremental splitter into chunks of about ``size`` characters.
+
+    Cuts prefer a paragraph break, then a sentence end, then a space, and
+    consecutive chunks share up to ``overlap`` characters of context.
+    """
+
+    def __init__(self, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP):
+        self.size = size
+        self.overlap = min(overlap, size // 4)
+        self._buffer = ""
+        self._carried = 0  # leading characters of the buffer already emitted as overlap
+
+    def feed(self, text: str) -> Iterator[str]:
+        self._buffer += text.replace("\r\n", "\n")
+        while len(self._buffer) > self.size:
+            cut = self._cut_point()
+            chunk = self._buffer[:cut].strip()
+            if chunk:
+                yield chunk
+            start = cut
+            if self.overlap:
+                space = self._buffer.find(" ", cut - self.overlap, cut)
+                start = space + 1 if space != -1 else cut
+            self._buffer = self._buffer[start:]
+            self._carried = cut - start
+
+    def flush(self) -> Iterator[str]:
+        chunk = self._buffer.strip()
+        if chunk and self._buffer[self._carried:].strip():
+            yield chunk
+        self._buffer, self._carried = "", 0
+
+    def _cut_point(self) -> int:
+        window = self._buffer[:self.size]
+        floor = self.size // 2
+        cut = window.rfind("\n\n", floor)
+        if cut != -1:
+            return cut + 2
+        ends = [m.end() for m in _SENTENCE_END.finditer(window, floor)]
+        if ends:
+            return ends[-1]
+        cut = max(window.rfind(" ", floor), window.rfind("\n", floor))
+        return cut + 1 if cut != -1 else self.size
+
+
+def iter_chunks(pieces: Iterable[str], chunker: Optional[Chunker] = None) -> Iterator[str]:
+    chunker = chunker or Chunker()
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.flush()
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --- Pipeline ---
+class IngestPipeline:
+    """Streams documents into a KnowledgeStore namespace.
+
+    Chunks already stored in the namespace (or repeated within the
+    document) are dropped before embedding, so re-ingesting unchanged
+    content costs no embedding calls.
+    """
+
+    def __init__(
+        self,
+        store: Optional[KnowledgeStore] = None,
+        embed: Embed = embed_texts,
+        batch_size: int = INGEST_BATCH,
+    ):
+        self.store = store or get_knowledge_store()
+        self.embed = embed
+        self.batch_size = batch_size
+
+    def ingest(self, pieces: Iterable[str], namespace: str = GLOBAL, source: str = "text") -> Dict[str, Any]:
+        """Ingest a stream of text pieces as one document; returns ingestion stats"""
+        started = time.monotonic()
+        document_id = self.store.start_document(namespace, source)
+        document_hash = hashlib.sha256()
+        stats = {"source": source, "namespace": namespace, "chunks": 0, "added": 0, "duplicates": 0, "chars": 0}
+
+        def hashed(pieces: Iterable[str]) -> Iterator[str]:
+            for piece in pieces:
+                document_hash.update(piece.encode("utf-8"))
+                stats["chars"] += len(piece)
+                yield piece
+
+        seen = set()
+
+        def unique(chunks: Iterator[str]) -> Iterator[Tuple[int, str, str]]:
+            for position, text in enumerate(chunks):
+                stats["chunks"] += 1
+                chunk_hash = content_hash(text)
+                if chunk_hash in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(chunk_hash)
+                yield position, chunk_hash, text
+
+        try:
+            for batch in _batches(unique(iter_chunks(hashed(pieces))), self.batch_size):
+                stored = self.store.existing(namespace, [chunk_hash for _, chunk_hash, _ in batch])
+                fresh = [chunk for chunk in batch if chunk[1] not in stored]
+                stats["duplicates"] += len(batch) - len(fresh)
+                if stored:
+                    self.store.link_chunks(namespace, document_id, [chunk for chunk in batch if chunk[1] in stored])
+                if fresh:
+                    vectors = self.embed([text for _, _, text in fresh])
+                    stats["added"] += self.store.add_chunks(namespace, document_id, fresh, vectors)
+        except BaseException:
+            self.store.finish_document(document_id, document_hash.hexdigest()[:32], stats["chars"], status="failed")
+            raise
+        stats["document_id"] = self.store.finish_document(document_id, document_hash.hexdigest()[:32], stats["chars"])
+        stats["seconds"] = round(time.monotonic() - started, 3)
+        return stats
+
+    def ingest_file(self, stream: BinaryIO, name: str, namespace: str = GLOBAL, content_type: Optional[str] = None) -> Dict[str, Any]:
+        return self.ingest(iter_file(stream, name, content_type), namespace, name)
+
+    def ingest_text(self, text: str, namespace: str = GLOBAL, source: str = "pasted text") -> Dict[str, Any]:
+        return self.ingest(iter_plain_text(io.BytesIO(text.encode("utf-8"))), namespace, source)
+
+    def ingest_url(self, url: str, namespace: str = GLOBAL) -> Dict[str, Any]:
+        return self.ingest(iter_url(url), namespace, url)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingest documents into the agent knowledge store")
+    parser.add_argument("sources", nargs="+", help="file paths or http(s) URLs")
+    parser.add_argument("--agent", default=GLOBAL, help=f"agent namespace (default: {GLOBAL})")
+    parser.add_argument("--db", help="knowledge database (default: KNOWLEDGE_DB)")
+    args = parser.parse_args(argv)
+
+    pipeline = IngestPipeline(get_knowledge_store(args.db))
+    for source in args.sources:
+        if source.startswith(("http://", "https://")):
+            stats = pipeline.ingest_url(source, args.agent)
+        else:
+            with open(source, "rb") as f:
+                stats = pipeline.ingest_file(f, source, args.agent)
+        print(json.dumps(stats))
+    # Let a build started by this run finish rather than die with the process
+    pipeline.store.wait_for_rebuilds()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Retrieval-augmented context for advisors: search -> deduplicate -> pack under a token budget
+
+An advisor's question is embedded once, matched against its own knowledge
+namespace plus the global one, and the best chunks are packed into a
+numbered context block of at most ``KNOWLEDGE_CONTEXT_TOKENS``. Packed
+contexts are cached per (agent, question hash) and reused until a chunk
+is added to or deleted from those namespaces.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+
+from response_cache import normalize_question
+from knowledge.embeddings import embed_texts
+from knowledge.ingest import Embed, content_hash
+from knowledge.store import GLOBAL, KNOWLEDGE_DB, KnowledgeStore, get_knowledge_store
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_ENABLED = os.getenv("KNOWLEDGE_RETRIEVAL", "true").lower() == "true"
+RETRIEVAL_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "8"))
+CONTEXT_TOKENS = int(os.getenv("KNOWLEDGE_CONTEXT_TOKENS", "1200"))
+MIN_SCORE = float(os.getenv("KNOWLEDGE_MIN_SCORE", "0.25"))
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("KNOWLEDGE_CONTEXT_CACHE_MAX_ENTRIES", "512"))
+
+CONTEXT_HEADER = (
+    "Relevant knowledge from the Green Hill Canarias knowledge base. "
+    "Use it where it applies and cite passages as [n]; say so if it does not cover the question.\n\n"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """About four characters per token, as in openai_client.estimate_tokens"""
+    return len(text) // 4 + 1
+
+
+def pack_context(chunks: List[Dict[str, Any]], budget: int = CONTEXT_TOKENS) -> Tuple[str, List[Dict[str, Any]]]:
+    """Best-first chunks that fit in ``budget`` tokens, duplicates dropped.
+
+    Returns the numbered context block (empty when nothing fits) and the
+    chunks it contains. A chunk too large for the remaining budget is
+    skipped rather than cut, so smaller, lower-ranked ones can still fit.
+    """
+    seen, packed, parts = set(), [], []
+    remaining = budget - estimate_tokens(CONTEXT_HEADER)
+    for chunk in sorted(chunks, key=lambda chunk: -chunk.get("score", 0.0)):
+        chunk_hash = content_hash(chunk["text"])
+        if chunk_hash in seen:
+            continue
+        seen.add(chunk_hash)
+        part = f"[{len(packed) + 1}] {chunk.get('source') or chunk['namespace']}\n{chunk['text'].strip()}\n\n"
+        cost = estimate_tokens(part)
+        if cost > remaining:
+            continue
+        remaining -= cost
+        packed.append(chunk)
+        parts.append(part)
+    return (CONTEXT_HEADER + "".join(parts)).rstrip() if parts else "", packed
+
+
+class Retriever:
+    """Builds and caches the packed knowledge context for each advisor question"""
+
+    def __init__(
+        self,
+        store: Optional[KnowledgeStore] = None,
+        embed: Embed = embed_texts,
+        k: int = RETRIEVAL_TOP_K,
+        budget: int = CONTEXT_TOKENS,
+        min_score: float = MIN_SCORE,
+        max_entries: int = CONTEXT_CACHE_MAX_ENTRIES,
+    ):
+        self._store = store
+        self.embed = embed
+        self.k = k
+        self.budget = budget
+        self.min_score = min_score
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    @property
+    def store(self) -> Optional[KnowledgeStore]:
+        # Asking a question should not create an empty knowledge database
+        if self._store is None and os.path.exists(KNOWLEDGE_DB):
+            self._store = get_knowledge_store()
+        return self._store
+
+    @staticmethod
+    def namespaces(agent: str) -> List[str]:
+        return [agent, GLOBAL] if agent != GLOBAL else [GLOBAL]
+
+    def search(self, agent: str, question: str) -> List[Dict[str, Any]]:
+        """Top-``k`` chunks for ``question`` from the agent's and the global namespace"""
+        vector = self.embed([question])[0]
+        hits = self.store.search(vector, self.namespaces(agent), self.k)
+        return [hit for hit in hits if hit["score"] >= self.min_score]
+
+    def context(self, agent: str, question: str) -> str:
+        """Packed context for ``agent`` answering ``question``; empty if there is no relevant knowledge"""
+        store = self.store
+        if store is None:
+            return ""
+        namespaces = self.namespaces(agent)
+        version = store.version(namespaces)
+        if not any(last_id for last_id, _, _ in version):
+            return ""
+        key = (agent, hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        started = time.monotonic()
+        try:
+            context, packed = pack_context(self.search(agent, question), self.budget)
+        except Exception as e:
+            # Answer without grounding rather than fail the advisor
+            with self._lock:
+                self.failures += 1
+            logger.warning(f"Knowledge retrieval failed for {agent}: {e}")
+            return ""
+        logger.debug(
+            f"Retrieved {len(packed)} chunks ({estimate_tokens(context)} tokens) for {agent} "
+            f"in {(time.monotonic() - started) * 1000:.0f} ms"
+        )
+        with self._lock:
+            self._entries[key] = (version, context)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return context
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": RETRIEVAL_ENABLED,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "failures": self.failures,
+                "k": self.k,
+                "budget_tokens": self.budget,
+            }
+
+
+_retriever: Optional[Retriever] = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> Retriever:
+    """Process-wide retriever shared by every advisor"""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = Retriever()
+    return _retriever
+
+
+def knowledge_context(agent: str, question: str) -> str:
+    """Packed knowledge context for an advisor call, or "" when retrieval is off"""
+    if not RETRIEVAL_ENABLED:
+        return ""
+    return get_retriever().context(agent, question)
@@ -0,0 +1,416 @@
+"""Knowledge store: chunks and their embeddings, per agent namespace plus a global one"""
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Dict, Any, Optional, List, Iterable, Sequence, Set, Tuple
+
+import numpy as np
+
+from knowledge.ann import IVFIndex
+from knowledge.vectors import VectorStore
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_DB = os.getenv("KNOWLEDGE_DB", "knowledge.db")
+# "background": ingestion starts index builds on a worker thread; "manual": only `python -m knowledge.store`
+ANN_REBUILD = os.getenv("KNOWLEDGE_ANN_REBUILD", "background")
+
+GLOBAL = "global"  # shared by every agent
+
+CHUNKS_TABLE = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,  -- never reused: vector files are keyed by increasing id
+    namespace TEXT NOT NULL,
+    document_id INTEGER NOT NULL,  -- first document to contain it; see document_chunks for all of them
+    position INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (namespace, hash)
+)"""
+
+LINKS_TABLE = """
+CREATE TABLE IF NOT EXISTS document_chunks (
+    document_id INTEGER NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (document_id, chunk_id)
+) WITHOUT ROWID"""
+
+LINK_CHUNK = (
+    "INSERT OR IGNORE INTO document_chunks (document_id, chunk_id, position) "
+    "SELECT ?, id, ? FROM chunks WHERE namespace = ? AND hash = ?"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    source TEXT NOT NULL,
+    hash TEXT,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'ingesting',
+    ingested_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents (namespace, hash);
+""" + CHUNKS_TABLE + """;
+CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks (document_id);
+""" + LINKS_TABLE + """;
+CREATE INDEX IF NOT EXISTS idx_document_chunks_chunk ON document_chunks (chunk_id);
+"""
+
+
+class KnowledgeStore:
+    """SQLite store of ingested documents and chunks, with vectors in memory-mapped files.
+
+    A chunk's ``hash`` is unique within its namespace, so the same passage
+    is embedded and stored once per agent however often it is ingested;
+    ``document_chunks`` records every document containing it, and the
+    chunk is removed only with the last of them.
+    Each namespace keeps its vectors in ``<db>.vectors/<namespace>.*``
+    (see VectorStore), so opening the store reads no vectors and a search
+    only pages in the namespaces it covers. Namespaces past
+    ``KNOWLEDGE_ANN_MIN_ROWS`` chunks are searched through an IVF index
+    (see IVFIndex) instead of an exact scan. Building it takes about a
+    minute per million chunks, so ingestion only schedules the build on a
+    background thread per namespace (or, with ``KNOWLEDGE_ANN_REBUILD=manual``,
+    leaves it to ``maintain``).
+    """
+
+    def __init__(self, path: str = KNOWLEDGE_DB):
+        self.path = path
+        self.vectors_dir = path + ".vectors"
+        self._lock = threading.Lock()
+        self._vectors: Dict[str, VectorStore] = {}
+        self._indexes: Dict[str, IVFIndex] = {}
+        self._rebuilds: Dict[str, threading.Thread] = {}
+        self._rebuild_again: Set[str] = set()
+        self._rebuild_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._migrate()
+        unlinked = self._table_exists("chunks") and not self._table_exists("document_chunks")
+        self._conn.executescript(SCHEMA)
+        if unlinked:
+            # Stores created before document_chunks: each chunk belongs to the document that added it
+            self._conn.execute(
+                "INSERT INTO document_chunks (document_id, chunk_id, position) SELECT document_id, id, position FROM chunks"
+            )
+        self._conn.commit()
+        self._reconcile()
+
+    def vectors(self, namespace: str) -> VectorStore:
+        store = self._vectors.get(namespace)
+        if store is None:
+            path = os.path.join(self.vectors_dir, re.sub(r"[^\w.-]", "_", namespace))
+            store = self._vectors.setdefault(namespace, VectorStore(path))
+        return store
+
+    def index(self, namespace: str) -> IVFIndex:
+        index = self._indexes.get(namespace)
+        if index is None:
+            index = self._indexes.setdefault(namespace, IVFIndex(self.vectors(namespace)))
+        return index
+
+    def _table_exists(self, name: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    def _migrate(self):
+        """Move vectors stored as BLOBs in ``chunks`` (first schema) into vector files"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(chunks)")]
+        if "vector" not in columns:
+            return
+        with self._conn:
+            self._conn.execute("ALTER TABLE chunks RENAME TO chunks_blob")
+            self._conn.execute(CHUNKS_TABLE)
+            self._conn.execute(
+                "INSERT INTO chunks (id, namespace, document_id, position, hash, text) "
+                "SELECT id, namespace, document_id, position, hash, text FROM chunks_blob"
+            )
+            for (namespace,) in self._conn.execute("SELECT DISTINCT namespace FROM chunks_blob").fetchall():
+                # Skip vectors already written by an interrupted earlier attempt
+                rows = self._conn.execute(
+                    "SELECT id, vector FROM chunks_blob WHERE namespace = ? AND id > ? ORDER BY id",
+                    (namespace, self.vectors(namespace).last_id),
+                ).fetchall()
+                if rows:
+                    vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+                    self.vectors(namespace).add([row[0] for row in rows], vectors)
+            self._conn.execute("DROP TABLE chunks_blob")
+
+    def _reconcile(self):
+        """Drop chunk rows whose vectors never reached disk (crash mid-ingest) so they are re-embedded"""
+        with self._conn:
+            for (namespace,) in self._conn.execute("SELECT DISTINCT namespace FROM chunks").fetchall():
+                self._conn.execute(
+                    "DELETE FROM chunks WHERE namespace = ? AND id > ?", (namespace, self.vectors(namespace).last_id)
+                )
+            self._conn.execute("DELETE FROM document_chunks WHERE chunk_id NOT IN (SELECT id FROM chunks)")
+
+    # --- Writing ---
+    def start_document(self, namespace: str, source: str) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "INSERT INTO documents (namespace, source, ingested_at) VALUES (?, ?, ?)",
+                (namespace, source, time.time()),
+            ).lastrowid
+
+    def existing(self, namespace: str, hashes: Sequence[str]) -> Set[str]:
+        """The subset of ``hashes`` already stored in ``namespace``"""
+        if not hashes:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT hash FROM chunks WHERE namespace = ? AND hash IN ({','.join('?' * len(hashes))})",
+                [namespace, *hashes],
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def add_chunks(
+        self,
+        namespace: str,
+        document_id: int,
+        chunks: Sequence[Tuple[int, str, str]],
+        vectors: np.ndarray,
+    ) -> int:
+        """Store ``(position, hash, text)`` chunks with their vectors; returns how many were new"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            with self._conn:
+                added_ids, added_rows = [], []
+                for row, (position, chunk_hash, text) in enumerate(chunks):
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO chunks (namespace, document_id, position, hash, text) VALUES (?, ?, ?, ?, ?)",
+                        (namespace, document_id, position, chunk_hash, text),
+                    )
+                    if cursor.rowcount:
+                        added_ids.append(cursor.lastrowid)
+                        added_rows.append(row)
+                    # New or stored by another document meanwhile, the chunk is now part of this one too
+                    self._conn.execute(LINK_CHUNK, (document_id, position, namespace, chunk_hash))
+            # Rows first, then vectors: rows left without vectors by a crash are dropped on open
+            self.vectors(namespace).add(added_ids, vectors[added_rows])
+        if added_ids and ANN_REBUILD == "background":
+            self.schedule_rebuild(namespace)
+        return len(added_ids)
+
+    def link_chunks(self, namespace: str, document_id: int, chunks: Sequence[Tuple[int, str, str]]) -> int:
+        """Record already-stored ``(position, hash, text)`` chunks as part of the document; returns how many were found"""
+        with self._lock, self._conn:
+            return sum(
+                self._conn.execute(LINK_CHUNK, (document_id, position, namespace, chunk_hash)).rowcount
+                for position, chunk_hash, _ in chunks
+            )
+
+    def finish_document(self, document_id: int, content_hash: str, size: int, status: str = "done") -> int:
+        """Record the document's hash and chunk count.
+
+        Re-ingesting an unchanged document finds every chunk already part
+        of the earlier copy; its row is then dropped and the id of the
+        earlier copy returned instead.
+        """
+        with self._lock, self._conn:
+            namespace, = self._conn.execute("SELECT namespace FROM documents WHERE id = ?", (document_id,)).fetchone()
+            chunks = self._conn.execute(
+                "SELECT COUNT(*) FROM document_chunks WHERE document_id = ?", (document_id,)
+            ).fetchone()[0]
+            earlier = self._conn.execute(
+                "SELECT id FROM documents WHERE namespace = ? AND hash = ? AND id != ? AND status = 'done'",
+                (namespace, content_hash, document_id),
+            ).fetchone()
+            if earlier and status == "done" and not self._conn.execute(
+                "SELECT 1 FROM document_chunks WHERE document_id = ? AND chunk_id NOT IN "
+                "(SELECT chunk_id FROM document_chunks WHERE document_id = ?) LIMIT 1",
+                (document_id, earlier[0]),
+            ).fetchone():
+                self._conn.execute("DELETE FROM document_chunks WHERE document_id = ?", (document_id,))
+                self._conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+                return earlier[0]
+            self._conn.execute(
+                "UPDATE documents SET hash = ?, chunks = ?, bytes = ?, status = ? WHERE id = ?",
+                (content_hash, chunks, size, status, document_id),
+            )
+            return document_id
+
+    def delete_document(self, document_id: int) -> int:
+        """Remove a document and the chunks no other document contains; returns the number of chunks removed"""
+        with self._lock, self._conn:
+            linked = self._conn.execute(
+                "SELECT c.namespace, c.id FROM document_chunks l JOIN chunks c ON c.id = l.chunk_id WHERE l.document_id = ?",
+                (document_id,),
+            ).fetchall()
+            self._conn.execute("DELETE FROM document_chunks WHERE document_id = ?", (document_id,))
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+            rows = [
+                row for row in linked
+                if not self._conn.execute("SELECT 1 FROM document_chunks WHERE chunk_id = ? LIMIT 1", (row[1],)).fetchone()
+            ]
+            for namespace in {row[0] for row in rows}:
+                self.vectors(namespace).delete([row[1] for row in rows if row[0] == namespace])
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(row[1],) for row in rows])
+            # Chunks kept for other documents are attributed to the earliest of them
+            self._conn.execute(
+                "UPDATE chunks SET document_id = "
+                "(SELECT MIN(document_id) FROM document_chunks WHERE chunk_id = chunks.id) WHERE document_id = ?",
+                (document_id,),
+            )
+            return len(rows)
+
+    def compact(self, namespace: str) -> int:
+        """Drop deleted chunks' vectors from disk; returns how many were dropped"""
+        if not self.vectors(namespace).deleted_ids():
+            return 0
+        # Repack the index first so it no longer lists the rows about to disappear
+        if self.index(namespace).stats().get("generation"):
+            self.index(namespace).build(retrain=False)
+        return self.vectors(namespace).compact()
+
+    # --- Index maintenance ---
+    def schedule_rebuild(self, namespace: str):
+        """Fold new chunks into the namespace's index on a worker thread, one build at a time"""
+        with self._rebuild_lock:
+            if namespace in self._rebuilds:
+                # Chunks added while a build runs get another pass once it finishes
+                self._rebuild_again.add(namespace)
+                return
+            thread = threading.Thread(target=self._rebuild, args=(namespace,), name=f"ivf-{namespace}", daemon=True)
+            self._rebuilds[namespace] = thread
+        thread.start()
+
+    def _rebuild(self, namespace: str):
+        while True:
+            try:
+                meta = self.index(namespace).maybe_rebuild()
+                if meta:
+                    logger.info(f"Rebuilt {namespace} index: {meta['rows']} rows in {meta['build_seconds']}s")
+            except Exception as e:
+                # Searches keep using the previous generation (or exact search)
+                logger.warning(f"Index rebuild failed for {namespace}: {e}")
+            with self._rebuild_lock:
+                if namespace not in self._rebuild_again:
+                    del self._rebuilds[namespace]
+                    return
+                self._rebuild_again.discard(namespace)
+
+    def wait_for_rebuilds(self, timeout: Optional[float] = None):
+        """Block until scheduled index builds have finished"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._rebuild_lock:
+                threads = list(self._rebuilds.values())
+            if not threads:
+                return
+            for thread in threads:
+                thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+    def namespaces(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT namespace FROM chunks ORDER BY namespace")]
+
+    def maintain(self, namespaces: Optional[Iterable[str]] = None, compact: bool = False, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Bring indexes up to date in the calling thread (``force`` rebuilds them from scratch)"""
+        report = {}
+        for namespace in namespaces or self.namespaces():
+            entry = {"compacted": self.compact(namespace) if compact else 0}
+            index = self.index(namespace)
+            entry["built"] = bool(index.build() if force else index.maybe_rebuild())
+            entry["index"] = index.stats()
+            report[namespace] = entry
+        return report
+
+    # --- Reading ---
+    def search(self, vector: np.ndarray, namespaces: Iterable[str], k: int = 5) -> List[Dict[str, Any]]:
+        """The ``k`` chunks most similar to ``vector`` (cosine) across ``namespaces``"""
+        hits = []
+        for namespace in namespaces:
+            hits.extend(self.index(namespace).search(vector, k))
+        hits = sorted(hits, key=lambda hit: -hit[1])[:k]
+        return self.chunks([chunk_id for chunk_id, _ in hits], [score for _, score in hits])
+
+    def chunks(self, ids: Sequence[int], scores: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+        """Chunk rows for ``ids``, in the same order, each with its ``score`` if given"""
+        if not ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.id, c.namespace, c.document_id, c.position, c.text, d.source "
+                f"FROM chunks c LEFT JOIN documents d ON d.id = c.document_id WHERE c.id IN ({','.join('?' * len(ids))})",
+                list(ids),
+            ).fetchall()
+        by_id = {row["id"]: dict(row) for row in rows}
+        return [
+            {**by_id[chunk_id], **({"score": scores[i]} if scores is not None else {})}
+            for i, chunk_id in enumerate(ids) if chunk_id in by_id
+        ]
+
+    def version(self, namespaces: Iterable[str]) -> Tuple[Tuple[int, int, int], ...]:
+        """Changes whenever a chunk is added to, deleted from or compacted out of ``namespaces``"""
+        version = []
+        for namespace in namespaces:
+            stats = self.vectors(namespace).stats()
+            version.append((self.vectors(namespace).last_id, stats["rows"], stats["deleted"]))
+        return tuple(version)
+
+    def documents(self, namespace: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        where, params = ("WHERE namespace = ?", [namespace]) if namespace else ("", [])
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM documents {where} ORDER BY id DESC LIMIT ?", params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Documents and chunks per namespace"""
+        with self._lock:
+            documents = dict(self._conn.execute(
+                "SELECT namespace, COUNT(*) FROM documents WHERE status = 'done' GROUP BY namespace"
+            ).fetchall())
+            chunks = dict(self._conn.execute("SELECT namespace, COUNT(*) FROM chunks GROUP BY namespace").fetchall())
+        return {
+            namespace: {"documents": documents.get(namespace, 0), "chunks": chunks.get(namespace, 0)}
+            for namespace in sorted(set(documents) | set(chunks))
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_stores: Dict[str, KnowledgeStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_knowledge_store(path: Optional[str] = None) -> KnowledgeStore:
+    """Shared KnowledgeStore per database path"""
+    path = os.path.abspath(path or KNOWLEDGE_DB)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = KnowledgeStore(path)
+        return _stores[path]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or refresh the knowledge store's search indexes")
+    parser.add_argument("--agent", action="append", help="namespace to maintain (repeatable; default: all)")
+    parser.add_argument("--db", help="knowledge database (default: KNOWLEDGE_DB)")
+    parser.add_argument("--compact", action="store_true", help="also drop deleted chunks' vectors from disk")
+    parser.add_argument("--force", action="store_true", help="retrain every index, even if up to date")
+    args = parser.parse_args(argv)
+
+    report = get_knowledge_store(args.db).maintain(args.agent, compact=args.compact, force=args.force)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Memory-mapped vector storage: float32 rows on disk, paged in only when touched
+
+One VectorStore is four files sharing a path prefix:
+
+- ``<path>.json``: dimension
+- ``<path>.f32``: float32 rows, appended in id order
+- ``<path>.ids``: int64 id of each row (the id map; increasing, so lookups bisect it)
+- ``<path>.deleted``: append log of deleted ids
+
+Opening a store only maps the files; nothing is read until a row is used.
+Appends go to the end of the files and readers remap when they grow.
+"""
+import os
+import json
+import threading
+from typing import Dict, Any, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+SEARCH_BLOCK = int(os.getenv("KNOWLEDGE_SEARCH_BLOCK", "65536"))
+
+
+class VectorStore:
+    """Append-only id -> float32 vector map backed by memory-mapped files"""
+
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.dim = dim
+        if os.path.exists(path + ".json"):
+            with open(path + ".json") as f:
+                self.dim = json.load(f)["dim"]
+        self._rows = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self._deleted: Set[int] = set()
+        self._deleted_size = 0
+
+    # --- Mapping (caller holds self._lock) ---
+    def _refresh(self):
+        """Map rows appended since the last call (possibly by another process)"""
+        if self.dim is None:
+            return
+        try:
+            ids_size = os.path.getsize(self.path + ".ids")
+            vectors_size = os.path.getsize(self.path + ".f32")
+        except FileNotFoundError:
+            return
+        # A row counts once both its vector and its id are on disk
+        rows = min(ids_size // 8, vectors_size // (4 * self.dim))
+        if rows != self._rows:
+            self._rows = rows
+            self._vectors = np.memmap(self.path + ".f32", np.float32, "r", shape=(rows, self.dim)) if rows else None
+            self._ids = np.memmap(self.path + ".ids", np.int64, "r", shape=(rows,)) if rows else None
+        try:
+            deleted_size = os.path.getsize(self.path + ".deleted")
+        except FileNotFoundError:
+            deleted_size = 0
+        if deleted_size != self._deleted_size:
+            with open(self.path + ".deleted", "rb") as f:
+                f.seek(self._deleted_size)
+                self._deleted.update(np.frombuffer(f.read(deleted_size - self._deleted_size), np.int64).tolist())
+            self._deleted_size = deleted_size
+
+    def _rows_of(self, ids: Sequence[int]) -> np.ndarray:
+        """Row of each id, -1 where it is absent or deleted"""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not self._rows:
+            return np.full(len(ids), -1)
+        rows = np.searchsorted(self._ids, ids)
+        found = rows < self._rows
+        found[found] = self._ids[rows[found]] == ids[found]
+        found &= np.array([int(i) not in self._deleted for i in ids], dtype=bool)
+        return np.where(found, rows, -1)
+
+    # --- Writing ---
+    def add(self, ids: Sequence[int], vectors: np.ndarray):
+        """Append vectors; ids must be greater than every id already stored"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path + ".json", "w") as f:
+                    json.dump({"dim": self.dim, "dtype": "float32"}, f)
+            if vectors.shape != (len(ids), self.dim):
+                raise ValueError(f"Expected {len(ids)} vectors of dimension {self.dim}, got {vectors.shape}")
+            self._refresh()
+            last = self._ids[-1] if self._rows else -1
+            if ids[0] <= last or np.any(np.diff(ids) <= 0):
+                raise ValueError("Vector ids must be added in increasing order")
+            # Truncate a partial row left by an interrupted append, then vectors before ids
+            self._truncate(self.path + ".f32", self._rows * self.dim * 4)
+            self._truncate(self.path + ".ids", self._rows * 8)
+            with open(self.path + ".f32", "ab") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.path + ".ids", "ab") as f:
+                f.write(ids.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+
+    def delete(self, ids: Sequence[int]) -> int:
+        """Tombstone ids; their rows are dropped by ``compact``. Returns how many were live"""
+        with self._lock:
+            self._refresh()
+            rows = self._rows_of(ids)
+            live = np.asarray(ids, dtype=np.int64)[rows >= 0]
+            if len(live):
+                with open(self.path + ".deleted", "ab") as f:
+                    f.write(live.tobytes())
+                self._refresh()
+            return len(live)
+
+    def compact(self) -> int:
+        """Rewrite the files without deleted rows; returns how many rows were dropped"""
+        with self._lock:
+            self._refresh()
+            if not self._deleted:
+                return 0
+            keep = ~np.isin(self._ids, np.fromiter(self._deleted, np.int64))
+            dropped = int(self._rows - keep.sum())
+            for suffix, data in ((".f32", self._vectors), (".ids", self._ids)):
+                with open(self.path + suffix + ".tmp", "wb") as f:
+                    for start in range(0, self._rows, SEARCH_BLOCK):
+                        f.write(np.ascontiguousarray(data[start:start + SEARCH_BLOCK][keep[start:start + SEARCH_BLOCK]]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._vectors = self._ids = None
+            os.replace(self.path + ".f32.tmp", self.path + ".f32")
+            os.replace(self.path + ".ids.tmp", self.path + ".ids")
+            os.remove(self.path + ".deleted")
+            self._rows, self._deleted, self._deleted_size = 0, set(), 0
+            self._refresh()
+            return dropped
+
+    @staticmethod
+    def _truncate(path: str, size: int):
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            os.truncate(path, size)
+
+    # --- Reading ---
+    def get(self, ids: Sequence[int]) -> np.ndarray:
+        """Vectors for ``ids`` (rows of zeros for unknown ids)"""
+        with self._lock:
+            self._refresh()
+            rows = self._rows_of(ids)
+            out = np.zeros((len(rows), self.dim or 0), dtype=np.float32)
+            if (rows >= 0).any():
+                out[rows >= 0] = self._vectors[rows[rows >= 0]]
+            return out
+
+    def search(self, query: np.ndarray, k: int = 5) -> List[Tuple[int, float]]:
+        """Exact top-``k`` ``(id, score)`` by dot product, scanning the rows block by block"""
+        with self._lock:
+            self._refresh()
+            rows, vectors, ids, deleted = self._rows, self._vectors, self._ids, set(self._deleted)
+        if not rows:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        want = k + len(deleted)
+        best_ids, best_scores = [], []
+        for start in range(0, rows, SEARCH_BLOCK):
+            scores = vectors[start:start + SEARCH_BLOCK] @ query
+            top = np.argpartition(-scores, min(want, len(scores)) - 1)[:want]
+            best_ids.append(ids[start:start + SEARCH_BLOCK][top])
+            best_scores.append(scores[top])
+        all_ids, all_scores = np.concatenate(best_ids), np.concatenate(best_scores)
+        results = []
+        for i in np.argsort(-all_scores):
+            if int(all_ids[i]) not in deleted:
+                results.append((int(all_ids[i]), float(all_scores[i])))
+                if len(results) == k:
+                    break
+        return results
+
+    def rows_after(self, last_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """``(ids, vectors)`` of rows added after ``last_id``, deleted ones included (mapped, not copied)"""
+        with self._lock:
+            self._refresh()
+            if not self._rows:
+                return np.zeros(0, dtype=np.int64), np.zeros((0, self.dim or 0), dtype=np.float32)
+            start = int(np.searchsorted(self._ids, last_id, side="right"))
+            return self._ids[start:], self._vectors[start:]
+
+    def deleted_ids(self) -> Set[int]:
+        with self._lock:
+            self._refresh()
+            return set(self._deleted)
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self._ids[-1]) if self._rows else 0
+
+    def ids(self) -> np.ndarray:
+        """Live ids in insertion order"""
+        with self._lock:
+            self._refresh()
+            if not self._rows:
+                return np.zeros(0, dtype=np.int64)
+            ids = np.asarray(self._ids)
+            return ids[~np.isin(ids, np.fromiter(self._deleted, np.int64))] if self._deleted else ids.copy()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._rows - len(self._deleted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            return {"dim": self.dim, "rows": self._rows, "deleted": len(self._deleted), "bytes": self._rows * (self.dim or 0) * 4}
@@ -7,27 +7,37 @@ class State(TypedDict):
     messages: Annotated[list, add_messages]
     agent: str
 
+ROLES = {"human": "user", "ai": "assistant", "system": "system"}
+
+def as_openai_message(message):
+    if isinstance(message, dict):
+        return {"role": message["role"], "content": message["content"]}
+    return {"role": ROLES.get(message.type, "user"), "content": message.content}
+
 def call_agent(state: State):
     agent = state.get("agent", "Strategy")
     messages = state.get("messages", [])
     if not messages:
         return {"messages": [{"role": "assistant", "content": "No messages to process"}]}
-    last_message = messages[-1]["content"]
+    last = messages[-1]
+    # add_messages turns dict inputs into message objects
+    last_message = last["content"] if isinstance(last, dict) else last.content
     if agent == "ghc_dt":
         from agents.ghc_dt import run_ghc_dt
         result = run_ghc_dt(last_message, state)
         return {"messages": [{"role": "assistant", "content": result["answer"]}]}
     else:
-        import openai
+        from openai_client import get_openai_client
         openai_key = os.getenv("OPENAI_API_KEY")
         if not openai_key:
             return {"messages": [{"role": "assistant", "content": "❌ OpenAI API key not configured"}]}
-        client = openai.OpenAI(api_key=openai_key)
+        client = get_openai_client()
         response = client.chat.completions.create(
             model="gpt-4",
             messages=[
                 {"role": "system", "content": f"You are a {agent} specialist for Green Hill Canarias cannabis operations."},
-                {"role": "user", "content": last_message}
+                # Full thread history, so resumed threads keep their context
+                *[as_openai_message(m) for m in messages]
             ],
             max_tokens=1000
         )
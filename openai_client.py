@@ -1,65 +1,519 @@
-"""OpenAI client with API key fallback"""
+"""OpenAI clients: shared connection pools and a rate-limit-aware multi-key dispatcher"""
 import os
-from openai import OpenAI
-from typing import Optional, List
+import re
+import asyncio
+import time
+import functools
+import threading
+import httpx
+import openai
+from openai import OpenAI, AsyncOpenAI
+from typing import Optional, List, Dict, Tuple, Iterator, AsyncIterator, Any
 import logging
 
+from circuit_breaker import CircuitOpenError, get_breaker
+
 logger = logging.getLogger(__name__)
 
+# Connection pool tuning shared by every client handed out below
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+# Per-key rate limits assumed until response headers report the real ones
+RPM_PER_KEY = float(os.getenv("OPENAI_RPM_PER_KEY", "500"))
+TPM_PER_KEY = float(os.getenv("OPENAI_TPM_PER_KEY", "200000"))
+COMPLETION_TOKENS_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_TOKENS_ESTIMATE", "512"))
+RATE_LIMIT_MAX_WAIT = float(os.getenv("OPENAI_RATE_LIMIT_MAX_WAIT", "30"))
+
+# Errors tied to one key: the request is retried on another key
+KEY_ERRORS = (openai.RateLimitError, openai.AuthenticationError, openai.PermissionDeniedError)
+
+# Only server-side failures trip the shared per-host circuit: 401/429 are per key
+# and are handled by key rotation instead
+BREAKER_STATUSES = frozenset((500, 502, 503, 504))
+
+_registry_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_async_http_loop: Optional[asyncio.AbstractEventLoop] = None
+_clients: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+_async_clients: Dict[Tuple[str, Optional[str]], AsyncOpenAI] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+
+
+def _breaker_for(request: httpx.Request):
+    return get_breaker(f"{request.url.scheme}://{request.url.netloc.decode('ascii')}")
+
+
+def _open_response(request: httpx.Request, error: CircuitOpenError) -> httpx.Response:
+    # x-should-retry stops the SDK's own retry/backoff loop, so callers fail fast
+    return httpx.Response(
+        503,
+        headers={"x-should-retry": "false", "retry-after": f"{error.retry_in:.0f}"},
+        json={"error": {"message": str(error), "type": "circuit_open"}},
+        request=request,
+    )
+
+
+def _record(breaker, response: Optional[httpx.Response], error: Optional[BaseException] = None):
+    if error is not None:
+        breaker.record_failure(error)
+    elif response.status_code in BREAKER_STATUSES:
+        breaker.record_failure(f"{response.status_code} {response.reason_phrase}")
+    else:
+        breaker.record_success()
+
+
+class BreakerTransport(httpx.BaseTransport):
+    """httpx transport consulting the per-host circuit breaker around each request"""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = _breaker_for(request)
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            return _open_response(request, e)
+        try:
+            response = self._transport.handle_request(request)
+        except Exception as e:
+            _record(breaker, None, e)
+            raise
+        _record(breaker, response)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncBreakerTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of BreakerTransport"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        breaker = _breaker_for(request)
+        try:
+            breaker.before_call()
+        except CircuitOpenError as e:
+            return _open_response(request, e)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception as e:
+            _record(breaker, None, e)
+            raise
+        _record(breaker, response)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide keep-alive HTTP pool used by every sync OpenAI client"""
+    global _http_client
+    if _http_client is None:
+        with _registry_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    transport=BreakerTransport(httpx.HTTPTransport(limits=_limits())),
+                    timeout=_timeout(),
+                )
+    return _http_client
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Process-wide keep-alive HTTP pool used by every async OpenAI client.
+
+    Pooled connections belong to the event loop that opened them, so the pool
+    is replaced once that loop has closed (e.g. after ``asyncio.run``).
+    """
+    global _async_http_client, _async_http_loop
+    loop = _running_loop()
+    if _async_http_client is None or (_async_http_loop is not None and _async_http_loop.is_closed()):
+        with _registry_lock:
+            if _async_http_client is None or (_async_http_loop is not None and _async_http_loop.is_closed()):
+                _async_http_client = httpx.AsyncClient(
+                    transport=AsyncBreakerTransport(httpx.AsyncHTTPTransport(limits=_limits())),
+                    timeout=_timeout(),
+                )
+                _async_http_loop = None
+    if _async_http_loop is None and loop is not None:
+        _async_http_loop = loop
+    return _async_http_client
+
+
+def get_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> OpenAI:
+    """Long-lived OpenAI client for (api_key, base_url), created on first use"""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL")
+    key = (api_key, base_url)
+    client = _clients.get(key)
+    if client is None:
+        http_client = get_http_client()
+        with _registry_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+                _clients[key] = client
+    return client
+
+
+def get_async_client(api_key: Optional[str] = None, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """Long-lived AsyncOpenAI client for (api_key, base_url), created on first use"""
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL")
+    key = (api_key, base_url)
+    http_client = get_async_http_client()
+    client = _async_clients.get(key)
+    if client is None or client._client is not http_client:
+        with _registry_lock:
+            client = _async_clients.get(key)
+            if client is None or client._client is not http_client:
+                client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+                _async_clients[key] = client
+    return client
+
+
+def stream_chat(client, **kwargs) -> Iterator[str]:
+    """Yield the text deltas of a streamed chat completion"""
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+async def astream_chat(client, **kwargs) -> AsyncIterator[str]:
+    """Async ``stream_chat`` over a client exposing ``acreate`` (the key dispatcher)"""
+    async for chunk in await client.acreate(stream=True, **kwargs):
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_chat_model(model: str, temperature: float, api_key: Optional[str], base_url: Optional[str]):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        openai_api_key=api_key,
+        base_url=base_url,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
+
+
+def get_chat_model(model: str, temperature: float, api_key: Optional[str] = None, base_url: Optional[str] = None):
+    """Memoized ChatOpenAI keyed on (model, temperature, key, base_url).
+
+    Changing any of these (e.g. GHC_DT_MODEL or a rotated key) yields a fresh
+    instance on the next call; ``clear_chat_model_cache`` drops them all.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL")
+    return _cached_chat_model(model, float(temperature), api_key, base_url)
+
+
+def clear_chat_model_cache():
+    """Forget every memoized ChatOpenAI instance"""
+    _cached_chat_model.cache_clear()
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """OpenAI reset durations ("20ms", "1s", "6m0s", "1h2m3.5s") to seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(n) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit] for n, unit in parts)
+
+
+def estimate_tokens(kwargs: Dict[str, Any]) -> int:
+    """Rough token cost of a chat request as counted by the TPM limit (prompt + max output)"""
+    chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages") or [])
+    max_output = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or COMPLETION_TOKENS_ESTIMATE
+    return chars // 4 + int(max_output)
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; corrected from response headers"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` is available (0 if it is now)"""
+        self._refill(now)
+        needed = min(amount, self.capacity) - self.tokens
+        return max(needed, 0) * 60 / self.capacity
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= amount
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+        if remaining is not None:
+            self.tokens = min(remaining, self.capacity)
+
+
+class _KeyState:
+    def __init__(self, api_key: str, rpm: float, tpm: float, base_url: Optional[str]):
+        self.api_key = api_key
+        self.label = f"...{api_key[-4:]}"
+        # No SDK-level retries: a 429 moves the request to another key instead
+        self.client = get_client(api_key, base_url).with_options(max_retries=0)
+        self.base_url = base_url
+        self._async_client: Optional[AsyncOpenAI] = None
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.disabled: Optional[str] = None
+        self.in_flight = 0
+        self.served = 0
+        self.rate_limited = 0
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        # Follows get_async_client when its pool is replaced for a new event loop
+        client = get_async_client(self.api_key, self.base_url)
+        if self._async_client is None or self._async_client._client is not client._client:
+            self._async_client = client.with_options(max_retries=0)
+        return self._async_client
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        if self.disabled:
+            return float("inf")
+        return max(self.blocked_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now), 0)
+
+
 class OpenAIClientWithFallback:
-    """OpenAI client that tries multiple API keys from environment"""
-    
-    def __init__(self):
-        self.api_keys = []
-        
-        # Load keys from environment only
-        primary_key = os.getenv("OPENAI_API_KEY")
-        fallback_key = os.getenv("OPENAI_API_KEY_FALLBACK")
-        
-        if primary_key:
-            self.api_keys.append(primary_key)
-        if fallback_key:
-            self.api_keys.append(fallback_key)
-        
-        if not self.api_keys:
+    """Rate-limit-aware dispatcher over every configured OpenAI API key.
+
+    Each key has request and token buckets (``OPENAI_RPM_PER_KEY`` /
+    ``OPENAI_TPM_PER_KEY``), corrected from the ``x-ratelimit-*`` headers of
+    every response. A request goes to the key with the most headroom; a 429
+    cools that key down for its ``retry-after`` and the request moves on to
+    the next key. Invalid or out-of-quota keys are taken out of rotation.
+    When every key is exhausted the call waits up to ``max_wait`` seconds for
+    the first one to refill. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        api_keys: Optional[List[str]] = None,
+        base_url: Optional[str] = None,
+        rpm: float = RPM_PER_KEY,
+        tpm: float = TPM_PER_KEY,
+        max_wait: float = RATE_LIMIT_MAX_WAIT,
+    ):
+        if api_keys is None:
+            api_keys = [os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_API_KEY_FALLBACK")]
+            api_keys += (os.getenv("OPENAI_API_KEYS") or "").split(",")
+        api_keys = list(dict.fromkeys(key.strip() for key in api_keys if key and key.strip()))
+        if not api_keys:
             raise ValueError("No OpenAI API keys configured in environment")
-        
-        self.current_key_index = 0
-        self._client = OpenAI(api_key=self.api_keys[0])
-    
-    def _try_next_key(self):
-        """Switch to next API key"""
-        self.current_key_index += 1
-        if self.current_key_index < len(self.api_keys):
-            self._client = OpenAI(api_key=self.api_keys[self.current_key_index])
-            return True
-        return False
-    
+
+        self.api_keys = api_keys
+        self.max_wait = max_wait
+        self._keys = [_KeyState(key, rpm, tpm, base_url) for key in api_keys]
+        self._lock = threading.Lock()
+
     @property
     def chat(self):
         return self
-    
+
     @property
     def completions(self):
         return self
-    
+
     def create(self, **kwargs):
-        """Create completion with automatic fallback"""
-        last_error = None
-        
-        for _ in range(len(self.api_keys)):
+        """Create a chat completion on the key with the most rate-limit headroom"""
+        return self._call(estimate_tokens(kwargs), lambda client: client.chat.completions.with_raw_response.create(**kwargs))
+
+    def embed(self, **kwargs):
+        """Create embeddings (``model``, ``input``) on the key with the most rate-limit headroom"""
+        inputs = kwargs.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else inputs or []
+        cost = sum(len(text) for text in inputs) // 4 + 1
+        return self._call(cost, lambda client: client.embeddings.with_raw_response.create(**kwargs))
+
+    def _call(self, cost: int, request):
+        """Run ``request(client)`` (a raw-response call) on the best key, moving on after 429s"""
+        deadline = time.monotonic() + self.max_wait
+        last_error: Optional[Exception] = None
+
+        while True:
+            state, wait = self._acquire(cost)
+            if state is None:
+                _check_wait(wait, deadline, last_error)
+                time.sleep(wait)
+                continue
             try:
-                return self._client.chat.completions.create(**kwargs)
-            except Exception as e:
+                raw = request(state.client)
+            except KEY_ERRORS as e:
                 last_error = e
-                if "invalid_api_key" in str(e) or "Incorrect API key" in str(e):
-                    if not self._try_next_key():
-                        break
-                else:
-                    raise e
-        
-        raise last_error or Exception("All API keys failed")
-
-def get_openai_client():
-    """Get OpenAI client with fallback support"""
-    return OpenAIClientWithFallback()
+                self._release(state, error=e)
+                continue
+            except BaseException:
+                self._release(state)
+                raise
+            self._release(state, headers=raw.headers)
+            return raw.parse()
+
+    async def acreate(self, **kwargs):
+        """Async ``create``: same keys and buckets, waiting without blocking the event loop"""
+        cost = estimate_tokens(kwargs)
+        deadline = time.monotonic() + self.max_wait
+        last_error: Optional[Exception] = None
+
+        while True:
+            state, wait = self._acquire(cost)
+            if state is None:
+                _check_wait(wait, deadline, last_error)
+                await asyncio.sleep(wait)
+                continue
+            try:
+                raw = await state.async_client.chat.completions.with_raw_response.create(**kwargs)
+            except KEY_ERRORS as e:
+                last_error = e
+                self._release(state, error=e)
+                continue
+            except BaseException:
+                self._release(state)
+                raise
+            self._release(state, headers=raw.headers)
+            return raw.parse()
+
+    def _acquire(self, cost: int) -> Tuple[Optional[_KeyState], float]:
+        """Reserve budget on the best key, or return the shortest wait if none has headroom"""
+        now = time.monotonic()
+        with self._lock:
+            waits = [(state.wait_time(cost, now), state) for state in self._keys]
+            ready = [state for wait, state in waits if wait == 0]
+            if not ready:
+                return None, min(wait for wait, _ in waits)
+            state = max(ready, key=lambda s: (s.requests.tokens / s.requests.capacity, -s.in_flight))
+            state.requests.take(1, now)
+            state.tokens.take(cost, now)
+            state.in_flight += 1
+            return state, 0.0
+
+    def _release(self, state: _KeyState, headers=None, error: Optional[Exception] = None):
+        now = time.monotonic()
+        if error is not None and getattr(error, "response", None) is not None:
+            headers = error.response.headers
+        with self._lock:
+            state.in_flight -= 1
+            if headers is not None:
+                state.requests.sync(_header(headers, "x-ratelimit-limit-requests"),
+                                    _header(headers, "x-ratelimit-remaining-requests"), now)
+                state.tokens.sync(_header(headers, "x-ratelimit-limit-tokens"),
+                                  _header(headers, "x-ratelimit-remaining-tokens"), now)
+            if error is None:
+                state.served += 1
+            elif isinstance(error, openai.RateLimitError) and "insufficient_quota" not in str(error):
+                state.rate_limited += 1
+                state.blocked_until = now + _retry_after(headers)
+                logger.warning(f"OpenAI key {state.label} rate limited; cooling down")
+            else:
+                state.disabled = type(error).__name__
+                logger.warning(f"OpenAI key {state.label} disabled: {error}")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": state.label,
+                    "disabled": state.disabled,
+                    "in_flight": state.in_flight,
+                    "served": state.served,
+                    "rate_limited": state.rate_limited,
+                    "requests_left": round(state.requests.tokens),
+                    "tokens_left": round(state.tokens.tokens),
+                    "cooldown": round(max(state.blocked_until - now, 0), 1),
+                }
+                for state in self._keys
+            ]
+
+
+def _check_wait(wait: float, deadline: float, last_error: Optional[Exception]):
+    if wait == float("inf"):
+        raise last_error or RuntimeError("No usable OpenAI API keys (all invalid or out of quota)")
+    if time.monotonic() + wait > deadline:
+        raise last_error or RuntimeError(f"All OpenAI API keys are rate limited for {wait:.1f}s")
+
+
+def _header(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_after(headers) -> float:
+    """Cooldown after a 429: Retry-After, else the later of the reset headers (either limit may have tripped)"""
+    if headers is not None:
+        retry_ms = _header(headers, "retry-after-ms")
+        if retry_ms is not None:
+            return retry_ms / 1000
+        retry = _header(headers, "retry-after")
+        if retry is not None:
+            return retry
+        resets = [parse_reset(headers.get(name)) for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+        resets = [reset for reset in resets if reset is not None]
+        if resets:
+            return max(resets)
+    return 1.0
+
+
+_dispatcher: Optional[OpenAIClientWithFallback] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_openai_client() -> OpenAIClientWithFallback:
+    """Process-wide key dispatcher, so rate-limit state is shared by every caller"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = OpenAIClientWithFallback()
+    return _dispatcher
@@ -0,0 +1,365 @@
+"""Response cache for agent answers with TTL, LRU eviction and hit/miss counters"""
+import os
+import re
+import atexit
+import asyncio
+import json
+import time
+import hashlib
+import inspect
+import sqlite3
+import threading
+import functools
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "900"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# Optional persistent second tier, e.g. "emergency_cache.db"
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB")
+RESPONSE_CACHE_DB_BATCH_SIZE = int(os.getenv("RESPONSE_CACHE_DB_BATCH_SIZE", "32"))
+RESPONSE_CACHE_DB_FLUSH_INTERVAL = float(os.getenv("RESPONSE_CACHE_DB_FLUSH_INTERVAL", "2"))
+RESPONSE_CACHE_DB_PURGE_INTERVAL = float(os.getenv("RESPONSE_CACHE_DB_PURGE_INTERVAL", "3600"))
+
+# Governance fields that change what an advisor would answer
+STATE_FIELDS = ("phase", "zec_rate", "cash_buffer_to")
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.¿¡,;:]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, Unicode forms, whitespace and trailing punctuation"""
+    text = unicodedata.normalize("NFKC", question or "").casefold()
+    text = _WHITESPACE.sub(" ", text).strip()
+    text = _TRAILING_PUNCTUATION.sub("", text)
+    return text.lstrip("¿¡ ")
+
+
+def make_key(
+    agent: str,
+    command: Optional[str],
+    question: str,
+    state: Optional[Dict[str, Any]] = None,
+    state_fields: Iterable[str] = STATE_FIELDS,
+    variant: Any = None,
+) -> str:
+    """Stable hash of agent, command, normalized question, relevant state and
+    ``variant`` (anything else the answer depends on, e.g. model and prompt)"""
+    state = state or {}
+    payload = {
+        "agent": agent,
+        "command": command,
+        "question": normalize_question(question),
+        "state": {field: state.get(field) for field in state_fields},
+    }
+    if variant is not None:
+        payload["variant"] = variant
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteResponseStore:
+    """Persistent tier backed by the ``cached_responses`` table.
+
+    Runs in WAL mode with a composite (api_endpoint, request_hash) index so
+    lookups stay O(log n). Writes are buffered and committed in batches, and
+    expired rows are purged periodically.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = RESPONSE_CACHE_TTL,
+        batch_size: int = RESPONSE_CACHE_DB_BATCH_SIZE,
+        flush_interval: float = RESPONSE_CACHE_DB_FLUSH_INTERVAL,
+        purge_interval: float = RESPONSE_CACHE_DB_PURGE_INTERVAL,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[tuple, str]" = OrderedDict()
+        self._last_flush = time.monotonic()
+        self._last_purge = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")  # only takes effect on new files
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cached_responses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                api_endpoint TEXT NOT NULL,
+                request_hash TEXT NOT NULL,
+                response_data TEXT NOT NULL,
+                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cached_responses_lookup "
+            "ON cached_responses (api_endpoint, request_hash)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cached_responses_cached_at ON cached_responses (cached_at)"
+        )
+        self._conn.commit()
+        atexit.register(self.close)
+
+    def get(self, endpoint: str, key: str, ttl: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            pending = self._pending.get((endpoint, key))
+            if pending is not None:
+                return json.loads(pending)
+            row = self._conn.execute(
+                "SELECT response_data, strftime('%s', cached_at) FROM cached_responses "
+                "WHERE api_endpoint = ? AND request_hash = ? ORDER BY id DESC LIMIT 1",
+                (endpoint, key),
+            ).fetchone()
+        if not row or row[1] is None or time.time() - float(row[1]) > ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, endpoint: str, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._pending[(endpoint, key)] = json.dumps(value)
+            self._pending.move_to_end((endpoint, key))
+            now = time.monotonic()
+            if len(self._pending) >= self.batch_size or now - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+            if now - self._last_purge >= self.purge_interval:
+                self._purge_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def purge_expired(self) -> int:
+        """Delete rows older than the TTL and return how many were removed"""
+        with self._lock:
+            self._flush_locked()
+            return self._purge_locked()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._flush_locked()
+            finally:
+                self._conn.close()
+                self._conn = None
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        rows = [(endpoint, key, data) for (endpoint, key), data in self._pending.items()]
+        self._pending.clear()
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM cached_responses WHERE api_endpoint = ? AND request_hash = ?",
+                [(endpoint, key) for endpoint, key, _ in rows],
+            )
+            self._conn.executemany(
+                "INSERT INTO cached_responses (api_endpoint, request_hash, response_data) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def _purge_locked(self) -> int:
+        self._last_purge = time.monotonic()
+        with self._conn:
+            deleted = self._conn.execute(
+                "DELETE FROM cached_responses WHERE cached_at < datetime('now', ?)",
+                (f"-{int(self.ttl)} seconds",),
+            ).rowcount
+        if deleted:
+            self._conn.execute("PRAGMA incremental_vacuum")
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return deleted
+
+
+class ResponseCache:
+    """Thread-safe in-memory LRU with TTL, optionally backed by a SQLite store"""
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL,
+        store: Optional[SQLiteResponseStore] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str, endpoint: str = "agents") -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(value)
+                del self._entries[key]
+                self.expirations += 1
+
+        value = None
+        if self.store is not None:
+            try:
+                value = self.store.get(endpoint, key, self.ttl)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache read failed: {e}")
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put(key, json.dumps(value), now)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], endpoint: str = "agents"):
+        with self._lock:
+            self._put(key, json.dumps(value), time.monotonic())
+        if self.store is not None:
+            try:
+                self.store.set(endpoint, key, value)
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache write failed: {e}")
+
+    def _put(self, key: str, serialized: str, now: float):
+        self._entries[key] = (now + self.ttl, serialized)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache (survives Streamlit reruns)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                store = SQLiteResponseStore(RESPONSE_CACHE_DB, ttl=RESPONSE_CACHE_TTL) if RESPONSE_CACHE_DB else None
+                _cache = ResponseCache(store=store)
+    return _cache
+
+
+# Answer text the agents and the API send in place of an answer when a call fails
+ERROR_ANSWER_PREFIXES = ("Error", "OPENAI_API_KEY not configured")
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Only real answers: no error status, error text, demo fallback or failed (0-token) call"""
+    meta = result.get("meta") or {}
+    answer = result.get("answer")
+    if not answer or result.get("status") == "error" or meta.get("mode") == "demo":
+        return False
+    if str(answer).startswith(ERROR_ANSWER_PREFIXES):
+        return False
+    # Streamed and LangGraph answers carry no token count; agent failures report 0
+    return meta.get("tokens") is None or bool(meta.get("tokens"))
+
+
+def cached_response(
+    agent: str,
+    state_fields: Iterable[str] = STATE_FIELDS,
+    cacheable: Callable[[Dict[str, Any]], bool] = is_cacheable,
+    variant: Optional[Callable[[str, Optional[Dict[str, Any]]], Any]] = None,
+    on_hit: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+):
+    """Decorator caching ``run_*(question, state)`` answers per agent (sync or async).
+
+    ``variant(question, state)`` adds to the key whatever else the answer
+    depends on (async callers run it off the event loop, so it may block);
+    ``on_hit(question, result)`` runs for every cached answer served.
+    """
+    state_fields = tuple(state_fields)
+
+    def decorator(func):
+        def lookup(question: str, state: Optional[Dict[str, Any]]):
+            cache = get_response_cache()
+            extra = variant(question, state) if variant is not None else None
+            key = make_key(agent, None, question, state, state_fields, extra)
+            cached = cache.get(key, endpoint=agent)
+            if cached is not None:
+                cached.setdefault("meta", {})["cached"] = True
+                if on_hit is not None:
+                    on_hit(question, cached)
+            return cache, key, cached
+
+        def store(cache: ResponseCache, key: str, result: Dict[str, Any]):
+            if cacheable(result):
+                cache.set(key, result, endpoint=agent)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                if not RESPONSE_CACHE_ENABLED:
+                    return await func(question, state)
+                if variant is not None:
+                    cache, key, cached = await asyncio.to_thread(lookup, question, state)
+                else:
+                    cache, key, cached = lookup(question, state)
+                if cached is not None:
+                    return cached
+                result = await func(question, state)
+                store(cache, key, result)
+                return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+            if not RESPONSE_CACHE_ENABLED:
+                return func(question, state)
+            cache, key, cached = lookup(question, state)
+            if cached is not None:
+                return cached
+            result = func(question, state)
+            store(cache, key, result)
+            return result
+
+        return wrapper
+
+    return decorator
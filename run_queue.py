@@ -0,0 +1,98 @@
+"""Background run queue with a bounded worker pool and backpressure"""
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+RUN_WORKERS = int(os.getenv("RUN_WORKERS", "4"))
+RUN_QUEUE_MAX = int(os.getenv("RUN_QUEUE_MAX", "100"))
+
+
+class QueueFullError(Exception):
+    """Raised when the queue already holds ``max_depth`` runs"""
+
+
+class RunQueue:
+    """Executes queued runs on ``workers`` asyncio tasks.
+
+    ``submit`` never blocks: it rejects with ``QueueFullError`` once
+    ``max_depth`` runs are waiting, so callers can answer 429 instead of
+    piling up work they cannot serve in time.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[[Dict[str, Any]], Awaitable[Any]],
+        workers: int = RUN_WORKERS,
+        max_depth: int = RUN_QUEUE_MAX,
+    ):
+        self.execute = execute
+        self.workers = workers
+        self.max_depth = max_depth
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._done: Dict[str, asyncio.Event] = {}
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, run: Dict[str, Any]) -> asyncio.Event:
+        if self._queue is None:
+            raise RuntimeError("RunQueue.start() has not been called")
+        done = asyncio.Event()
+        try:
+            self._queue.put_nowait(run)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"Run queue is full ({self.max_depth} runs waiting)")
+        self._done[run["run_id"]] = done
+        return done
+
+    async def wait(self, run_id: str, timeout: Optional[float] = None) -> bool:
+        """Wait for a queued run; False if it is still unfinished after ``timeout``"""
+        done = self._done.get(run_id)
+        if done is None:
+            return True
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _worker(self, index: int):
+        while True:
+            run = await self._queue.get()
+            self.active += 1
+            try:
+                await self.execute(run)
+            except Exception:
+                logger.exception(f"Run {run['run_id']} failed in worker {index}")
+            finally:
+                self.active -= 1
+                self.completed += 1
+                self._queue.task_done()
+                done = self._done.pop(run["run_id"], None)
+                if done is not None:
+                    done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "active": self.active,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
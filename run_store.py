@@ -0,0 +1,154 @@
+"""Persistent thread and run registry for the FastAPI server (SQLite-backed)"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, List
+
+RUN_STORE_PATH = os.getenv("RUN_STORE_PATH", "runs.db")
+
+RUN_PENDING = "pending"
+RUN_RUNNING = "running"
+RUN_SUCCESS = "success"
+RUN_ERROR = "error"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    thread_id TEXT NOT NULL REFERENCES threads(thread_id),
+    run_id TEXT,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages (thread_id, id);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL REFERENCES threads(thread_id),
+    status TEXT NOT NULL,
+    input TEXT NOT NULL,
+    output TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_thread ON runs (thread_id, created_at);
+"""
+
+
+class RunStore:
+    """Threads with their message history, and runs with status and results"""
+
+    def __init__(self, path: str = RUN_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    # --- Threads ---
+    def create_thread(self, metadata: Optional[Dict[str, Any]] = None, thread_id: Optional[str] = None) -> Dict[str, Any]:
+        thread_id = thread_id or f"thread_{uuid.uuid4().hex}"
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO threads (thread_id, created_at, metadata) VALUES (?, ?, ?)",
+                (thread_id, now, json.dumps(metadata or {})),
+            )
+        return {"thread_id": thread_id, "created_at": now, "metadata": metadata or {}}
+
+    def get_thread(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        if row is None:
+            return None
+        return {"thread_id": row["thread_id"], "created_at": row["created_at"], "metadata": json.loads(row["metadata"])}
+
+    def ensure_thread(self, thread_id: str) -> Dict[str, Any]:
+        """Return the thread, registering ids minted by older clients on first use"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO threads (thread_id, created_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+        return self.get_thread(thread_id)
+
+    # --- Messages ---
+    def add_message(self, thread_id: str, role: str, content: str, run_id: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO messages (thread_id, run_id, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                (thread_id, run_id, role, content, time.time()),
+            )
+
+    def list_messages(self, thread_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Thread history, oldest first; ``limit`` keeps only the most recent messages"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, run_id, created_at FROM messages WHERE thread_id = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (thread_id, -1 if limit is None else limit),
+            ).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    # --- Runs ---
+    def create_run(self, thread_id: str, run_input: Dict[str, Any]) -> Dict[str, Any]:
+        run_id = f"run_{uuid.uuid4().hex}"
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, thread_id, status, input, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, thread_id, RUN_PENDING, json.dumps(run_input), now, now),
+            )
+        return self.get_run(run_id)
+
+    def update_run(self, run_id: str, status: str, output: Any = None, error: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, output = ?, error = ?, updated_at = ? WHERE run_id = ?",
+                (status, None if output is None else json.dumps(output), error, time.time(), run_id),
+            )
+
+    def interrupt_unfinished(self) -> int:
+        """Fail runs left pending or running by a previous process"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE runs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)",
+                (RUN_ERROR, "Interrupted by server restart", time.time(), RUN_PENDING, RUN_RUNNING),
+            ).rowcount
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._run_dict(row) if row is not None else None
+
+    def list_runs(self, thread_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM runs WHERE thread_id = ? ORDER BY created_at DESC LIMIT ?",
+                (thread_id, limit),
+            ).fetchall()
+        return [self._run_dict(row) for row in rows]
+
+    @staticmethod
+    def _run_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "run_id": row["run_id"],
+            "thread_id": row["thread_id"],
+            "status": row["status"],
+            "input": json.loads(row["input"]),
+            "output": json.loads(row["output"]) if row["output"] is not None else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark the IVF knowledge index against exact search: recall@k and latency.
+
+Builds a VectorStore of clustered synthetic embeddings (unit vectors around
+random topic centres, so nearest neighbours look like those of real text
+embeddings), trains the index, then compares its answers and timings with
+the exact block scan for a range of nprobe values. No network calls are made.
+
+Usage: python scripts/bench_ann.py [--rows 1000000] [--dim 384] [--queries 200] [--k 10] [--nprobe 8,16,24,48]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge.vectors import VectorStore
+from knowledge.ann import IVFIndex
+
+
+def clustered(rng, centres, count, noise):
+    points = centres[rng.integers(len(centres), size=count)] + rng.standard_normal((count, centres.shape[1]), dtype=np.float32) * noise
+    return points / np.linalg.norm(points, axis=1, keepdims=True)
+
+
+def timed(search, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(time.perf_counter() - start)
+    return results, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.05, help="per-dimension spread around a topic centre")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="8,16,24,48")
+    parser.add_argument("--dir", help="keep the generated store here (default: a temporary directory)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centres = rng.standard_normal((args.topics, args.dim), dtype=np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    directory = args.dir or tempfile.mkdtemp(prefix="bench_ann_")
+    store = VectorStore(os.path.join(directory, "bench"))
+
+    print(f"🔬 IVF index vs exact search ({args.rows:,} x {args.dim}, k={args.k}, {args.queries} queries)")
+    print("=" * 64)
+    if len(store) < args.rows:
+        start = time.perf_counter()
+        for first in range(len(store), args.rows, 100000):
+            count = min(100000, args.rows - first)
+            store.add(np.arange(first + 1, first + count + 1), clustered(rng, centres, count, args.noise))
+        print(f"generate + append          {time.perf_counter() - start:>8.1f} s")
+
+    index = IVFIndex(store)
+    start = time.perf_counter()
+    meta = index.build()
+    print(f"build (nlist={meta['nlist']})        {time.perf_counter() - start:>8.1f} s")
+
+    queries = clustered(rng, centres, args.queries, args.noise)
+    exact, exact_ms = timed(lambda q: store.search(q, args.k), queries)
+    print(f"\n{'search':<16}{'recall@' + str(args.k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'exact':<16}{1.0:>10.3f}{np.percentile(exact_ms, 50):>10.2f}{np.percentile(exact_ms, 95):>10.2f}")
+    truth = [{i for i, _ in result} for result in exact]
+    for nprobe in (int(n) for n in args.nprobe.split(",")):
+        approx, approx_ms = timed(lambda q: index.search(q, args.k, nprobe=nprobe), queries)
+        recall = np.mean([len(t & {i for i, _ in a}) / args.k for t, a in zip(truth, approx)])
+        print(f"{'ivf nprobe=' + str(nprobe):<16}{recall:>10.3f}{np.percentile(approx_ms, 50):>10.2f}{np.percentile(approx_ms, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-invoke LLM construction overhead of ghc_dt_node.
+
+Compares building a fresh ChatOpenAI on every call (the old behaviour) with
+the memoized openai_client.get_chat_model factory. No network calls are made.
+
+Usage: python scripts/bench_llm_factory.py [iterations]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_openai import ChatOpenAI
+from openai_client import get_chat_model
+
+
+def bench(label, factory, iterations):
+    factory()  # warm-up: imports, shared HTTP pool, first construction
+    start = time.perf_counter()
+    for _ in range(iterations):
+        factory()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / iterations * 1e6:>10.1f} µs/invoke")
+    return elapsed
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    api_key = os.getenv("OPENAI_API_KEY", "sk-benchmark")
+    model = os.getenv("GHC_DT_MODEL", "gpt-4o-mini")
+    temperature = float(os.getenv("GHC_DT_TEMPERATURE", "0.2"))
+
+    print(f"🔬 ghc_dt_node LLM construction overhead ({iterations} invokes)")
+    print("=" * 50)
+
+    fresh = bench(
+        "fresh ChatOpenAI per call",
+        lambda: ChatOpenAI(model=model, temperature=temperature, openai_api_key=api_key),
+        iterations,
+    )
+    cached = bench(
+        "memoized get_chat_model",
+        lambda: get_chat_model(model, temperature, api_key),
+        iterations,
+    )
+    print(f"\nSpeed-up: {fresh / cached:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,112 @@
 from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Tuple, List
+from concurrent.futures import ThreadPoolExecutor
 import os
+import json
+import asyncio
 import uvicorn
 
-# Import only the simple agent for now
 from simple_agent import graph as simple_graph
+from agent import graph as agent_graph
+from main import app as main_graph
+from agents.orchestrator import AGENT_STREAMERS, aconsult_all
+from agents.registry import AGENTS
+from ghc_dt import ghc_dt_graph, stream_ghc_dt
+from run_store import RunStore, RUN_PENDING, RUN_RUNNING, RUN_SUCCESS, RUN_ERROR
+from run_queue import RunQueue, QueueFullError
+from circuit_breaker import breaker_stats
 
-app = FastAPI(title="Green Hill LangGraph API", version="1.0.0")
+# ghc_dt streams through the LangGraph graph so ghc_dt_node handles evidence logging
+STREAMERS = {**AGENT_STREAMERS, "ghc_dt": stream_ghc_dt}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    run_store.interrupt_unfinished()
+    await run_queue.start()
+    yield
+    await run_queue.stop()
+
+app = FastAPI(title="Green Hill LangGraph API", version="1.0.0", lifespan=lifespan)
 
 MODE = os.getenv("MODE", "local")
 
+# Graph nodes are synchronous; run them on a bounded pool so a slow LLM call
+# never blocks the event loop and concurrency stays capped per worker.
+GRAPH_WORKERS = int(os.getenv("GRAPH_WORKERS", "8"))
+graph_executor = ThreadPoolExecutor(max_workers=GRAPH_WORKERS, thread_name_prefix="graph")
+
+# Threads, message history and run results survive restarts
+run_store = RunStore()
+THREAD_HISTORY_LIMIT = int(os.getenv("THREAD_HISTORY_LIMIT", "20"))
+RUN_WAIT_MAX = float(os.getenv("RUN_WAIT_MAX", "120"))
+
+async def run_graph(graph, state: Dict[str, Any]) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(graph_executor, graph.invoke, state)
+
 class InvokeRequest(BaseModel):
     input: Dict[str, Any]
 
+class AgentRequest(BaseModel):
+    question: str
+    command: Optional[str] = None
+    agent: str = "ghc_dt"
+    state: Dict[str, Any] = {}
+    graph: Optional[str] = None
+
+class ConsultRequest(BaseModel):
+    question: str
+    state: Dict[str, Any] = {}
+    agents: Optional[List[str]] = None
+    timeout: Optional[float] = None
+
+def _question(request: AgentRequest) -> str:
+    """The question, prefixed with the requested command (analyze, forecast, ...) if any"""
+    if request.command:
+        return f"Command: {request.command}\n\n{request.question}"
+    return request.question
+
+def _ghc_dt_input(request: AgentRequest) -> Dict[str, Any]:
+    return {"question": _question(request), "answer": "", "agent_type": "ghc_dt", "meta": {}, "state": request.state}
+
+def _ghc_dt_output(result: Dict[str, Any], request: AgentRequest) -> Dict[str, Any]:
+    return {"answer": result["answer"], "meta": result.get("meta") or {"agent": "ghc_dt"}}
+
+def _agent_input(request: AgentRequest) -> Dict[str, Any]:
+    return {"input": _question(request), "output": "", "agent_type": request.agent.capitalize()}
+
+def _agent_output(result: Dict[str, Any], request: AgentRequest) -> Dict[str, Any]:
+    return {"answer": result["output"], "meta": {"agent": request.agent}}
+
+def _main_input(request: AgentRequest) -> Dict[str, Any]:
+    return {"messages": [{"role": "user", "content": _question(request)}], "agent": request.agent}
+
+def _main_output(result: Dict[str, Any], request: AgentRequest) -> Dict[str, Any]:
+    last = result["messages"][-1]
+    content = last["content"] if isinstance(last, dict) else last.content
+    return {"answer": content, "meta": {"agent": request.agent}}
+
+# name -> (compiled graph, request -> graph input, graph output -> response)
+GRAPHS: Dict[str, Tuple[Any, Callable, Callable]] = {
+    "ghc_dt": (ghc_dt_graph, _ghc_dt_input, _ghc_dt_output),
+    "agent": (agent_graph, _agent_input, _agent_output),
+    "main": (main_graph, _main_input, _main_output),
+}
+
+def _select_graph(request: AgentRequest) -> Optional[str]:
+    """Graph for the request; None for advisors, which run on the agent registry as in /invoke/stream"""
+    if request.graph:
+        return request.graph
+    if request.agent == "ghc_dt":
+        return "ghc_dt"
+    return None if request.agent in AGENTS else "main"
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "mode": MODE}
@@ -28,32 +121,206 @@ async def version_route():
 
 @app.get("/graphs")
 async def graphs_route():
-    return {"graphs": ["agent"]}
+    return {"graphs": list(GRAPHS)}
+
+def _input_text(payload: Dict[str, Any]) -> str:
+    if "input" in payload and isinstance(payload["input"], dict) and "messages" in payload["input"]:
+        return payload["input"]["messages"][-1]["content"]
+    if "messages" in payload:
+        return payload["messages"][-1]["content"]
+    return payload.get("question", "")
+
+async def _execute_run(run: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a stored run on its graph, recording status, result and thread history."""
+    run_id, thread_id, run_input = run["run_id"], run["thread_id"], run["input"]
+    run_store.update_run(run_id, RUN_RUNNING)
+    try:
+        text = _input_text(run_input)
+        history = run_store.list_messages(thread_id, limit=THREAD_HISTORY_LIMIT)
+        run_store.add_message(thread_id, "user", text, run_id)
+
+        graph_name = run_input.get("graph")
+        if graph_name:
+            request = AgentRequest(
+                question=text,
+                agent=run_input.get("agent", "ghc_dt"),
+                state=run_input.get("state") or {},
+                graph=graph_name,
+            )
+            graph, to_input, to_output = GRAPHS[graph_name]
+            state = to_input(request)
+            if graph_name == "main":
+                # Resume the conversation from the stored history
+                state["messages"] = [{"role": m["role"], "content": m["content"]} for m in history] + state["messages"]
+            output = to_output(await run_graph(graph, state), request)["answer"]
+        else:
+            result = await run_graph(simple_graph, {"input": text, "output": ""})
+            output = result["output"]
+
+        run_store.add_message(thread_id, "assistant", output, run_id)
+        run_store.update_run(run_id, RUN_SUCCESS, output=output)
+    except Exception as e:
+        run_store.update_run(run_id, RUN_ERROR, error=str(e))
+    return run_store.get_run(run_id)
 
+def _get_thread_or_404(thread_id: str) -> Dict[str, Any]:
+    thread = run_store.get_thread(thread_id)
+    if thread is None:
+        raise HTTPException(status_code=404, detail=f"Unknown thread: {thread_id}")
+    return thread
+
+@app.post("/threads")
 @app.post("/assistants/agent/threads")
 async def create_thread(request: InvokeRequest = None):
-    return {"thread_id": "thread_123"}
+    metadata = (request.input.get("metadata") if request else None) or {}
+    return run_store.create_thread(metadata)
+
+@app.get("/threads/{thread_id}")
+async def get_thread(thread_id: str):
+    thread = _get_thread_or_404(thread_id)
+    return {**thread, "messages": run_store.list_messages(thread_id)}
+
+@app.get("/threads/{thread_id}/messages")
+async def list_thread_messages(thread_id: str, limit: Optional[int] = None):
+    _get_thread_or_404(thread_id)
+    return {"thread_id": thread_id, "messages": run_store.list_messages(thread_id, limit=limit)}
+
+# Every run goes through the queue: bounded concurrency, 429 when saturated
+run_queue = RunQueue(_execute_run)
+
+def _run_response(run: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "run_id": run["run_id"],
+        "thread_id": run["thread_id"],
+        "status": run["status"],
+        "output": run["output"]
+    }
 
 @app.post("/threads/{thread_id}/runs")
-async def create_run(thread_id: str, request: InvokeRequest):
+async def create_run(thread_id: str, request: InvokeRequest, background: bool = False):
+    """Queue a run; with ``background=true`` return at once and let clients poll or wait.
+
+    Otherwise wait up to ``RUN_WAIT_MAX`` seconds for the result (202 with the run if it is still going).
+    """
+    graph_name = request.input.get("graph")
+    if graph_name and graph_name not in GRAPHS:
+        raise HTTPException(status_code=404, detail=f"Unknown graph: {graph_name}")
+    run_store.ensure_thread(thread_id)
+    run = run_store.create_run(thread_id, request.input)
+    try:
+        run_queue.submit(run)
+    except QueueFullError as e:
+        run_store.update_run(run["run_id"], RUN_ERROR, error=str(e))
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    if background:
+        return JSONResponse(status_code=202, content=_run_response(run))
+
+    # Same cap as /wait: a run still going after RUN_WAIT_MAX is handed back for polling
+    await run_queue.wait(run["run_id"], RUN_WAIT_MAX)
+    run = run_store.get_run(run["run_id"])
+    if run["status"] in (RUN_PENDING, RUN_RUNNING):
+        return JSONResponse(status_code=202, content=_run_response(run))
+    if run["status"] == RUN_ERROR:
+        raise HTTPException(status_code=500, detail=run["error"])
+    return _run_response(run)
+
+@app.get("/threads/{thread_id}/runs")
+async def list_runs(thread_id: str, limit: int = 50):
+    _get_thread_or_404(thread_id)
+    return {"thread_id": thread_id, "runs": run_store.list_runs(thread_id, limit=limit)}
+
+@app.get("/threads/{thread_id}/runs/{run_id}")
+async def get_run(thread_id: str, run_id: str):
+    run = run_store.get_run(run_id)
+    if run is None or run["thread_id"] != thread_id:
+        raise HTTPException(status_code=404, detail=f"Unknown run: {run_id}")
+    return run
+
+@app.get("/threads/{thread_id}/runs/{run_id}/wait")
+async def wait_run(thread_id: str, run_id: str, timeout: float = 30.0):
+    """Block until the run finishes (or ``timeout`` seconds pass) and return it."""
+    run = await get_run(thread_id, run_id)
+    if run["status"] in (RUN_PENDING, RUN_RUNNING):
+        await run_queue.wait(run_id, timeout=min(timeout, RUN_WAIT_MAX))
+        run = run_store.get_run(run_id)
+    return run
+
+@app.get("/runs/{run_id}")
+async def poll_run(run_id: str):
+    run = run_store.get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Unknown run: {run_id}")
+    return run
+
+@app.get("/queue")
+async def queue_stats():
+    return run_queue.stats()
+
+@app.get("/breakers")
+async def breakers():
+    """Circuit state of each upstream endpoint this process has called."""
+    return breaker_stats()
+
+@app.get("/agents")
+async def agents_route():
+    return {"agents": [
+        {"name": name, "model": agent.config()[0], "temperature": agent.config()[1]}
+        for name, agent in AGENTS.items()
+    ]}
+
+@app.post("/consult")
+async def consult(request: ConsultRequest):
+    """Ask several advisors at once; they run as tasks on the event loop, not threads."""
     try:
-        input_text = ""
-        if "input" in request.input and "messages" in request.input["input"]:
-            input_text = request.input["input"]["messages"][0]["content"]
-        elif "messages" in request.input:
-            input_text = request.input["messages"][0]["content"]
-        
-        state = {"input": input_text, "output": ""}
-        result = simple_graph.invoke(state)
-        
-        return {
-            "run_id": "run_123",
-            "status": "success",
-            "output": result["output"]
-        }
+        return await aconsult_all(request.question, request.state, request.agents, request.timeout)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/invoke")
+async def invoke(request: AgentRequest):
+    """Run the request on the matching advisor or graph without blocking the event loop."""
+    name = _select_graph(request)
+    if name is None:
+        result = await AGENTS[request.agent].arun(_question(request), request.state)
+        if result["meta"].get("tokens") == 0:  # the advisor produced an error message, not an answer
+            raise HTTPException(status_code=500, detail=result["answer"])
+        return result
+    if name not in GRAPHS:
+        raise HTTPException(status_code=404, detail=f"Unknown graph: {name}")
+    graph, to_input, to_output = GRAPHS[name]
+    try:
+        result = await run_graph(graph, to_input(request))
+        response = to_output(result, request)
+        response["meta"] = {**response["meta"], "graph": name}
+        return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/invoke/stream")
+async def invoke_stream(request: AgentRequest):
+    """Stream an agent answer as server-sent events (token..., then end or error)."""
+    streamer = STREAMERS.get(request.agent)
+    if streamer is None:
+        raise HTTPException(status_code=404, detail=f"Unknown agent: {request.agent}")
+
+    def events():
+        parts = []
+        try:
+            for token in streamer(_question(request), request.state):
+                parts.append(token)
+                yield _sse("token", {"token": token})
+            yield _sse("end", {"answer": "".join(parts), "meta": {"agent": request.agent}})
+        except Exception as e:
+            yield _sse("error", {"message": str(e)})
+
+    # Sync generator: Starlette drains it in a worker thread, off the event loop
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8080"))
     uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,136 @@
+"""Governance state store: atomic writes, file locking and a shared in-process cache"""
+import os
+import copy
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+STATE_FILE = os.getenv("GOVERNANCE_STATE_FILE", "state.json")
+
+Changes = Union[Dict[str, Any], Callable[[Dict[str, Any]], Dict[str, Any]]]
+
+
+class StateConflictError(Exception):
+    """Raised when an update expected a version that is no longer current"""
+
+    def __init__(self, expected: int, actual: int):
+        super().__init__(f"State version is {actual}, expected {expected}")
+        self.expected = expected
+        self.actual = actual
+
+
+class StateStore:
+    """Versioned JSON state file shared by every session and worker.
+
+    Reads are served from a cache validated against the file's mtime, size
+    and inode, so only a changed file is parsed again. Updates hold an
+    exclusive lock across read-modify-write, bump ``version`` and replace the
+    file atomically (write to a temp file, fsync, rename). The file holds
+    ``{"version", "updated_at", "state"}``; a bare state dict written by older
+    code reads as version 0.
+    """
+
+    def __init__(self, path: str = STATE_FILE, default: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.default = default or {}
+        self._lock = threading.Lock()
+        self._cache: Tuple[Any, Dict[str, Any], int] = (None, {}, 0)
+
+    def get(self) -> Dict[str, Any]:
+        """A copy of the current state (the default if nothing was saved yet)"""
+        return self.get_versioned()[0]
+
+    def get_versioned(self) -> Tuple[Dict[str, Any], int]:
+        with self._lock:
+            state, version = self._read()
+        return copy.deepcopy(state), version
+
+    def update(self, changes: Changes, expected_version: Optional[int] = None) -> Tuple[Dict[str, Any], int]:
+        """Merge ``changes`` (or apply ``changes(state) -> state``) and save.
+
+        With ``expected_version`` the update is rejected with
+        ``StateConflictError`` if another writer saved in the meantime.
+        Returns the new state and version.
+        """
+        with self._lock, self._file_locked():
+            state, version = self._read()
+            if expected_version is not None and expected_version != version:
+                raise StateConflictError(expected_version, version)
+            state = copy.deepcopy(state)
+            state = changes(state) if callable(changes) else {**state, **changes}
+            self._write(state, version + 1)
+        return copy.deepcopy(state), version + 1
+
+    def replace(self, state: Dict[str, Any], expected_version: Optional[int] = None) -> Tuple[Dict[str, Any], int]:
+        return self.update(lambda _: dict(state), expected_version)
+
+    # --- File access (caller holds self._lock) ---
+    def _read(self) -> Tuple[Dict[str, Any], int]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self.default, 0
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if self._cache[0] != key:
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                return self.default, 0
+            if isinstance(data, dict) and isinstance(data.get("state"), dict) and "version" in data:
+                self._cache = (key, data["state"], int(data["version"]))
+            else:
+                self._cache = (key, data if isinstance(data, dict) else self.default, 0)
+        return self._cache[1], self._cache[2]
+
+    def _write(self, state: Dict[str, Any], version: int):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".state-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": version, "updated_at": time.time(), "state": state}, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        stat = os.stat(self.path)
+        self._cache = ((stat.st_mtime_ns, stat.st_size, stat.st_ino), state, version)
+
+    @contextmanager
+    def _file_locked(self):
+        """Exclusive lock shared with other processes updating the same file"""
+        with open(self.lock_path, "a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+_stores: Dict[str, StateStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_state_store(path: Optional[str] = None, default: Optional[Dict[str, Any]] = None) -> StateStore:
+    """Shared StateStore per path, so every session in the process uses one cache"""
+    path = os.path.abspath(path or STATE_FILE)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = StateStore(path, default)
+        elif default and not _stores[path].default:
+            _stores[path].default = default
+        return _stores[path]
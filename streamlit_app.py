@@ -7,9 +7,17 @@ import streamlit as st
 import os
 import requests
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
+from response_cache import RESPONSE_CACHE_ENABLED, get_response_cache, is_cacheable, make_key
+from evidence_log import get_evidence_writer
+from evidence_index import get_evidence_index
+from state_store import StateConflictError, get_state_store
+from http_session import get_session, timeout
+from circuit_breaker import breaker_stats
+from knowledge.retrieval import get_retriever
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="Green Hill Cockpit",
@@ -170,46 +178,50 @@ GHC_DT_MODEL = os.getenv("GHC_DT_MODEL", "gpt-4o-mini")
 GHC_DT_TEMPERATURE = float(os.getenv("GHC_DT_TEMPERATURE", "0.2"))
 GHC_DT_EVIDENCE_LOG = os.getenv("GHC_DT_EVIDENCE_LOG", "evidence.jsonl")
 
-def load_state():
-    """Load system state from file."""
-    default_state = {
-        "phase": "Phase 1: Pre-Operational Setup",
-        "zec_rate": 4,
-        "cash_buffer_to": "2026-06-30",
-        "key_dates": {
-            "phase1_start": "2025-01-01",
-            "phase2_start": "2025-07-01",
-            "phase3_start": "2026-01-01"
-        }
+DEFAULT_STATE = {
+    "phase": "Phase 1: Pre-Operational Setup",
+    "zec_rate": 4,
+    "cash_buffer_to": "2026-06-30",
+    "key_dates": {
+        "phase1_start": "2025-01-01",
+        "phase2_start": "2025-07-01",
+        "phase3_start": "2026-01-01"
     }
-    
-    if os.path.exists(STATE_FILE):
-        try:
-            with open(STATE_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return default_state
-    return default_state
-
-def save_state(state):
-    """Save system state to file."""
+}
+
+def load_state():
+    """Load system state from the shared store (re-read only when the file changed)."""
+    return get_state_store(STATE_FILE, DEFAULT_STATE).get_versioned()
+
+def save_state(state, expected_version=None):
+    """Atomically save system state; returns the new version, or None on failure."""
     try:
-        with open(STATE_FILE, 'w') as f:
-            json.dump(state, f, indent=2)
+        _, version = get_state_store(STATE_FILE, DEFAULT_STATE).replace(state, expected_version)
+        return version
+    except StateConflictError as e:
+        st.error(f"State was changed by another session ({e}); reload and try again.")
     except IOError as e:
         st.error(f"Failed to save state: {e}")
+    return None
 
 def log_evidence(entry):
     """Append to evidence log."""
     try:
-        with open(EVIDENCE_FILE, 'a') as f:
-            f.write(json.dumps(entry) + '\n')
+        get_evidence_writer(EVIDENCE_FILE).write(entry)
     except IOError as e:
         st.error(f"Failed to log evidence: {e}")
 
 # --- API Communication ---
 def call_langgraph(question, command, agent, state):
-    """Call LangGraph API."""
+    """Call LangGraph API, serving repeated questions from the response cache."""
+    cache = get_response_cache()
+    cache_key = make_key(agent, command, question, state)
+    if RESPONSE_CACHE_ENABLED:
+        cached = cache.get(cache_key, endpoint="langgraph")
+        if cached is not None:
+            cached.setdefault("meta", {})["cached"] = True
+            return cached
+    
     headers = {"Content-Type": "application/json"}
     
     if LANGGRAPH_API_KEY:
@@ -223,9 +235,12 @@ def call_langgraph(question, command, agent, state):
     }
     
     try:
-        response = requests.post(f"{LANGGRAPH_API_URL}/invoke", headers=headers, json=payload, timeout=60)
+        response = get_session().post(f"{LANGGRAPH_API_URL}/invoke", headers=headers, json=payload, timeout=timeout())
         response.raise_for_status()
-        return response.json()
+        result = response.json()
+        if RESPONSE_CACHE_ENABLED and is_cacheable(result):
+            cache.set(cache_key, result, endpoint="langgraph")
+        return result
     except requests.exceptions.RequestException as e:
         # Fallback a modo demo si hay error de API
         if "403" in str(e) or "Forbidden" in str(e):
@@ -239,6 +254,70 @@ def call_langgraph(question, command, agent, state):
             }
         return {"status": "error", "message": f"API connection error: {e}"}
 
+def _iter_sse(response):
+    """Parse (event, data) pairs from a server-sent events response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+def stream_langgraph(question, command, agent, state, result):
+    """Stream answer tokens from the LangGraph API; ``result`` receives the final answer and meta."""
+    cache = get_response_cache()
+    cache_key = make_key(agent, command, question, state)
+    if RESPONSE_CACHE_ENABLED:
+        cached = cache.get(cache_key, endpoint="langgraph")
+        if cached is not None:
+            cached.setdefault("meta", {})["cached"] = True
+            result.update(cached)
+            yield cached.get("answer", "")
+            return
+    
+    headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+    if LANGGRAPH_API_KEY:
+        headers["Authorization"] = f"Bearer {LANGGRAPH_API_KEY}"
+    
+    payload = {
+        "question": question,
+        "command": command,
+        "agent": agent,
+        "state": state
+    }
+    
+    streamed = False
+    try:
+        with get_session().post(f"{LANGGRAPH_API_URL}/invoke/stream", headers=headers, json=payload,
+                                stream=True, timeout=timeout()) as response:
+            response.raise_for_status()
+            for event, data in _iter_sse(response):
+                if event == "token":
+                    streamed = True
+                    yield data["token"]
+                elif event == "end":
+                    result.update(data)
+                elif event == "error":
+                    # The agent itself failed: report it, and neither cache it nor retry the call
+                    result.update({"status": "error", "message": data.get("message")})
+                    return
+    except requests.exceptions.RequestException as e:
+        if streamed:
+            result.update({"status": "error", "message": f"Stream interrupted: {e}"})
+            return
+        # Deployments without the streaming route: fall back to a single response
+        result.update(call_langgraph(question, command, agent, state))
+        if result.get("status") != "error":
+            yield result.get("answer", "")
+        return
+    
+    if RESPONSE_CACHE_ENABLED and is_cacheable(result):
+        cache.set(cache_key, dict(result), endpoint="langgraph")
+
 def test_langgraph_connection():
     """Test LangGraph API connection."""
     try:
@@ -246,7 +325,7 @@ def test_langgraph_connection():
         if LANGGRAPH_API_KEY:
             headers["Authorization"] = f"Bearer {LANGGRAPH_API_KEY}"
         
-        response = requests.get(f"{LANGGRAPH_API_URL}/health", headers=headers, timeout=10)
+        response = get_session().get(f"{LANGGRAPH_API_URL}/health", headers=headers, timeout=timeout(10))
         return response.status_code == 200
     except requests.exceptions.RequestException:
         return False
@@ -257,8 +336,8 @@ def test_openai_connection():
         return False
     
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        from openai_client import get_client
+        client = get_client(OPENAI_API_KEY)
         client.models.list()
         return True
     except Exception:
@@ -268,8 +347,8 @@ def test_openai_connection():
 if 'lang' not in st.session_state:
     st.session_state.lang = None
 
-if 'state' not in st.session_state:
-    st.session_state.state = load_state()
+# Refreshed on every run from the process-wide cache so all sessions see saved updates
+st.session_state.state, st.session_state.state_version = load_state()
 
 if 'messages' not in st.session_state:
     st.session_state.messages = []
@@ -312,6 +391,8 @@ with st.sidebar:
     if selected_command_key == "Auto":
         selected_command_key = None
     
+    consult_all_agents = st.toggle(L['consult_all'], value=False)
+    
     with st.expander(L['governance_title'], expanded=False):
         st.write(f"**{L['phase']}:** {st.session_state.state.get('phase')}")
         st.write(f"**{L['zec_rate']}:** {st.session_state.state.get('zec_rate')}%")
@@ -339,50 +420,161 @@ with tab_chat:
         with st.chat_message("user"):
             st.write(query)
         
-        with st.spinner("..."):
-            result = call_langgraph(query, selected_command_key, selected_agent_key, st.session_state.state)
-        
-        if result.get("status") == "error":
-            st.error(f"Error: {result.get('message')}")
-        else:
-            answer = result.get("answer", "No response found.")
-            agent_used = result.get("meta", {}).get("agent", selected_agent_key)
-            
-            st.session_state.messages.append({
-                "role": "assistant", 
-                "content": answer, 
-                "agent": AGENTS.get(agent_used, agent_used)
-            })
+        if consult_all_agents:
+            from agents.orchestrator import iter_consult_all
             
+            for result in iter_consult_all(query, st.session_state.state):
+                answer = result.get("answer", "No response found.")
+                agent_used = result["meta"]["agent"]
+                
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": answer,
+                    "agent": AGENTS.get(agent_used, agent_used)
+                })
+                
+                with st.chat_message("assistant"):
+                    if result["meta"]["status"] == "ok":
+                        st.write(answer)
+                    else:
+                        st.error(answer)
+                    st.caption(f"Agent: {AGENTS.get(agent_used, agent_used)} · {result['meta']['latency']:.1f}s")
+                
+                if result["meta"]["status"] != "ok":
+                    continue
+                log_evidence({
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "query": query,
+                    "agent": agent_used,
+                    "command": selected_command_key,
+                    "answer": answer,
+                    "state": st.session_state.state
+                })
+        else:
+            result = {}
             with st.chat_message("assistant"):
-                st.write(answer)
-                st.caption(f"Agent: {AGENTS.get(agent_used, agent_used)}")
+                streamed_answer = st.write_stream(
+                    stream_langgraph(query, selected_command_key, selected_agent_key, st.session_state.state, result)
+                )
+                agent_used = result.get("meta", {}).get("agent", selected_agent_key)
+                if result.get("status") != "error":
+                    st.caption(f"Agent: {AGENTS.get(agent_used, agent_used)}")
+        
+            if result.get("status") == "error":
+                st.error(f"Error: {result.get('message')}")
+            else:
+                answer = result.get("answer") or streamed_answer or "No response found."
             
-            log_evidence({
-                "timestamp": datetime.utcnow().isoformat(),
-                "query": query,
-                "agent": agent_used,
-                "command": selected_command_key,
-                "answer": answer,
-                "state": st.session_state.state
-            })
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": answer, 
+                    "agent": AGENTS.get(agent_used, agent_used)
+                })
+            
+                log_evidence({
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "query": query,
+                    "agent": agent_used,
+                    "command": selected_command_key,
+                    "answer": answer,
+                    "state": st.session_state.state
+                })
 
 with tab_ingest:
     st.header(L['ingest_title'])
-    st.info("Knowledge ingestion functionality is under development.")
+    
+    from knowledge.ingest import IngestPipeline
+    from knowledge.store import GLOBAL, get_knowledge_store
+    from knowledge.embeddings import EMBEDDING_PROVIDER
+    
+    ingest_target = st.selectbox(
+        "Knowledge base", [GLOBAL] + list(AGENTS.keys()),
+        format_func=lambda x: "Global (all agents)" if x == GLOBAL else AGENTS[x], key="ingest_target"
+    )
+    uploaded_files = st.file_uploader(L['upload_files'], accept_multiple_files=True, key="ingest_files")
+    pasted_text = st.text_area(L['paste_text'], key="ingest_text")
+    ingest_url = st.text_input(L['add_url'], key="ingest_url")
+    
+    if st.button(L['ingest_btn'], type="primary"):
+        if not (OPENAI_API_KEY or os.getenv("OPENAI_API_KEYS")) and EMBEDDING_PROVIDER != "local":
+            st.error("OPENAI_API_KEY is required to embed knowledge.")
+        else:
+            pipeline = IngestPipeline()
+            jobs = [(f.name, lambda f=f: pipeline.ingest_file(f, f.name, ingest_target, f.type)) for f in uploaded_files or []]
+            if pasted_text.strip():
+                jobs.append(("pasted text", lambda: pipeline.ingest_text(pasted_text, ingest_target)))
+            if ingest_url.strip():
+                jobs.append((ingest_url.strip(), lambda: pipeline.ingest_url(ingest_url.strip(), ingest_target)))
+            if not jobs:
+                st.warning("Nothing to ingest: upload a file, paste text or add a URL.")
+            else:
+                progress = st.progress(0.0)
+                for done, (source, job) in enumerate(jobs, 1):
+                    try:
+                        with st.spinner(f"Ingesting {source}..."):
+                            stats = job()
+                        st.success(
+                            f"{source}: {stats['added']} new chunks, {stats['duplicates']} duplicates skipped "
+                            f"({stats['seconds']:.1f}s)"
+                        )
+                    except Exception as e:
+                        st.error(f"{source}: ingestion failed: {e}")
+                    progress.progress(done / len(jobs))
+    
+    knowledge_stats = get_knowledge_store().stats()
+    if knowledge_stats:
+        st.subheader("Knowledge base")
+        st.table([
+            {"Knowledge base": "Global" if name == GLOBAL else AGENTS.get(name, name), **counts}
+            for name, counts in knowledge_stats.items()
+        ])
 
 with tab_evidence:
     st.header(L['evidence_title'])
     
     if os.path.exists(EVIDENCE_FILE):
         try:
-            with open(EVIDENCE_FILE, 'r') as f:
-                lines = f.readlines()
+            evidence = get_evidence_index(EVIDENCE_FILE)
+            
+            col_text, col_agent, col_command, col_dates = st.columns([3, 2, 2, 2])
+            search_text = col_text.text_input("Search questions and answers", key="evidence_text")
+            agent_filter = col_agent.selectbox(
+                "Agent", [None] + list(AGENTS.keys()),
+                format_func=lambda x: "All" if x is None else AGENTS[x], key="evidence_agent"
+            )
+            command_filter = col_command.selectbox(
+                "Command", [None] + list(COMMANDS.keys()),
+                format_func=lambda x: "All" if x is None else COMMANDS[x], key="evidence_command"
+            )
+            date_range = col_dates.date_input("Date range", value=(), key="evidence_dates")
+            since = date_range[0].isoformat() if len(date_range) > 0 else None
+            until = (date_range[-1] + timedelta(days=1)).isoformat() if len(date_range) > 0 else None
+            
+            # A new filter starts again from the newest match
+            filters = (search_text, agent_filter, command_filter, since, until)
+            if st.session_state.get("evidence_filters") != filters:
+                st.session_state.evidence_filters = filters
+                st.session_state.evidence_before = None
             
-            for line in reversed(lines[-20:]):
-                entry = json.loads(line)
-                with st.expander(f"{entry['timestamp']} - {AGENTS.get(entry['agent'], entry['agent'])}"):
+            entries, older = evidence.search(
+                search_text, agent_filter, command_filter, since, until,
+                limit=20, before=st.session_state.get("evidence_before")
+            )
+            if not entries:
+                st.info("No evidence matches these filters.")
+            
+            for entry in entries:
+                agent_name = entry.get('agent', 'ghc_dt')
+                with st.expander(f"{entry.get('timestamp')} - {AGENTS.get(agent_name, agent_name)}"):
                     st.json(entry)
+            
+            col_newest, col_older = st.columns(2)
+            if st.session_state.get("evidence_before") is not None and col_newest.button("⏮ Newest"):
+                st.session_state.evidence_before = None
+                st.rerun()
+            if older is not None and col_older.button("Older ⏭"):
+                st.session_state.evidence_before = older
+                st.rerun()
         except Exception as e:
             st.error(f"Could not read evidence file: {e}")
     else:
@@ -417,6 +609,9 @@ with tab_diagnostics:
         "LANGGRAPH_API_URL": LANGGRAPH_API_URL,
         "LANGGRAPH_API_KEY": "********" if LANGGRAPH_API_KEY else "Not Set",
         "OPENAI_API_KEY": "********" if OPENAI_API_KEY else "Not Set",
+        "Response Cache": get_response_cache().stats(),
+        "Circuit Breakers": breaker_stats(),
+        "Knowledge Retrieval": get_retriever().stats(),
         "Selected Agent": selected_agent_display,
         "Language": st.session_state.lang.upper()
     }
@@ -10,6 +10,9 @@ import json
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from http_session import get_session, timeout
+from state_store import get_state_store
+
 # --- Page Configuration ---
 st.set_page_config(
     page_title="Green Hill Cockpit",
@@ -63,22 +66,16 @@ GHC_DT_MODEL = os.getenv("GHC_DT_MODEL", "gpt-4o-mini")
 GHC_DT_TEMPERATURE = float(os.getenv("GHC_DT_TEMPERATURE", "0.2"))
 GHC_DT_EVIDENCE_LOG = os.getenv("GHC_DT_EVIDENCE_LOG", "evidence.jsonl")
 
+DEFAULT_STATE = {"phase": "Phase 1: Pre-Operational Setup", "zec_rate": 4, "cash_buffer_to": "2026-06-30", "key_dates": {"phase1_start": "2025-01-01", "phase2_start": "2025-07-01", "phase3_start": "2026-01-01"}}
+
 def load_state() -> Dict[str, Any]:
-    """Load system state from file."""
-    default_state = {"phase": "Phase 1: Pre-Operational Setup", "zec_rate": 4, "cash_buffer_to": "2026-06-30", "key_dates": {"phase1_start": "2025-01-01", "phase2_start": "2025-07-01", "phase3_start": "2026-01-01"}}
-    if os.path.exists(STATE_FILE):
-        try:
-            with open(STATE_FILE, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return default_state
-    return default_state
+    """Load system state through the shared versioned state store."""
+    return get_state_store(STATE_FILE, DEFAULT_STATE).get()
 
 def save_state(state: Dict[str, Any]):
-    """Save system state to file."""
+    """Save system state atomically, keeping the store's version history."""
     try:
-        with open(STATE_FILE, 'w') as f:
-            json.dump(state, f, indent=2)
+        get_state_store(STATE_FILE, DEFAULT_STATE).replace(state)
     except IOError as e:
         st.error(f"Failed to save state: {e}")
 
@@ -101,7 +98,7 @@ def call_langgraph(question: str, command: Optional[str], agent: str, state: Dic
     payload = {"question": question, "command": command, "agent": agent, "state": state}
 
     try:
-        response = requests.post(f"{LANGGRAPH_API_URL}/invoke", headers=headers, json=payload, timeout=60)
+        response = get_session().post(f"{LANGGRAPH_API_URL}/invoke", headers=headers, json=payload, timeout=timeout())
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -113,7 +110,7 @@ def test_langgraph_connection() -> bool:
         headers = {}
         if LANGGRAPH_API_KEY:
             headers["Authorization"] = f"Bearer {LANGGRAPH_API_KEY}"
-        response = requests.get(f"{LANGGRAPH_API_URL}/health", headers=headers, timeout=10)
+        response = get_session().get(f"{LANGGRAPH_API_URL}/health", headers=headers, timeout=timeout(10))
         return response.status_code == 200
     except requests.exceptions.RequestException:
         return False
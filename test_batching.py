@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for advisor single-flight: coalescing identical requests, dispatch and failure cleanup
+"""
+import time
+import threading
+
+from agents.batching import MicroBatcher
+
+
+class SlowAgent:
+    """Stand-in for an agent call that blocks until released and counts its calls"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.release = threading.Event()
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, question, state=None):
+        with self._lock:
+            self.calls.append(question)
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError(f"upstream failed for {question}")
+        return {"answer": f"answer to {question}", "meta": {"tokens": 10}}
+
+
+def test_identical_inflight_requests_share_one_call():
+    agent = SlowAgent()
+    batcher = MicroBatcher(agent, window=0, max_concurrency=4)
+    futures = [batcher.submit("same-key", "What is the ZEC rate?") for _ in range(5)]
+    other = batcher.submit("other-key", "What is the cash buffer?")
+
+    assert all(future is futures[0] for future in futures)
+    agent.release.set()
+    assert futures[0].result(5)["answer"] == "answer to What is the ZEC rate?"
+    assert other.result(5)["answer"] == "answer to What is the cash buffer?"
+    assert sorted(agent.calls) == ["What is the ZEC rate?", "What is the cash buffer?"]
+    assert batcher.stats()["coalesced"] == 4
+
+    # Once finished, the same key calls upstream again
+    batcher.call("same-key", "What is the ZEC rate?")
+    assert len(agent.calls) == 3
+    print("✅ Identical in-flight requests share one call")
+
+
+def test_callers_get_their_own_meta():
+    agent = SlowAgent()
+    agent.release.set()
+    batcher = MicroBatcher(agent, window=0)
+    first = batcher.call("k", "q")
+    first["meta"]["cached"] = True
+    assert "cached" not in batcher.call("k", "q")["meta"]
+
+
+def test_window_zero_dispatches_at_once():
+    agent = SlowAgent()
+    agent.release.set()
+    batcher = MicroBatcher(agent, window=0)
+    started = time.monotonic()
+    batcher.call("k", "q")
+    assert time.monotonic() - started < 0.5
+    assert batcher.stats()["queued"] == 0
+
+
+def test_max_batch_size_flushes_before_the_window():
+    agent = SlowAgent()
+    agent.release.set()
+    batcher = MicroBatcher(agent, window=30, max_batch_size=3)
+
+    held = batcher.submit("a", "a")
+    time.sleep(0.1)
+    assert not held.done() and batcher.stats()["queued"] == 1, "held until the window or a full batch"
+
+    futures = [held, batcher.submit("b", "b"), batcher.submit("c", "c")]
+    assert [future.result(5)["answer"] for future in futures] == ["answer to a", "answer to b", "answer to c"]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["queued"] == 0
+    print("✅ A full batch is sent without waiting for the window")
+
+
+def test_failed_call_releases_its_key():
+    agent = SlowAgent(fail=True)
+    batcher = MicroBatcher(agent, window=0)
+    futures = [batcher.submit("k", "q") for _ in range(3)]
+    agent.release.set()
+
+    for future in futures:
+        try:
+            future.result(5)
+        except RuntimeError as e:
+            assert "upstream failed" in str(e)
+        else:
+            raise AssertionError("expected the upstream error")
+    assert batcher.stats()["inflight"] == 0
+
+    agent.fail = False
+    assert batcher.call("k", "q")["answer"] == "answer to q"
+    assert len(agent.calls) == 2
+    print("✅ A failed call frees its key for the next request")
+
+
+if __name__ == "__main__":
+    test_identical_inflight_requests_share_one_call()
+    test_callers_get_their_own_meta()
+    test_window_zero_dispatches_at_once()
+    test_max_batch_size_flushes_before_the_window()
+    test_failed_call_releases_its_key()
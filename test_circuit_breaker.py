@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the upstream circuit breaker: closed -> open -> half-open -> closed and failed probes
+"""
+import time
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+def breaker(**overrides):
+    settings = {"failure_rate": 0.5, "min_calls": 4, "window": 30, "open_seconds": 0.1, "half_open_calls": 1}
+    return CircuitBreaker("https://upstream.test", **{**settings, **overrides})
+
+
+def refused(cb):
+    try:
+        cb.before_call()
+    except CircuitOpenError as e:
+        return e
+    return None
+
+
+def test_full_cycle():
+    cb = breaker()
+    for _ in range(3):
+        cb.before_call()
+        cb.record_failure("503 Service Unavailable")
+    assert cb.state == CLOSED, "fewer than min_calls never opens"
+
+    cb.before_call()
+    cb.record_failure("503 Service Unavailable")
+    assert cb.state == OPEN
+    error = refused(cb)
+    assert error is not None and "503" in str(error) and 0 < error.retry_in <= 0.1
+    assert cb.stats()["rejected"] == 1 and cb.stats()["opened"] == 1
+
+    time.sleep(0.15)
+    assert cb.state == HALF_OPEN
+    cb.before_call()  # the probe
+    assert refused(cb) is not None, "only half_open_calls probes at a time"
+
+    cb.record_success()
+    assert cb.state == CLOSED
+    assert cb.stats()["failures"] == 0, "closing starts a fresh window"
+    cb.before_call()
+    print("✅ closed -> open -> half-open -> closed")
+
+
+def test_failed_probe_reopens():
+    cb = breaker()
+    for _ in range(4):
+        cb.record_failure("timeout")
+    time.sleep(0.15)
+    cb.before_call()
+    cb.record_failure("timeout")
+
+    assert cb.state == OPEN and cb.stats()["opened"] == 2
+    assert refused(cb) is not None
+    print("✅ A failed probe opens the circuit again")
+
+
+def test_failure_rate_below_threshold_stays_closed():
+    cb = breaker()
+    for ok in [True, False, True, True, False, True]:
+        if ok:
+            cb.record_success()
+        else:
+            cb.record_failure()
+    assert cb.state == CLOSED
+
+    # Failures that slid out of the window no longer count
+    cb = breaker(window=0.05)
+    for _ in range(3):
+        cb.record_failure()
+    time.sleep(0.1)
+    cb.record_failure()
+    assert cb.state == CLOSED and cb.stats()["calls"] == 1
+
+
+if __name__ == "__main__":
+    test_full_cycle()
+    test_failed_probe_reopens()
+    test_failure_rate_below_threshold_stays_closed()
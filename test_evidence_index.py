@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests for the evidence query engine: incremental sync, full-text search and concurrent indexers
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+
+from evidence_log import EvidenceLog
+from evidence_index import EvidenceIndex
+
+START = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+AGENTS = ["finance", "compliance", "risk"]
+
+
+def entry(i):
+    return {
+        "timestamp": (START + timedelta(seconds=i)).isoformat(),
+        "agent": AGENTS[i % len(AGENTS)],
+        "query": f"question {i} about the zec rate",
+        "answer": f"answer {i}: desalination capex",
+    }
+
+
+def fts_integrity(path):
+    conn = sqlite3.connect(path)
+    try:
+        # Raises if the FTS index lists rows or terms the evidence table does not have
+        conn.execute("INSERT INTO evidence_fts (evidence_fts) VALUES ('integrity-check')")
+        return conn.execute("SELECT COUNT(*) FROM evidence").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_incremental_sync_and_search():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EvidenceLog(os.path.join(tmp, "evidence.jsonl"))
+        log.append_many([entry(i) for i in range(30)])
+        index = EvidenceIndex(log)
+
+        assert index.sync() == 30
+        assert index.sync() == 0
+        log.append_many([entry(i) for i in range(30, 40)])
+        assert index.sync() == 10
+
+        records, cursor = index.search("desalination", agent="finance", limit=5)
+        assert [record["_id"] for record in records] == [39, 36, 33, 30, 27]
+        assert cursor == 27
+        assert index.count("zec", agent="risk") == 13
+        assert fts_integrity(index.path) == 40
+    print("✅ Sync indexes only new records")
+
+
+def test_overlapping_syncs_index_each_record_once():
+    """Another process syncs the same records while this one is reading its batch"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "evidence.jsonl")
+        EvidenceLog(path).append_many([entry(i) for i in range(50)])
+        mine, theirs = EvidenceLog(path), EvidenceLog(path)
+        index, other = EvidenceIndex(mine), EvidenceIndex(theirs)
+        read_range = mine.read_range
+        racing, added = [], []
+
+        def read_while_other_syncs(start, stop):
+            if not racing:
+                racing.append(threading.Thread(target=lambda: added.append(other.sync())))
+                racing[0].start()
+                racing[0].join(0.5)  # done by now unless this sync holds the write lock
+            return read_range(start, stop)
+
+        mine.read_range = read_while_other_syncs
+        added.append(index.sync())
+        racing[0].join()
+
+        assert sum(added) == 50, f"records indexed by both syncs: {added}"
+        assert fts_integrity(index.path) == 50
+        records, _ = other.search("desalination", limit=100)
+        assert len(records) == len({record["_id"] for record in records}) == 50
+    print("✅ Overlapping syncs: every record indexed once")
+
+
+def test_concurrent_syncs_while_appending():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EvidenceLog(os.path.join(tmp, "evidence.jsonl"))
+        indexes = [EvidenceIndex(log), EvidenceIndex(log)]
+        appended = threading.Event()
+        errors = []
+
+        def writer():
+            for i in range(0, 400, 10):
+                log.append_many([entry(n) for n in range(i, i + 10)])
+            appended.set()
+
+        def indexer(index):
+            try:
+                while not appended.is_set():
+                    index.sync()
+                index.sync()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=indexer, args=(i,)) for i in indexes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors, errors
+        assert fts_integrity(indexes[0].path) == 400
+        assert indexes[1].count("zec") == 400
+
+
+def test_rebuild_starts_over():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EvidenceLog(os.path.join(tmp, "evidence.jsonl"))
+        log.append_many([entry(i) for i in range(20)])
+        index = EvidenceIndex(log)
+        index.sync()
+        assert index.rebuild() == 20
+        assert fts_integrity(index.path) == 20
+
+
+if __name__ == "__main__":
+    test_incremental_sync_and_search()
+    test_overlapping_syncs_index_each_record_once()
+    test_concurrent_syncs_while_appending()
+    test_rebuild_starts_over()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Tests for the evidence log: segment rotation and pruning, state deduplication and rehydration
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from evidence_log import EvidenceLog
+
+
+# Recent enough that max_age never closes a segment during a test
+START = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=1)
+
+
+def entry(i, state=None):
+    timestamp = START + timedelta(seconds=i)
+    record = {"timestamp": timestamp.isoformat(), "question": f"question {i}", "answer": "x" * 200}
+    if state is not None:
+        record["state"] = state
+    return record
+
+
+def test_rotation_keeps_numbering_across_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EvidenceLog(os.path.join(tmp, "evidence.jsonl"), max_bytes=4096, compression="gzip", dedupe_state=False)
+        numbers = [log.append(entry(i)) for i in range(100)]
+
+        assert numbers == list(range(100))
+        segments = log.segments()
+        assert len(segments) > 1
+        assert all(os.path.exists(os.path.join(tmp, segment["file"])) for segment in segments)
+        assert [segment["first"] for segment in segments] == sorted(segment["first"] for segment in segments)
+        assert len(log) == 100
+
+        # Reads span closed segments and the active file
+        records = log.read_range(0, 100)
+        assert [record["question"] for record in records] == [f"question {i}" for i in range(100)]
+        assert [record["question"] for record in log.tail(3)] == ["question 99", "question 98", "question 97"]
+        assert log.seek(entry(50)["timestamp"]) == 50
+
+        # Reopening finds the same records
+        assert EvidenceLog(log.path, max_bytes=4096, compression="gzip").read(42)["question"] == "question 42"
+    print(f"✅ Rotation: 100 records over {len(segments)} segments")
+
+
+def test_rotation_prunes_oldest_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EvidenceLog(
+            os.path.join(tmp, "evidence.jsonl"), max_bytes=4096, keep_segments=2, compression="gzip", dedupe_state=False
+        )
+        for i in range(200):
+            log.append(entry(i))
+
+        assert len(log.segments()) == 2
+        assert log.first > 0
+        assert len(log) == 200
+        assert log.read(log.first)["question"] == f"question {log.first}"
+    print("✅ Rotation: oldest segments pruned")
+
+
+def test_state_dedupe_and_rehydrate():
+    with tempfile.TemporaryDirectory() as tmp:
+        log = EvidenceLog(os.path.join(tmp, "evidence.jsonl"), max_bytes=4096, compression="gzip", dedupe_state=True)
+        state = {"zec_rate": 4, "board": ["ana", "luis"]}
+        for i in range(60):
+            log.append(entry(i, state if i % 2 else {**state, "zec_rate": 5}))
+
+        assert len(log.states) == 2, "each distinct state is stored once"
+        assert len(log.segments()) > 1
+        record = log.read(1)
+        assert "state" not in record and "state_ref" in record
+
+        rehydrated = log.rehydrate(record)
+        assert rehydrated["state"] == state
+        assert rehydrated == entry(1, state)
+        assert log.rehydrate(log.read(2))["state"]["zec_rate"] == 5
+        # Records without a snapshot come back unchanged
+        assert log.rehydrate({"question": "q"}) == {"question": "q"}
+    print("✅ State snapshots: stored once, rehydrated")
+
+
+if __name__ == "__main__":
+    test_rotation_keeps_numbering_across_segments()
+    test_rotation_prunes_oldest_segments()
+    test_state_dedupe_and_rehydrate()
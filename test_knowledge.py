@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tests for the knowledge store: chunking, deduplicated ingestion, vector files and the IVF index
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from knowledge.ann import IVFIndex
+from knowledge.embeddings import local_embed, normalize
+from knowledge.ingest import Chunker, IngestPipeline, iter_chunks
+from knowledge.store import KnowledgeStore
+from knowledge.vectors import VectorStore
+
+
+def embed(texts):
+    return normalize(local_embed(texts))
+
+
+def random_vectors(rows, dim=32, seed=0):
+    return normalize(np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32))
+
+
+def clustered_vectors(rows, dim=32, clusters=60, seed=0):
+    """Unit vectors around a few topics, as real embeddings are (uniform noise defeats any IVF)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    points = centers[rng.integers(clusters, size=rows)] + 0.35 * rng.standard_normal((rows, dim))
+    return normalize(points.astype(np.float32))
+
+
+def test_chunker_overlap_and_flush():
+    """Chunks stay under size, share their overlap, and flush emits the tail once"""
+    text = " ".join(f"word{i}" for i in range(400))
+    chunker = Chunker(size=200, overlap=40)
+    chunks = list(iter_chunks([text[i:i + 37] for i in range(0, len(text), 37)], chunker))
+
+    assert len(chunks) > 5
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split()[0] in previous.split()[-8:], "consecutive chunks should overlap"
+    assert chunks[-1].endswith("word399")
+    assert set(" ".join(chunks).split()) == set(text.split())
+
+    # Short input comes out of flush, once
+    chunker = Chunker(size=200, overlap=40)
+    assert list(chunker.feed("A short note.")) == []
+    assert list(chunker.flush()) == ["A short note."]
+    assert list(chunker.flush()) == []
+    print(f"✅ Chunker: {len(chunks)} chunks with overlap")
+
+
+def test_reingest_dedup():
+    """Re-ingesting returns the earlier document; a shared chunk survives deleting one of its documents"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = KnowledgeStore(os.path.join(tmp, "knowledge.db"))
+        pipeline = IngestPipeline(store, embed)
+        shared = "Water governance in the Canary Islands depends on desalination. " * 20
+        first = pipeline.ingest_text(shared + "\n\n" + "Solar farms supply the plants. " * 20, source="A")
+        again = pipeline.ingest_text(shared + "\n\n" + "Solar farms supply the plants. " * 20, source="A again")
+        other = pipeline.ingest_text(shared + "\n\n" + "Tourism drives water demand. " * 20, source="B")
+
+        assert first["added"] == first["chunks"]
+        assert again["added"] == 0 and again["document_id"] == first["document_id"]
+        assert other["duplicates"] >= 1 and other["added"] < other["chunks"]
+        assert store.stats()["global"]["documents"] == 2
+
+        store.delete_document(first["document_id"])
+        hits = store.search(embed(["water governance desalination"])[0], ["global"], 3)
+        assert hits and hits[0]["source"] == "B", "the chunk B shares with A must survive deleting A"
+        store.delete_document(other["document_id"])
+        assert store.stats() == {}
+        store.close()
+    print("✅ Re-ingest: duplicates skipped, shared chunks kept")
+
+
+def test_vector_store_add_delete_compact():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(os.path.join(tmp, "vectors"))
+        vectors = random_vectors(100)
+        store.add(list(range(1, 101)), vectors)
+        assert len(store) == 100 and store.last_id == 100
+        assert store.search(vectors[41], 1)[0][0] == 42
+
+        assert store.delete([42, 43, 1000]) == 2
+        assert len(store) == 98
+        assert 42 not in [chunk_id for chunk_id, _ in store.search(vectors[41], 5)]
+
+        assert store.compact() == 2
+        assert store.stats()["rows"] == 98 and not store.deleted_ids()
+        assert np.allclose(store.get([44])[0], vectors[43])
+
+        # Reopened from disk, and still appendable after the compaction
+        reopened = VectorStore(os.path.join(tmp, "vectors"))
+        assert len(reopened) == 98
+        reopened.add([101], random_vectors(1, seed=1))
+        assert reopened.last_id == 101
+    print("✅ VectorStore: add, delete, compact")
+
+
+def recall(index, store, queries, k=10):
+    found = 0
+    for query in queries:
+        exact = {chunk_id for chunk_id, _ in store.search(query, k)}
+        found += len(exact & {chunk_id for chunk_id, _ in index.search(query, k)})
+    return found / (k * len(queries))
+
+
+def test_ivf_recall_after_inserts_and_deletes():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(os.path.join(tmp, "vectors"))
+        vectors = clustered_vectors(6000)
+        store.add(list(range(1, 4001)), vectors[:4000])
+        index = IVFIndex(store, nprobe=16, min_rows=1000)
+        assert index.maybe_rebuild()["rows"] == 4000
+        queries = vectors[::300] + 0.05 * random_vectors(20, seed=2)
+
+        assert recall(index, store, queries) >= 0.9
+
+        # Inserts after the build are searched from the pending delta
+        store.add(list(range(4001, 6001)), vectors[4000:])
+        assert index.stats()["pending"] == 2000
+        assert index.search(vectors[5000], 1)[0][0] == 5001
+        assert recall(index, store, queries) >= 0.9
+
+        deleted = list(range(1, 6001, 3))
+        store.delete(deleted)
+        assert not set(deleted) & {chunk_id for query in queries for chunk_id, _ in index.search(query, 10)}
+        assert recall(index, store, queries) >= 0.9
+
+        index.build(retrain=False)
+        store.compact()
+        assert index.stats()["rows"] == 4000 and index.stats()["pending"] == 0
+        assert recall(index, store, queries) >= 0.9
+    print("✅ IVF: recall holds after inserts and deletes")
+
+
+if __name__ == "__main__":
+    test_chunker_overlap_and_flush()
+    test_reingest_dedup()
+    test_vector_store_add_delete_compact()
+    test_ivf_recall_after_inserts_and_deletes()
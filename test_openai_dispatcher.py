@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for the OpenAI key dispatcher against a local stand-in for the API: 429 fallback and invalid keys
+"""
+import json
+import time
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from openai_client import OpenAIClientWithFallback
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    """Chat completions that answer with the calling key; "limited" always gets a 429, "revoked" a 401"""
+    protocol_version = "HTTP/1.1"
+    calls = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        key = self.headers["authorization"].split()[-1]
+        self.calls[key] = self.calls.get(key, 0) + 1
+        if key == "limited":
+            return self.reply(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                              {"retry-after": "30"})
+        if key == "revoked":
+            return self.reply(401, {"error": {"message": "Incorrect API key", "type": "invalid_request_error", "code": "invalid_api_key"}})
+        self.reply(200, {
+            "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": f"served by {key}"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 3, "total_tokens": 4},
+        })
+
+    def reply(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+def by_key(dispatcher):
+    return {state["key"]: state for state in dispatcher.stats()}
+
+
+def test_rate_limited_key_falls_back():
+    """A 429 cools the key down and the same request is answered by the next key"""
+    server, base_url = serve()
+    FakeOpenAI.calls.clear()
+    try:
+        dispatcher = OpenAIClientWithFallback(["limited", "healthy"], base_url=base_url, max_wait=1)
+        answers = [
+            dispatcher.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES).choices[0].message.content
+            for _ in range(5)
+        ]
+
+        assert answers == ["served by healthy"] * 5
+        stats = by_key(dispatcher)
+        assert stats["...ited"]["rate_limited"] == 1, "a cooling key is not retried"
+        assert stats["...ited"]["cooldown"] > 20
+        assert stats["...lthy"]["served"] == 5
+        assert FakeOpenAI.calls == {"limited": 1, "healthy": 5}
+    finally:
+        server.shutdown()
+    print("✅ 429 on one key: requests move to the other")
+
+
+def test_async_rate_limited_key_falls_back():
+    server, base_url = serve()
+    FakeOpenAI.calls.clear()
+    try:
+        dispatcher = OpenAIClientWithFallback(["limited", "healthy"], base_url=base_url, max_wait=1)
+
+        async def ask():
+            return await asyncio.gather(*(
+                dispatcher.acreate(model="gpt-4o-mini", messages=MESSAGES) for _ in range(4)
+            ))
+
+        responses = asyncio.run(ask())
+        assert [response.choices[0].message.content for response in responses] == ["served by healthy"] * 4
+        assert by_key(dispatcher)["...ited"]["rate_limited"] >= 1
+    finally:
+        server.shutdown()
+    print("✅ 429 on one key (async): requests move to the other")
+
+
+def test_every_key_limited_raises():
+    """With no key usable within max_wait the call fails instead of hanging"""
+    server, base_url = serve()
+    try:
+        dispatcher = OpenAIClientWithFallback(["limited", "revoked"], base_url=base_url, max_wait=1)
+        started = time.monotonic()
+        try:
+            dispatcher.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES)
+        except Exception:
+            pass
+        else:
+            raise AssertionError("expected the dispatcher to give up")
+        assert time.monotonic() - started < 5
+        stats = by_key(dispatcher)
+        assert stats["...ited"]["cooldown"] > 20 and stats["...oked"]["disabled"]
+    finally:
+        server.shutdown()
+    print("✅ Every key limited or invalid: the call fails fast")
+
+
+if __name__ == "__main__":
+    test_rate_limited_key_falls_back()
+    test_async_rate_limited_key_falls_back()
+    test_every_key_limited_raises()
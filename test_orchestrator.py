@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the Consult All Agents fan-out: result status, timeouts and the /consult endpoint
+"""
+import os
+import time
+import asyncio
+
+from agents import orchestrator
+from agents.orchestrator import consult_all, aconsult_all
+
+AGENTS = ["finance", "compliance"]
+
+
+def without_api_keys(test):
+    def wrapper():
+        saved = {key: os.environ.pop(key) for key in ("OPENAI_API_KEY", "OPENAI_API_KEYS") if key in os.environ}
+        try:
+            test()
+        finally:
+            os.environ.update(saved)
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+def patched_runners(runners):
+    saved = dict(orchestrator.AGENT_RUNNERS)
+    orchestrator.AGENT_RUNNERS.update(runners)
+    return saved
+
+
+@without_api_keys
+def test_failed_advisors_are_errors():
+    """An agent answering with an error instead of raising is still reported as failed"""
+    results = consult_all("What is the outlook?", {}, agents=AGENTS)
+    assert {name: result["meta"]["status"] for name, result in results.items()} == {name: "error" for name in AGENTS}
+    assert all(result["answer"] == "OPENAI_API_KEY not configured" for result in results.values())
+
+    results = asyncio.run(aconsult_all("What is the outlook?", {}, agents=AGENTS))
+    assert {result["meta"]["status"] for result in results.values()} == {"error"}
+    print("✅ Error answers are reported with status error")
+
+
+def test_status_follows_each_result():
+    saved = patched_runners({
+        "finance": lambda question, state: {"answer": "Margins are up.", "meta": {"tokens": 42}},
+        "compliance": lambda question, state: {"answer": "Error: upstream timeout", "meta": {"tokens": 0}},
+        "risk": lambda question, state: time.sleep(2),
+    })
+    try:
+        results = consult_all("q", {}, agents=["finance", "compliance", "risk"], timeouts={"risk": 0.2})
+    finally:
+        orchestrator.AGENT_RUNNERS.update(saved)
+    assert results["finance"]["meta"]["status"] == "ok"
+    assert results["compliance"]["meta"]["status"] == "error"
+    assert results["risk"]["meta"]["status"] == "timeout"
+    print("✅ ok, error and timeout results")
+
+
+@without_api_keys
+def test_consult_endpoint_reports_errors():
+    from fastapi.testclient import TestClient
+    from server import app
+
+    response = TestClient(app).post("/consult", json={"question": "What is the outlook?", "agents": AGENTS})
+    assert response.status_code == 200
+    assert {result["meta"]["status"] for result in response.json().values()} == {"error"}
+    print("✅ /consult marks failed advisors")
+
+
+if __name__ == "__main__":
+    test_failed_advisors_are_errors()
+    test_status_follows_each_result()
+    test_consult_endpoint_reports_errors()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the advisor response cache: LRU eviction, TTL expiry and what counts as a cacheable answer
+"""
+import time
+import threading
+
+from response_cache import ResponseCache, cached_response, get_response_cache, is_cacheable, make_key
+
+ANSWER = {"answer": "Margins are up 4%.", "meta": {"agent": "finance", "tokens": 120}}
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set("a", {"answer": "A"})
+    cache.set("b", {"answer": "B"})
+    assert cache.get("a") == {"answer": "A"}  # "b" is now the least recently used
+    cache.set("c", {"answer": "C"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"answer": "A"} and cache.get("c") == {"answer": "C"}
+    assert cache.stats()["evictions"] == 1 and cache.stats()["size"] == 2
+    print("✅ LRU: least recently used entry evicted")
+
+
+def test_ttl_expiry():
+    cache = ResponseCache(max_entries=10, ttl=0.05)
+    cache.set("a", {"answer": "A"})
+    assert cache.get("a") == {"answer": "A"}
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["size"] == 0
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    print("✅ TTL: expired entries are dropped")
+
+
+def test_hits_are_copies():
+    cache = ResponseCache(max_entries=10, ttl=60)
+    cache.set("a", {"answer": "A", "meta": {}})
+    cache.get("a")["meta"]["cached"] = True
+    assert cache.get("a") == {"answer": "A", "meta": {}}
+
+
+def test_concurrent_access_keeps_bounds():
+    cache = ResponseCache(max_entries=50, ttl=60)
+
+    def worker(n):
+        for i in range(500):
+            cache.set(f"{n}-{i % 80}", {"answer": str(i)})
+            cache.get(f"{(n + 1) % 8}-{i % 80}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats["size"] == 50
+    assert stats["hits"] + stats["misses"] == 8 * 500
+
+
+def test_is_cacheable():
+    assert is_cacheable(ANSWER)
+    assert is_cacheable({"answer": "Streamed answer", "meta": {}}), "streamed answers carry no token count"
+    assert not is_cacheable({"answer": "Error: Connection reset", "meta": {"tokens": 0}})
+    assert not is_cacheable({"answer": "OPENAI_API_KEY not configured", "meta": {"tokens": 0}})
+    assert not is_cacheable({"answer": "Partial answer", "meta": {"tokens": 0}})
+    assert not is_cacheable({"answer": "", "meta": {"tokens": 10}})
+    assert not is_cacheable({"answer": "Demo answer", "meta": {"mode": "demo"}})
+    assert not is_cacheable({"status": "error", "message": "API connection error"})
+    print("✅ Errors and 0-token answers are not cacheable")
+
+
+def test_keys_ignore_phrasing_but_not_state():
+    key = make_key("finance", None, "What is the ZEC rate?", {"zec_rate": 4})
+    assert make_key("finance", None, "  what is the zec rate ", {"zec_rate": 4, "notes": "x"}) == key
+    assert make_key("finance", None, "What is the ZEC rate?", {"zec_rate": 5}) != key
+    assert make_key("legal", None, "What is the ZEC rate?", {"zec_rate": 4}) != key
+    assert make_key("finance", None, "What is the ZEC rate?", {"zec_rate": 4}, variant={"model": "gpt-4o"}) != key
+
+
+def test_decorator_skips_failed_answers():
+    calls = []
+
+    @cached_response("test-agent", variant=lambda question, state: {"model": "m"})
+    def run(question, state=None):
+        calls.append(question)
+        return ANSWER if question.startswith("good") else {"answer": "Error: timeout", "meta": {"tokens": 0}}
+
+    get_response_cache().clear()
+    assert run("good question") == ANSWER
+    assert run("Good question?")["meta"]["cached"] is True
+    run("bad question")
+    run("bad question")
+    assert calls == ["good question", "bad question", "bad question"]
+    print("✅ Only successful answers are served from the cache")
+
+
+if __name__ == "__main__":
+    test_lru_eviction()
+    test_ttl_expiry()
+    test_hits_are_copies()
+    test_concurrent_access_keeps_bounds()
+    test_is_cacheable()
+    test_keys_ignore_phrasing_but_not_state()
+    test_decorator_skips_failed_answers()
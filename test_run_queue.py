@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the run queue: backpressure (429 with Retry-After) and the capped wait on synchronous runs
+"""
+import os
+import asyncio
+import tempfile
+
+from fastapi.testclient import TestClient
+
+import server
+from run_queue import RunQueue, QueueFullError
+from run_store import RunStore, RUN_PENDING, RUN_RUNNING
+
+
+async def never_finishes(run):
+    await asyncio.Event().wait()
+
+
+def with_server(queue, wait_max=server.RUN_WAIT_MAX):
+    """Swap in a queue and a throwaway run store for the duration of a test"""
+    def decorator(test):
+        def wrapper():
+            saved = server.run_queue, server.run_store, server.RUN_WAIT_MAX
+            with tempfile.TemporaryDirectory() as tmp:
+                server.run_queue, server.RUN_WAIT_MAX = queue(), wait_max
+                server.run_store = RunStore(os.path.join(tmp, "runs.db"))
+                try:
+                    with TestClient(server.app) as client:
+                        test(client)
+                finally:
+                    server.run_queue, server.run_store, server.RUN_WAIT_MAX = saved
+        wrapper.__name__ = test.__name__
+        return wrapper
+    return decorator
+
+
+def test_queue_rejects_past_max_depth():
+    async def scenario():
+        queue = RunQueue(never_finishes, workers=1, max_depth=1)
+        await queue.start()
+        try:
+            queue.submit({"run_id": "1"})
+            await asyncio.sleep(0.01)  # taken by the worker
+            queue.submit({"run_id": "2"})  # waits in the queue
+            try:
+                queue.submit({"run_id": "3"})
+            except QueueFullError:
+                pass
+            else:
+                raise AssertionError("expected QueueFullError")
+            stats = queue.stats()
+            assert stats["active"] == 1 and stats["depth"] == 1 and stats["rejected"] == 1
+            assert await queue.wait("1", timeout=0.05) is False
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+    print("✅ RunQueue rejects runs past max_depth")
+
+
+@with_server(lambda: RunQueue(never_finishes, workers=0, max_depth=1))
+def test_full_queue_answers_429(client):
+    first = client.post("/threads/t1/runs?background=true", json={"input": {"message": "one"}})
+    assert first.status_code == 202 and first.json()["status"] == RUN_PENDING
+
+    second = client.post("/threads/t1/runs?background=true", json={"input": {"message": "two"}})
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "1"
+    assert client.get("/queue").json()["rejected"] == 1
+    print("✅ Full queue: 429 with Retry-After")
+
+
+@with_server(lambda: RunQueue(never_finishes, workers=1, max_depth=4), wait_max=0.2)
+def test_synchronous_run_wait_is_capped(client):
+    response = client.post("/threads/t1/runs", json={"input": {"message": "slow"}})
+    assert response.status_code == 202
+    assert response.json()["status"] in (RUN_PENDING, RUN_RUNNING)
+    run = client.get(f"/runs/{response.json()['run_id']}").json()
+    assert run["status"] in (RUN_PENDING, RUN_RUNNING)
+    print("✅ Synchronous runs return 202 after RUN_WAIT_MAX")
+
+
+if __name__ == "__main__":
+    test_queue_rejects_past_max_depth()
+    test_full_queue_answers_429()
+    test_synchronous_run_wait_is_capped()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the governance state store: versioned updates, conflicts and concurrent writers
+"""
+import os
+import json
+import tempfile
+import threading
+
+from state_store import StateStore, StateConflictError, get_state_store
+
+DEFAULT = {"zec_rate": 4, "board": []}
+
+
+def test_every_update_bumps_the_version():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StateStore(os.path.join(tmp, "state.json"), DEFAULT)
+        assert store.get_versioned() == (DEFAULT, 0)
+
+        assert store.update({"zec_rate": 5}) == ({"zec_rate": 5, "board": []}, 1)
+        assert store.update(lambda state: {**state, "board": ["ana"]})[1] == 2
+        assert store.replace({"zec_rate": 6})[1] == 3
+        assert store.update({})[1] == 4, "an update with no changes is still a new version"
+
+        # Another store on the same file sees the saved version
+        assert StateStore(store.path).get_versioned() == ({"zec_rate": 6}, 4)
+        with open(store.path) as f:
+            assert json.load(f)["version"] == 4
+    print("✅ Every update bumps the version")
+
+
+def test_stale_expected_version_conflicts():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.json")
+        mine, theirs = StateStore(path, DEFAULT), StateStore(path, DEFAULT)
+        _, version = mine.update({"zec_rate": 5})
+        theirs.update({"zec_rate": 7}, expected_version=version)
+
+        try:
+            mine.update({"zec_rate": 6}, expected_version=version)
+        except StateConflictError as e:
+            assert (e.expected, e.actual) == (1, 2)
+        else:
+            raise AssertionError("expected StateConflictError")
+        assert mine.get_versioned() == ({"zec_rate": 7, "board": []}, 2), "the rejected update wrote nothing"
+
+        assert mine.update({"zec_rate": 6}, expected_version=2)[1] == 3
+    print("✅ A stale expected_version raises StateConflictError")
+
+
+def test_concurrent_updates_are_not_lost():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.json")
+        stores = [StateStore(path, {"count": 0}) for _ in range(4)]
+
+        def worker(store):
+            for _ in range(25):
+                store.update(lambda state: {**state, "count": state["count"] + 1})
+
+        threads = [threading.Thread(target=worker, args=(store,)) for store in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert stores[0].get_versioned() == ({"count": 100}, 100)
+
+
+def test_legacy_file_reads_as_version_zero():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.json")
+        with open(path, "w") as f:
+            json.dump({"zec_rate": 3}, f)
+        store = get_state_store(path)
+        assert store is get_state_store(path)
+        assert store.get_versioned() == ({"zec_rate": 3}, 0)
+        assert store.update({"zec_rate": 4}, expected_version=0)[1] == 1
+
+
+if __name__ == "__main__":
+    test_every_update_bumps_the_version()
+    test_stale_expected_version_conflicts()
+    test_concurrent_updates_are_not_lost()
+    test_legacy_file_reads_as_version_zero()